@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
+import concurrent.futures
 import re
 import time
 import math
 import calendar
-import boto.ec2
-import boto.ec2.blockdevicemapping
-import boto.ec2.networkinterface
+import botocore.exceptions
 from nixops.backends import MachineDefinition, MachineState
 from nixops.nix_expr import Function, Call, RawValue
 import nixops_aws.resources.ec2_common
@@ -16,6 +15,14 @@ from nixops.util import (
     device_name_user_entered_to_stored,
 )
 import nixops_aws.ec2_utils
+import nixops_aws.host_keys
+import nixops_aws.images
+import nixops_aws.launcher
+import nixops_aws.power
+import nixops_aws.spot
+import nixops_aws.tagging
+import nixops_aws.throttle
+import nixops_aws.waiter
 import nixops.known_hosts
 import datetime
 from typing import Dict, Tuple, Any, Union, List
@@ -24,10 +31,67 @@ from nixops_aws.resources.elastic_ip import ElasticIPState
 from .options import EC2MachineOptions
 
 
+# Spot request status codes that end a request without fulfilling it.
+SPOT_REQUEST_FAILURES = frozenset(
+    [
+        "schedule-expired",
+        "canceled-before-fulfillment",
+        "bad-parameters",
+        "system-error",
+    ]
+)
+
+# Status codes of a request that EC2 keeps open but cannot fulfill for now.
+SPOT_REQUEST_HOLDING_FAILURES = frozenset(
+    ["capacity-not-available", "capacity-oversubscribed", "price-too-low"]
+)
+
+
+class SpotRequestFailed(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+# How long to watch a new instance boot before falling back to waiting for
+# SSH, and how often to look at its SSH port meanwhile.  GetConsoleOutput is
+# a call per machine, unlike the status poll shared by all booting machines,
+# so the console is looked at less often.
+BOOT_PROBE_TIMEOUT = 600
+BOOT_PROBE_INTERVAL = 5.0
+CONSOLE_INTERVAL = 15.0
+
+# How long a fast snapshot restore that was just enabled may be missing from
+# DescribeFastSnapshotRestores before it is given up on.
+FAST_SNAPSHOT_RESTORE_VISIBILITY_TIMEOUT = 60
+
+
 class EC2InstanceDisappeared(Exception):
     pass
 
 
+def _error_code(e):
+    return e.response.get("Error", {}).get("Code")
+
+
+def _attached_volumes(instance):
+    """Map the device names of an instance's EBS attachments to their details."""
+    return {
+        bdm["DeviceName"]: bdm["Ebs"]
+        for bdm in instance.get("BlockDeviceMappings", [])
+        if "Ebs" in bdm
+    }
+
+
+def _zone_name(zone):
+    return "‘{0}’".format(zone) if zone else "any zone"
+
+
+def _volume_attachment(volume):
+    attachments = volume.get("Attachments", [])
+    return attachments[0] if attachments else {}
+
+
 # name conventions:
 # device - device name that user enters: sd, xvd or nvme
 # device_stored - device name stored in db: sd or nvme
@@ -50,20 +114,27 @@ class EC2Definition(MachineDefinition):
         self.access_key_id = self.config.ec2.accessKeyId
         self.region = self.config.ec2.region
         self.zone = self.config.ec2.zone
+        self.fallback_zones = self.config.ec2.fallbackZones
         self.tenancy = self.config.ec2.tenancy
         self.ami = self.config.ec2.ami
         if self.ami == "":
             raise Exception("no AMI defined for EC2 machine ‘{0}’".format(self.name))
         self.instance_type = self.config.ec2.instanceType
+        self.fallback_instance_types = self.config.ec2.fallbackInstanceTypes
         self.key_pair = self.config.ec2.keyPair
         self.private_key = self.config.ec2.privateKey
         self.security_groups = self.config.ec2.securityGroups
         self.placement_group = self.config.ec2.placementGroup
+        self.launch_group = self.config.ec2.launchGroup
         self.instance_profile = self.config.ec2.instanceProfile
         self.tags = self.config.ec2.tags
         self.root_disk_size = self.config.ec2.ebsInitialRootDiskSize
+        self.create_volumes_at_launch = self.config.ec2.createVolumesAtLaunch
+        self.fast_snapshot_restore = self.config.ec2.fastSnapshotRestore
+        self.host_key_from_console = self.config.ec2.hostKeyFromConsole
         self.spot_instance_price = self.config.ec2.spotInstancePrice
         self.spot_instance_timeout = self.config.ec2.spotInstanceTimeout
+        self.spot_instance_placement = self.config.ec2.spotInstancePlacement
         self.spot_instance_request_type = self.config.ec2.spotInstanceRequestType
         self.spot_instance_interruption_behavior = (
             self.config.ec2.spotInstanceInterruptionBehavior
@@ -92,6 +163,12 @@ class EC2Definition(MachineDefinition):
     def show_type(self):
         return "{0} [{1}]".format(self.get_type(), self.region or self.zone or "???")
 
+    def instance_types(self):
+        """Return the acceptable instance types, in order of preference."""
+        types = [self.instance_type]
+        types += [t for t in self.fallback_instance_types if t not in types]
+        return types
+
     def host_key_type(self):
         return (
             "ed25519"
@@ -147,6 +224,8 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
     dns_ttl = nixops.util.attr_property("route53.ttl", None, int)
     route53_access_key_id = nixops.util.attr_property("route53.accessKeyId", None)
     client_token = nixops.util.attr_property("ec2.clientToken", None)
+    # Position of the instance among those launched with the client token.
+    launch_index = nixops.util.attr_property("ec2.launchIndex", None, int)
     spot_instance_request_id = nixops.util.attr_property(
         "ec2.spotInstanceRequestId", None
     )
@@ -157,10 +236,6 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
 
     def __init__(self, depl, name, id):
         super().__init__(depl, name, id)
-        self._conn = None
-        self._conn_vpc = None
-        self._conn_route53 = None
-        self._conn_boto3 = None
         self._cached_instance = None
 
     def _reset_state(self):
@@ -188,6 +263,7 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             self.security_groups = None
             self.placement_group = None
             self.tags = {}
+            self.tag_hashes = {}
             self.block_device_mapping = {}
             self.root_device_type = None
             self.backups = {}
@@ -196,6 +272,7 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             self.subnet_id = None
 
             self.client_token = None
+            self.launch_index = None
             self.spot_instance_request_id = None
             self.spot_instance_price = None
 
@@ -336,74 +413,31 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             return m.private_ipv4
         return super().address_to(m)
 
-    def _connect(self):
-        if self._conn:
-            return self._conn
-        self._conn = nixops_aws.ec2_utils.connect(self.region, self.access_key_id)
-        return self._conn
-
     def _connect_boto3(self):
-        if self._conn_boto3:
-            return self._conn_boto3
-        self._conn_boto3 = nixops_aws.ec2_utils.connect_ec2_boto3(
-            self.region, self.access_key_id
-        )
-        return self._conn_boto3
-
-    def _connect_vpc(self):
-        if self._conn_vpc:
-            return self._conn_vpc
-        self._conn_vpc = nixops_aws.ec2_utils.connect_vpc(
-            self.region, self.access_key_id
-        )
-        return self._conn_vpc
+        return nixops_aws.ec2_utils.connect_ec2_boto3(self.region, self.access_key_id)
 
     def _connect_route53(self):
-        if self._conn_route53:
-            return self._conn_route53
-
-        # Get the secret access key from the environment or from ~/.ec2-keys.
-        (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
-            self.route53_access_key_id
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "route53", None, self.route53_access_key_id
         )
 
-        self._conn_route53 = boto.connect_route53(access_key_id, secret_access_key)
-        return self._conn_route53
-
-    def _get_spot_instance_request_by_id(self, request_id, allow_missing=False):
-        """Get spot instance request object by id."""
-        try:
-            result = self._connect().get_all_spot_instance_requests([request_id])
-        except boto.exception.EC2ResponseError as e:
-            if (
-                allow_missing
-                and e.error_code == "InvalidSpotInstanceRequestID.NotFound"
-            ):
-                result = []
-            else:
-                raise
-        if len(result) == 0:
-            if allow_missing:
-                return None
-            raise EC2InstanceDisappeared(
-                "Spot instance request ‘{0}’ disappeared!".format(request_id)
-            )
-        return result[0]
-
     def _get_instance(self, instance_id=None, allow_missing=False, update=False):
-        """Get instance object for this machine, with caching"""
+        """Describe the instance of this machine, with caching."""
         if not instance_id:
             instance_id = self.vm_id
         assert instance_id
 
-        if not self._cached_instance:
+        if not self._cached_instance or update:
             try:
-                instances = self._connect().get_only_instances([instance_id])
-            except boto.exception.EC2ResponseError as e:
-                if allow_missing and e.error_code == "InvalidInstanceID.NotFound":
-                    instances = []
+                reservations = self._connect_boto3().describe_instances(
+                    InstanceIds=[instance_id]
+                )["Reservations"]
+            except botocore.exceptions.ClientError as e:
+                if allow_missing and _error_code(e) == "InvalidInstanceID.NotFound":
+                    reservations = []
                 else:
                     raise
+            instances = [i for r in reservations for i in r["Instances"]]
             if len(instances) == 0:
                 if allow_missing:
                     return None
@@ -412,40 +446,70 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 )
             self._cached_instance = instances[0]
 
-        elif update:
-            self._cached_instance.update()
-
-        if self._cached_instance.launch_time:
+        if self._cached_instance.get("LaunchTime"):
             self.start_time = calendar.timegm(
-                time.strptime(
-                    self._cached_instance.launch_time, "%Y-%m-%dT%H:%M:%S.000Z"
-                )
+                self._cached_instance["LaunchTime"].utctimetuple()
             )
 
         return self._cached_instance
 
-    def _get_snapshot_by_id(self, snapshot_id):
-        """Get snapshot object by instance id."""
-        snapshots = self._connect().get_all_snapshots([snapshot_id])
-        if len(snapshots) != 1:
-            raise Exception("unable to find snapshot ‘{0}’".format(snapshot_id))
-        return snapshots[0]
+    def _get_volume(self, volume_id, allow_missing=False):
+        """Describe an EBS volume."""
+        try:
+            volumes = self._connect_boto3().describe_volumes(VolumeIds=[volume_id])[
+                "Volumes"
+            ]
+        except botocore.exceptions.ClientError as e:
+            if _error_code(e) != "InvalidVolume.NotFound":
+                raise
+            volumes = []
+        if len(volumes) != 1:
+            if allow_missing:
+                return None
+            raise Exception("unable to find volume ‘{0}’".format(volume_id))
+        return volumes[0]
+
+    def _detach_volume(self, volume, force=False):
+        """Detach a described volume from the instance it is attached to."""
+        attachment = _volume_attachment(volume)
+        args = dict(VolumeId=volume["VolumeId"], Force=force)
+        if attachment:
+            args["InstanceId"] = attachment["InstanceId"]
+            args["Device"] = attachment["Device"]
+        self._connect_boto3().detach_volume(**args)
+
+    def _wait_for_volume(self, volume_id, done, timeout=None, exception=True):
+        """Wait until ``done(volume)`` holds, logging the volume's state meanwhile."""
+
+        def log_state(volume):
+            self.log_continue("[{0}] ".format(volume["State"] if volume else "missing"))
+
+        return self._get_waiter("volumes").wait(
+            volume_id, done, on_update=log_state, timeout=timeout, exception=exception
+        )
+
+    def _wait_for_volumes_available(self, volume_ids):
+        """Wait for several volumes to become available, polling them together."""
+        self.log_start(
+            "waiting for volume(s) {0} to become available... ".format(
+                ", ".join("‘{0}’".format(i) for i in volume_ids)
+            )
+        )
+        # Allow the volumes to be missing due to eventual consistency.
+        self._get_waiter("volumes").wait_all_for_state(
+            volume_ids, ["available"], logger=self, timeout=900
+        )
+        self.log_end("")
 
     def _wait_for_ip(self):
         self.log_start("waiting for IP address... ")
 
-        def _instance_ip_ready(ins):
-            ready = True
-            if self.associate_public_ip_address and not ins.ip_address:
-                ready = False
-            if self.use_private_ip_address and not ins.private_ip_address:
-                ready = False
-            return ready
-
-        while True:
-            instance = self._get_instance(update=True)
-            self.log_continue("[{0}] ".format(instance.state))
-            if instance.state not in {
+        def ip_ready(instance):
+            if instance is None:
+                # EC2 may not know about a freshly launched instance yet.
+                return False
+            state = instance["State"]["Name"]
+            if state not in {
                 "pending",
                 "running",
                 "scheduling",
@@ -454,29 +518,45 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             }:
                 raise Exception(
                     "EC2 instance ‘{0}’ failed to start (state is ‘{1}’)".format(
-                        self.vm_id, instance.state
+                        self.vm_id, state
                     )
                 )
-            if instance.state != "running":
-                time.sleep(3)
-                continue
-            if _instance_ip_ready(instance):
-                break
-            time.sleep(3)
+            if state != "running":
+                return False
+            if self.associate_public_ip_address and not instance.get("PublicIpAddress"):
+                return False
+            if self.use_private_ip_address and not instance.get("PrivateIpAddress"):
+                return False
+            return True
+
+        def log_state(instance):
+            self.log_continue(
+                "[{0}] ".format(instance["State"]["Name"] if instance else "pending")
+            )
+
+        instance = self._get_waiter("instances").wait(
+            self.vm_id, ip_ready, on_update=log_state
+        )
+        # The cached boto instance object is stale now.
+        self._cached_instance = None
 
         self.log_end(
-            "{0} / {1}".format(instance.ip_address, instance.private_ip_address)
+            "{0} / {1}".format(
+                instance.get("PublicIpAddress"), instance.get("PrivateIpAddress")
+            )
         )
 
         with self.depl._db:
-            self.private_ipv4 = instance.private_ip_address
-            self.public_ipv4 = instance.ip_address
-            self.public_dns_name = instance.public_dns_name
+            self.private_ipv4 = instance.get("PrivateIpAddress")
+            self.public_ipv4 = instance.get("PublicIpAddress")
+            self.public_dns_name = instance.get("PublicDnsName")
             self.ssh_pinged = False
 
-        nixops.known_hosts.update(
-            self.public_ipv4, self._ip_for_ssh_key(), self.public_host_key
-        )
+        # An instance generating its own host key has none recorded yet.
+        if self.public_host_key:
+            nixops.known_hosts.update(
+                self.public_ipv4, self._ip_for_ssh_key(), self.public_host_key
+            )
 
     def _ip_for_ssh_key(self):
         if self.use_private_ip_address:
@@ -509,9 +589,11 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
 
                 snapshot_id = b.get(device_real, None)
                 if snapshot_id is not None:
-                    try:
-                        snapshot = self._get_snapshot_by_id(snapshot_id)
-                        snapshot_status = snapshot.update()
+                    snapshot = self._get_inventory().describe(
+                        "snapshots", snapshot_id, self._fleet_snapshot_ids
+                    )
+                    if snapshot is not None:
+                        snapshot_status = snapshot["Progress"]
                         info.append(
                             "progress[{0},{1},{2}] = {3}".format(
                                 self.name, device_real, snapshot_id, snapshot_status
@@ -519,9 +601,7 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                         )
                         if snapshot_status != "100%":
                             backup_status = "running"
-                    except boto.exception.EC2ResponseError as e:
-                        if e.error_code != "InvalidSnapshot.NotFound":
-                            raise
+                    else:
                         info.append(
                             "{0} - {1} - {2} - Snapshot has disappeared".format(
                                 self.name, device_real, snapshot_id
@@ -533,57 +613,174 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         return backups
 
     def remove_backup(self, backup_id, keep_physical=False):
+        """
+        Remove a backup of this machine.  Unless ``keep_physical`` is set, its
+        snapshots are deleted concurrently; the backup is kept if they could
+        not all be deleted, so that removing it can be retried.
+        """
         self.log("removing backup {0}".format(backup_id))
         _backups = self.backups
-        if backup_id not in _backups.keys():
+        if backup_id not in _backups:
             self.warn("backup {0} not found, skipping".format(backup_id))
-        else:
-            if not keep_physical:
-                for dev, snapshot_id in _backups[backup_id].items():
-                    snapshot = None
-                    try:
-                        snapshot = self._get_snapshot_by_id(snapshot_id)
-                    except Exception:
-                        self.warn(
-                            "snapshot {0} not found, skipping".format(snapshot_id)
-                        )
-                    if snapshot is not None:
-                        self.log("removing snapshot {0}".format(snapshot_id))
-                        self._retry(lambda: snapshot.delete())
-
-            _backups.pop(backup_id)
+            return
+        failed = {}
+        if not keep_physical:
+            for snapshot_id in _backups[backup_id].values():
+                self.log("removing snapshot {0}".format(snapshot_id))
+            failed = nixops_aws.ec2_utils.delete_snapshots(
+                self.region,
+                self.access_key_id or nixops_aws.ec2_utils.get_access_key_id(),
+                _backups[backup_id].values(),
+            )
+        if failed:
+            raise next(iter(failed.values()))
+        _backups.pop(backup_id)
+        with self.depl._db:
             self.backups = _backups
 
+    def _snapshot_name(self, device_stored, backup_id):
+        return "{0} - {3} [{1} - {2}]".format(
+            self.depl.name, self.name, device_stored, backup_id
+        )
+
+    def _snapshot_tags(self, defn, device_stored, backup_id):
+        snapshot_tags = {}
+        snapshot_tags.update(defn.tags)
+        snapshot_tags.update(self.get_common_tags())
+        snapshot_tags["Name"] = self._snapshot_name(device_stored, backup_id)
+        return snapshot_tags
+
+    def _create_instance_snapshots(self, defn, backup_id, volumes):
+        """
+        Snapshot the given volumes (volume ID -> device) of the instance with
+        one CreateSnapshots call, so that the snapshots are crash-consistent
+        with each other.  Return the snapshot IDs by volume ID of those
+        volumes that CreateSnapshots covered, which are the ones attached to
+        the instance, or nothing if the selection can't be expressed to it.
+        """
+        # The inventory may predate the last attachment changes, and
+        # excluding volumes by a stale list would snapshot too much.
+        instance = (
+            self._get_instance(allow_missing=True, update=True) if self.vm_id else None
+        )
+        if instance is None:
+            return {}
+        attached = _attached_volumes(instance)
+        attached_ids = {ebs["VolumeId"] for ebs in attached.values()}
+        if not attached_ids & set(volumes):
+            return {}
+
+        root = attached.get(instance.get("RootDeviceName"), {}).get("VolumeId")
+        spec = dict(InstanceId=self.vm_id, ExcludeBootVolume=root not in volumes)
+        excluded = sorted(attached_ids - set(volumes) - {root})
+        if excluded:
+            # Older botocores can only exclude the boot volume; leave partial
+            # selections to CreateSnapshot then.
+            client = self._connect_boto3()
+            members = client.meta.service_model.shape_for(
+                "InstanceSpecification"
+            ).members
+            if "ExcludeDataVolumeIds" not in members:
+                return {}
+            spec["ExcludeDataVolumeIds"] = excluded
+
+        # The snapshots differ in their name only: tag them with everything
+        # else at creation, and name them afterwards.
+        tags = {}
+        tags.update(defn.tags)
+        tags.update(self.get_common_tags())
+        response = self._retry(
+            lambda: self._connect_boto3().create_snapshots(
+                InstanceSpecification=spec,
+                TagSpecifications=nixops_aws.tagging.tag_specifications(
+                    "snapshot", tags
+                ),
+            )
+        )
+        snapshots = {
+            s["VolumeId"]: s["SnapshotId"]
+            for s in response["Snapshots"]
+            if s["VolumeId"] in volumes
+        }
+        # Volumes attached since the instance was described are snapshotted
+        # too; those snapshots belong to no backup.
+        unwanted = [
+            s["SnapshotId"]
+            for s in response["Snapshots"]
+            if s["VolumeId"] not in volumes
+        ]
+        if unwanted:
+            for snapshot_id, error in nixops_aws.ec2_utils.delete_snapshots(
+                self.region, self.access_key_id, unwanted
+            ).items():
+                self.warn(
+                    "cannot delete snapshot ‘{0}’: {1}".format(snapshot_id, error)
+                )
+
+        def name(volume_id):
+            self._create_tags(
+                [snapshots[volume_id]],
+                {"Name": self._snapshot_name(volumes[volume_id], backup_id)},
+            )
+
+        # Concurrent tag writes share one batch.
+        with concurrent.futures.ThreadPoolExecutor(max(1, len(snapshots))) as pool:
+            for future in [pool.submit(name, v) for v in snapshots]:
+                future.result()
+        return snapshots
+
+    def _create_volume_snapshots(self, defn, backup_id, volumes):
+        """
+        Snapshot the given volumes (volume ID -> device) one by one,
+        concurrently.  Return the snapshot IDs by volume ID.
+        """
+
+        def create(volume_id):
+            return self._retry(
+                lambda: self._connect_boto3().create_snapshot(
+                    VolumeId=volume_id,
+                    TagSpecifications=nixops_aws.tagging.tag_specifications(
+                        "snapshot",
+                        self._snapshot_tags(defn, volumes[volume_id], backup_id),
+                    ),
+                )
+            )["SnapshotId"]
+
+        with concurrent.futures.ThreadPoolExecutor(max(1, len(volumes))) as pool:
+            futures = {v: pool.submit(create, v) for v in volumes}
+        return {v: future.result() for v, future in futures.items()}
+
     def backup(self, defn, backup_id, devices=[]):
 
         self.log("backing up machine ‘{0}’ using id ‘{1}’".format(self.name, backup_id))
-        backup = {}
         _backups = self.backups
 
-        for device_stored, v in self.block_device_mapping.items():
-            device_real = device_name_stored_to_real(device_stored)
-
-            if devices == [] or device_real in devices:
-                snapshot = self._retry(
-                    lambda: self._connect().create_snapshot(volume_id=v["volumeId"])
-                )
-                self.log(
-                    "+ created snapshot of volume ‘{0}’: ‘{1}’".format(
-                        v["volumeId"], snapshot.id
-                    )
-                )
+        volumes = {
+            v["volumeId"]: device_stored
+            for device_stored, v in self.block_device_mapping.items()
+            if v.get("volumeId")
+            and (devices == [] or device_name_stored_to_real(device_stored) in devices)
+        }
 
-                snapshot_tags = {}
-                snapshot_tags.update(defn.tags)
-                snapshot_tags.update(self.get_common_tags())
-                snapshot_tags["Name"] = "{0} - {3} [{1} - {2}]".format(
-                    self.depl.name, self.name, device_stored, backup_id
-                )
+        # Snapshot the volumes attached to the instance together, and any
+        # others (e.g. not reattached yet) separately.
+        snapshots = self._create_instance_snapshots(defn, backup_id, volumes)
+        snapshots.update(
+            self._create_volume_snapshots(
+                defn,
+                backup_id,
+                {k: v for k, v in volumes.items() if k not in snapshots},
+            )
+        )
 
-                self._retry(
-                    lambda: self._connect().create_tags([snapshot.id], snapshot_tags)
+        backup = {}
+        for volume_id, device_stored in sorted(volumes.items(), key=lambda i: i[1]):
+            self.log(
+                "+ created snapshot of volume ‘{0}’: ‘{1}’".format(
+                    volume_id, snapshots[volume_id]
                 )
-                backup[device_stored] = snapshot.id
+            )
+            backup[device_stored] = snapshots[volume_id]
 
         _backups[backup_id] = backup
         self.backups = _backups
@@ -596,74 +793,200 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         for d in devices:
             self.log(" - {0}".format(d))
 
-        for device_stored, v in self.sorted_block_device_mapping():
-            device_real = device_name_stored_to_real(device_stored)
+        selected = [
+            (device_stored, v)
+            for device_stored, v in self.sorted_block_device_mapping()
+            if devices == [] or device_name_stored_to_real(device_stored) in devices
+        ]
+        snapshot_ids = {
+            device_stored: self.backups[backup_id][device_stored]
+            for device_stored, _ in selected
+        }
 
-            if devices == [] or device_real in devices:
-                # detach disks
-                volume = nixops_aws.ec2_utils.get_volume_by_id(
-                    self._connect(), v["volumeId"]
+        # Detach all disks, and create the new volumes while they detach.
+        old_volumes = {}
+        for device_stored, v in selected:
+            volume = self._get_volume(v["volumeId"], allow_missing=True)
+            if volume and volume["State"] == "in-use":
+                self.log(
+                    "detaching volume ‘{0}’ from ‘{1}’".format(
+                        volume["VolumeId"], self.name
+                    )
                 )
-                if volume and volume.update() == "in-use":
-                    self.log("detaching volume from ‘{0}’".format(self.name))
-                    volume.detach()
+                self._detach_volume(volume)
+            if volume:
+                old_volumes[device_stored] = volume["VolumeId"]
 
-                # attach backup disks
-                snapshot_id = self.backups[backup_id][device_stored]
-                self.log("creating volume from snapshot ‘{0}’".format(snapshot_id))
+        self.wait_for_snapshots_to_become_completed(sorted(set(snapshot_ids.values())))
 
-                self.wait_for_snapshot_to_become_completed(snapshot_id)
+        fast_restores = []
+        if defn.fast_snapshot_restore:
+            fast_restores = self._enable_fast_snapshot_restores(
+                sorted(set(snapshot_ids.values()))
+            )
+        try:
 
-                new_volume = self._connect().create_volume(
-                    size=0, snapshot=snapshot_id, zone=self.zone
+            def create(device_stored):
+                self.log(
+                    "creating volume from snapshot ‘{0}’".format(
+                        snapshot_ids[device_stored]
+                    )
                 )
-
-                # Check if original volume is available, aka detached from the machine.
-                if volume:
-                    nixops_aws.ec2_utils.wait_for_volume_available(
-                        self._conn, volume.id, self.logger
+                client_token = nixops.util.generate_random_string(length=48)
+                return self._retry(
+                    lambda: self._connect_boto3().create_volume(
+                        SnapshotId=snapshot_ids[device_stored],
+                        AvailabilityZone=self.zone,
+                        ClientToken=client_token,
                     )
+                )["VolumeId"]
+
+            new_volumes, error = self._create_concurrently(
+                create, [d for d, _ in selected]
+            )
+
+            # Wait for the original volumes to be detached and the new ones
+            # to be created.
+            self._wait_for_volumes_available(
+                list(old_volumes.values()) + list(new_volumes.values())
+            )
+        finally:
+            self._disable_fast_snapshot_restores(fast_restores)
 
-                # Check if new volume is available.
-                nixops_aws.ec2_utils.wait_for_volume_available(
-                    self._conn, new_volume.id, self.logger
+        def attach(volume_id, device_real):
+            self.log(
+                "attaching volume ‘{0}’ to ‘{1}’ as {2}".format(
+                    volume_id, self.name, device_real
                 )
+            )
+            device_that_boto_expects = device_name_to_boto_expected(
+                device_real
+            )  # boto expects only sd names
+            self._connect_boto3().attach_volume(
+                VolumeId=volume_id,
+                InstanceId=self.vm_id,
+                Device=device_that_boto_expects,
+            )
 
-                self.log(
-                    "attaching volume ‘{0}’ to ‘{1}’ as {2}".format(
-                        new_volume.id, self.name, device_real
-                    )
+            def attached(volume):
+                return (
+                    volume is not None
+                    and _volume_attachment(volume).get("State") == "attached"
                 )
 
-                device_that_boto_expects = device_name_to_boto_expected(
-                    device_real
-                )  # boto expects only sd names
-                new_volume.attach(self.vm_id, device_that_boto_expects)
+            self._get_waiter("volumes").wait(volume_id, attached, timeout=600)
 
-                new_v = self.block_device_mapping[device_stored]
+        # Attach in device order, one volume after the other, so that NVMe
+        # device names follow it.
+        for device_stored, v in selected:
+            device_real = device_name_stored_to_real(device_stored)
+            if device_stored not in new_volumes:
+                # Its new volume couldn't be created: put the old one back.
+                if device_stored in old_volumes:
+                    attach(old_volumes[device_stored], device_real)
+                continue
+            new_volume_id = new_volumes[device_stored]
+            attach(new_volume_id, device_real)
 
-                if (
-                    v.get("partOfImage", False)
-                    or v.get("charonDeleteOnTermination", False)
-                    or v.get("deleteOnTermination", False)
-                ):
-                    new_v["charonDeleteOnTermination"] = True
-                    self._delete_volume(v["volumeId"], True)
-                new_v["volumeId"] = new_volume.id
-                self.update_block_device_mapping(device_stored, new_v)
+            new_v = self.block_device_mapping[device_stored]
+
+            if (
+                v.get("partOfImage", False)
+                or v.get("charonDeleteOnTermination", False)
+                or v.get("deleteOnTermination", False)
+            ):
+                new_v["charonDeleteOnTermination"] = True
+                self._delete_volume(v["volumeId"], True)
+            new_v["volumeId"] = new_volume_id
+            self.update_block_device_mapping(device_stored, new_v)
+
+        if error is not None:
+            raise error
+
+    def _enable_fast_snapshot_restores(self, snapshot_ids):
+        """
+        Enable Fast Snapshot Restore for the snapshots in the machine's zone
+        and wait until it is in effect.  Return the snapshots it was enabled
+        for, leaving out those that already had it.
+        """
+        self.log_start(
+            "enabling fast snapshot restore in zone ‘{0}’... ".format(self.zone)
+        )
+        response = self._retry(
+            lambda: self._connect_boto3().enable_fast_snapshot_restores(
+                AvailabilityZones=[self.zone], SourceSnapshotIds=snapshot_ids
+            )
+        )
+        for error in response.get("Unsuccessful", []):
+            self.warn(
+                "cannot enable fast snapshot restore for ‘{0}’: {1}".format(
+                    error["SnapshotId"],
+                    "; ".join(
+                        e["Error"]["Message"]
+                        for e in error.get("FastSnapshotRestoreStateErrors", [])
+                    ),
+                )
+            )
+        enabling = [
+            s["SnapshotId"]
+            for s in response.get("Successful", [])
+            if s["State"] == "enabling"
+        ]
+
+        visible_by = time.monotonic() + FAST_SNAPSHOT_RESTORE_VISIBILITY_TIMEOUT
+
+        def enabled(restore):
+            if restore is None:
+                # DescribeFastSnapshotRestores may not show a restore being
+                # enabled right away; don't wait for it forever though.
+                return time.monotonic() >= visible_by
+            # Enabling may be cancelled, e.g. when the account's limit of
+            # fast snapshot restores is reached; carry on without it then.
+            return restore["State"] in ["enabled", "disabling", "disabled"]
+
+        try:
+            self._get_waiter("fast_snapshot_restores").wait_all(
+                [
+                    nixops_aws.waiter.fast_snapshot_restore_id(
+                        s["SnapshotId"], s["AvailabilityZone"]
+                    )
+                    for s in response.get("Successful", [])
+                ],
+                enabled,
+                timeout=3600,
+            )
+        except BaseException:
+            self._disable_fast_snapshot_restores(enabling)
+            raise
+        self.log_end("")
+        return enabling
+
+    def _disable_fast_snapshot_restores(self, snapshot_ids):
+        if not snapshot_ids:
+            return
+        self.log("disabling fast snapshot restore in zone ‘{0}’...".format(self.zone))
+        self._retry(
+            lambda: self._connect_boto3().disable_fast_snapshot_restores(
+                AvailabilityZones=[self.zone], SourceSnapshotIds=snapshot_ids
+            )
+        )
 
     def wait_for_snapshot_to_become_completed(self, snapshot_id):
-        def check_completed():
-            res = self._get_snapshot_by_id(snapshot_id).status
-            self.log_continue("[{0}] ".format(res))
-            return res == "completed"
+        self.wait_for_snapshots_to_become_completed([snapshot_id])
 
+    def wait_for_snapshots_to_become_completed(self, snapshot_ids):
         self.log_start(
-            "waiting for snapshot ‘{0}’ to have status ‘completed’... ".format(
-                snapshot_id
+            "waiting for snapshot(s) {0} to have status ‘completed’... ".format(
+                ", ".join("‘{0}’".format(i) for i in snapshot_ids)
             )
         )
-        nixops.util.check_wait(check_completed)
+        self._get_waiter("snapshots").wait_all_for_state(
+            snapshot_ids,
+            ["completed"],
+            pending_states=["pending"],
+            logger=self,
+            allow_missing=False,
+        )
         self.log_end("")
 
     def create_after(self, resources, defn):
@@ -695,83 +1018,119 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         }
 
     def attach_volume(self, device_stored, volume_id):
-        device_real = device_name_stored_to_real(device_stored)
-
-        volume = nixops_aws.ec2_utils.get_volume_by_id(self._connect(), volume_id)
+        self.attach_volumes([(device_stored, volume_id)])
+
+    def _take_over_volume(self, volume_id):
+        """
+        Return the attachment of a volume, detaching it first if it is in use
+        by another instance and the user agrees.
+        """
+        volume = self._get_volume(volume_id, allow_missing=True)
         if not volume:
             raise Exception(
                 "volume {0} doesn't exist, run check to update the state of the volume".format(
                     volume_id
                 )
             )
+        attachment = _volume_attachment(volume)
         if (
-            volume.status == "in-use"
-            and self.vm_id != volume.attach_data.instance_id
+            volume["State"] == "in-use"
+            and self.vm_id != attachment.get("InstanceId")
             and self.depl.logger.confirm(
                 "volume ‘{0}’ is in use by instance ‘{1}’, "
                 "are you sure you want to attach this volume?".format(
-                    volume_id, volume.attach_data.instance_id
+                    volume_id, attachment.get("InstanceId")
                 )
             )
         ):
 
             self.log_start(
                 "detaching volume ‘{0}’ from instance ‘{1}’... ".format(
-                    volume_id, volume.attach_data.instance_id
+                    volume_id, attachment.get("InstanceId")
                 )
             )
-            volume.detach()
+            self._detach_volume(volume)
 
-            def check_available():
-                res = volume.update()
-                self.log_continue("[{0}] ".format(res))
-                return res == "available"
+            def available(volume):
+                return volume is not None and volume["State"] == "available"
 
-            nixops.util.check_wait(check_available)
+            detached = self._wait_for_volume(
+                volume_id, available, timeout=600, exception=False
+            )
             self.log_end("")
 
-            if volume.update() != "available":
+            if detached is None:
                 self.log(
                     "force detaching volume ‘{0}’ from instance ‘{1}’...".format(
-                        volume_id, volume.attach_data.instance_id
+                        volume_id, attachment.get("InstanceId")
                     )
                 )
-                volume.detach(True)
-                nixops.util.check_wait(check_available)
-
-        self.log_start(
-            "attaching volume ‘{0}’ as ‘{1}’... ".format(volume_id, device_real)
-        )
+                self._detach_volume(volume, force=True)
+                detached = self._wait_for_volume(volume_id, available, timeout=600)
+            attachment = _volume_attachment(detached)
+        return attachment
+
+    def attach_volumes(self, volumes):
+        """
+        Attach the given (device, volume ID) pairs to the instance.  Each
+        volume is attached once the previous one is, so that the volumes are
+        hot-plugged, and NVMe device names assigned, in the given order.  The
+        devices showing up in the instance are then waited for all at once.
+        """
+        attachments = [
+            (device_stored, volume_id, self._take_over_volume(volume_id))
+            for device_stored, volume_id in volumes
+        ]
 
-        if self.vm_id != volume.attach_data.instance_id:
-            # Attach it.
-            device_that_boto_expects = device_name_to_boto_expected(device_stored)
-            self._connect().attach_volume(
-                volume_id, self.vm_id, device_that_boto_expects
+        def attached(volume):
+            return (
+                volume is not None
+                and _volume_attachment(volume).get("State") == "attached"
             )
 
-        def check_attached():
-            volume.update()
-            res = volume.attach_data.status
-            self.log_continue("[{0}] ".format(res or "not-attached"))
-            return res == "attached"
+        for device_stored, volume_id, attachment in attachments:
+            self.log(
+                "attaching volume ‘{0}’ as ‘{1}’...".format(
+                    volume_id, device_name_stored_to_real(device_stored)
+                )
+            )
+            if self.vm_id != attachment.get("InstanceId"):
+                device_that_boto_expects = device_name_to_boto_expected(device_stored)
+                self._connect_boto3().attach_volume(
+                    VolumeId=volume_id,
+                    InstanceId=self.vm_id,
+                    Device=device_that_boto_expects,
+                )
+            elif attachment.get("State") == "attached":
+                continue
+            self.log_start("waiting for volume to be attached... ")
+            self._get_waiter("volumes").wait(volume_id, attached, timeout=600)
+            self.log_end("")
 
-        # If volume is not in attached state, wait for it before going on.
-        if volume.attach_data.status != "attached":
-            nixops.util.check_wait(check_attached)
+        # Wait until the devices are visible in the instance.
+        devices = [
+            device_name_stored_to_real(device_stored) for device_stored, _ in volumes
+        ]
+        if not devices:
+            return
 
-        # Wait until the device is visible in the instance.
-        def check_device():
-            res = self.run_command("test -e {0}".format(device_real), check=False)
+        def check_devices():
+            res = self.run_command(
+                " && ".join("test -e {0}".format(d) for d in devices), check=False
+            )
             return res == 0
 
+        self.log_start("waiting for device(s) to appear... ")
         if not nixops.util.check_wait(
-            check_device, initial=1, max_tries=10, exception=False
+            check_devices, initial=1, max_tries=10, exception=False
         ):
-            # If stopping times out, then do an unclean shutdown.
             self.log_end("(timed out)")
 
-            self.log("can't find device ‘{0}’...".format(device_real))
+            self.log(
+                "can't find device(s) {0}...".format(
+                    ", ".join("‘{0}’".format(d) for d in devices)
+                )
+            )
             self.log("available devices:")
             self.run_command("lsblk")
 
@@ -785,34 +1144,30 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         # Assign or release an elastic IP address, if given.
         if (
             (self.elastic_ipv4 or "") != elastic_ipv4
-            or (instance.ip_address != elastic_ipv4)
+            or (instance.get("PublicIpAddress") != elastic_ipv4)
             or check
         ):
             if elastic_ipv4 != "":
                 # wait until machine is in running state
                 self.log_start("waiting for machine to be in running state... ")
-                while True:
-                    self.log_continue("[{0}] ".format(instance.state))
-                    if instance.state == "running":
-                        break
-                    if instance.state not in {"running", "pending"}:
-                        raise Exception(
-                            "EC2 instance ‘{0}’ failed to reach running state (state is ‘{1}’)".format(
-                                self.vm_id, instance.state
-                            )
-                        )
-                    time.sleep(3)
-                    instance = self._get_instance(update=True)
+                self._get_waiter("instances").wait_for_state(
+                    self.vm_id,
+                    ["running"],
+                    pending_states=["pending"],
+                    logger=self,
+                    allow_missing=False,
+                )
                 self.log_end("")
 
-                addresses = self._connect().get_all_addresses(addresses=[elastic_ipv4])
+                address = self._connect_boto3().describe_addresses(
+                    PublicIps=[elastic_ipv4]
+                )["Addresses"][0]
                 if (
-                    addresses[0].instance_id != ""
-                    and addresses[0].instance_id is not None
-                    and addresses[0].instance_id != self.vm_id
+                    address.get("InstanceId")
+                    and address["InstanceId"] != self.vm_id
                     and not self.depl.logger.confirm(
                         "are you sure you want to associate IP address ‘{0}’, which is currently in use by instance ‘{1}’?".format(
-                            elastic_ipv4, addresses[0].instance_id
+                            elastic_ipv4, address["InstanceId"]
                         )
                     )
                 ):
@@ -821,22 +1176,42 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                     )
                 else:
                     self.log("associating IP address ‘{0}’...".format(elastic_ipv4))
-                    addresses[0].associate(self.vm_id)
+                    if "AllocationId" in address:
+                        self._connect_boto3().associate_address(
+                            InstanceId=self.vm_id,
+                            AllocationId=address["AllocationId"],
+                            AllowReassociation=True,
+                        )
+                    else:
+                        self._connect_boto3().associate_address(
+                            InstanceId=self.vm_id, PublicIp=elastic_ipv4
+                        )
                     self.log_start(
                         "waiting for address to be associated with this machine... "
                     )
-                    instance = self._get_instance(update=True)
-                    while True:
-                        self.log_continue("[{0}] ".format(instance.ip_address))
-                        if instance.ip_address == elastic_ipv4:
-                            break
-                        time.sleep(3)
-                        instance = self._get_instance(update=True)
+
+                    def associated(instance):
+                        return (
+                            instance is not None
+                            and instance.get("PublicIpAddress") == elastic_ipv4
+                        )
+
+                    def log_address(instance):
+                        self.log_continue(
+                            "[{0}] ".format(
+                                instance.get("PublicIpAddress") if instance else None
+                            )
+                        )
+
+                    self._cached_instance = self._get_waiter("instances").wait(
+                        self.vm_id, associated, on_update=log_address
+                    )
                     self.log_end("")
 
-                nixops.known_hosts.update(
-                    self.public_ipv4, elastic_ipv4, self.public_host_key
-                )
+                if self.public_host_key:
+                    nixops.known_hosts.update(
+                        self.public_ipv4, elastic_ipv4, self.public_host_key
+                    )
 
                 with self.depl._db:
                     self.elastic_ipv4 = elastic_ipv4
@@ -844,14 +1219,21 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                     self.ssh_pinged = False
 
             elif self.elastic_ipv4 is not None:
-                addresses = self._connect().get_all_addresses(
-                    addresses=[self.elastic_ipv4]
-                )
-                if len(addresses) == 1 and addresses[0].instance_id == self.vm_id:
+                addresses = self._connect_boto3().describe_addresses(
+                    PublicIps=[self.elastic_ipv4]
+                )["Addresses"]
+                if len(addresses) == 1 and addresses[0].get("InstanceId") == self.vm_id:
                     self.log(
                         "disassociating IP address ‘{0}’...".format(self.elastic_ipv4)
                     )
-                    self._connect().disassociate_address(public_ip=self.elastic_ipv4)
+                    if "AssociationId" in addresses[0]:
+                        self._connect_boto3().disassociate_address(
+                            AssociationId=addresses[0]["AssociationId"]
+                        )
+                    else:
+                        self._connect_boto3().disassociate_address(
+                            PublicIp=self.elastic_ipv4
+                        )
                 else:
                     self.log(
                         "address ‘{0}’ was not associated with instance ‘{1}’".format(
@@ -867,11 +1249,28 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
     def security_groups_to_ids(self, subnetId, groups):
         sg_names = [g for g in groups if not g.startswith("sg-")]
         if sg_names != [] and subnetId != "":
-            vpc_id = self._connect_vpc().get_all_subnets([subnetId])[0].vpc_id
-            groups = [
-                nixops_aws.ec2_utils.name_to_security_group(self._conn, g, vpc_id)
-                for g in groups
+            client = self._connect_boto3()
+            vpc_id = client.describe_subnets(SubnetIds=[subnetId])["Subnets"][0][
+                "VpcId"
             ]
+            # Resolve all names with one call.
+            name_to_id = {
+                sg["GroupName"]: sg["GroupId"]
+                for sg in client.describe_security_groups(
+                    Filters=[
+                        {"Name": "group-name", "Values": sg_names},
+                        {"Name": "vpc-id", "Values": [vpc_id]},
+                    ]
+                )["SecurityGroups"]
+            }
+            for g in sg_names:
+                if g not in name_to_id:
+                    raise Exception(
+                        "could not resolve security group name '{0}' in VPC '{1}'".format(
+                            g, vpc_id
+                        )
+                    )
+            groups = [name_to_id.get(g, g) for g in groups]
 
         return groups
 
@@ -879,39 +1278,279 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
 
         self.log_start(
             "waiting for spot instance request ‘{0}’ to be fulfilled... ".format(
-                self.spot_instance_request_id
+                request_id
             )
         )
-        while True:
-            request = self._get_spot_instance_request_by_id(
-                self.spot_instance_request_id
-            )
-            self.log_continue("[{0}] ".format(request.status.code))
-            if request.status.code == "fulfilled":
-                break
-            if request.status.code in {
-                "schedule-expired",
-                "canceled-before-fulfillment",
-                "bad-parameters",
-                "system-error",
-            }:
+
+        # The request stays open while its status changes, so the status is
+        # logged here rather than on state updates.
+        statuses = []
+
+        def fulfilled(request):
+            if request is None:
+                # EC2 may not know about a fresh request yet.
+                return False
+            status = request["Status"]["Code"]
+            if statuses[-1:] != [status]:
+                statuses.append(status)
+                self.log_continue("[{0}] ".format(status))
+            if status in SPOT_REQUEST_FAILURES | SPOT_REQUEST_HOLDING_FAILURES:
+                raise SpotRequestFailed(status)
+            return status == "fulfilled"
+
+        # The requests of all machines are polled together.
+        try:
+            request = self._get_waiter("spot_requests").wait(request_id, fulfilled)
+        except SpotRequestFailed as e:
+            self.log_end("")
+            if e.status in SPOT_REQUEST_HOLDING_FAILURES:
+                # The request would stay open until EC2 can fulfill it; give
+                # up now rather than wait for it to expire.
+                self._cancel_spot_request()
+            # Launching again with the same client token would only return
+            # the failed request.
+            with self.depl._db:
                 self.spot_instance_request_id = None
-                self.log_end("")
-                raise Exception(
-                    "spot instance request failed with result ‘{0}’".format(
-                        request.status.code
-                    )
-                )
-            time.sleep(3)
+                self.client_token = None
+                self.launch_index = None
+            raise Exception(
+                "spot instance request failed with result ‘{0}’".format(e.status)
+            )
         self.log_end("")
 
         instance = self._retry(
-            lambda: self._get_instance(instance_id=request.instance_id)
+            lambda: self._get_instance(instance_id=request["InstanceId"])
+        )
+
+        return instance
+
+    def _get_user_tags(self, defn):
+        tags = dict(defn.tags)  # Make mutable
+        if defn.owners != []:
+            tags["Owners"] = ", ".join(defn.owners)
+        return tags
+
+    def _get_volume_tags(self, defn, device_real):
+        volume_tags = {}
+        volume_tags.update(self._get_user_tags(defn))
+        volume_tags.update(defn.tags)
+        volume_tags["Name"] = "{0} [{1} - {2}]".format(
+            self.depl.description, self.name, device_real
+        )
+        return volume_tags
+
+    def _create_volume(self, defn, device_real, v, snapshot_id=None, encrypted=False):
+        """Create an EBS volume for a device, tagged at creation time."""
+        volume_tags = self._get_volume_tags(defn, device_real)
+        args = dict(
+            AvailabilityZone=self.zone,
+            VolumeType=v["volumeType"],
+            Encrypted=encrypted,
+            TagSpecifications=nixops_aws.tagging.tag_specifications(
+                "volume", volume_tags
+            ),
         )
+        if v["size"]:
+            args["Size"] = v["size"]
+        if v["iops"]:
+            args["Iops"] = v["iops"]
+        if snapshot_id:
+            args["SnapshotId"] = snapshot_id
+        # Retrying after EC2 created the volume must not create another.
+        args["ClientToken"] = nixops.util.generate_random_string(length=48)
+        volume = self._retry(lambda: self._connect_boto3().create_volume(**args))
+        self._record_tags(volume["VolumeId"], volume_tags)
+        return volume
+
+    def _add_volume(self, device_stored, v):
+        """Record a volume to be attached to a device."""
+        # ‘charonDeleteOnTermination’ denotes whether we have to
+        # delete the volume.  This is distinct from
+        # ‘deleteOnTermination’ for backwards compatibility with
+        # the time that we still used auto-created volumes.
+        v["charonDeleteOnTermination"] = v["deleteOnTermination"]
+        v["needsAttach"] = True
+        self.update_block_device_mapping(device_stored, v)
+
+    def _create_concurrently(self, create, keys):
+        """
+        Call ``create(key)`` for all keys concurrently.  Return the results of
+        the calls that succeeded, by key, and the first error, if any.  All
+        calls are waited for, so that the caller can record what got created
+        before raising.
+        """
+        keys = list(keys)
+        with concurrent.futures.ThreadPoolExecutor(max(1, len(keys))) as pool:
+            futures = [(key, pool.submit(create, key)) for key in keys]
+        results = {}
+        error = None
+        for key, future in futures:
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                error = error or e
+        return results, error
+
+    def _create_volumes(self, defn, volumes):
+        """
+        Create the volumes for the given (device, mapping, _create_volume
+        arguments) triples concurrently and record them.  Return their IDs.
+        """
+        if not volumes:
+            return []
+
+        def create(i):
+            device_stored, v, kwargs = volumes[i]
+            return self._create_volume(
+                defn, device_name_stored_to_real(device_stored), v, **kwargs
+            )
 
+        created, error = self._create_concurrently(create, range(len(volumes)))
+
+        # Record every volume that got created before raising any error,
+        # so that none of them is leaked.
+        volume_ids = []
+        for i, (device_stored, v, _) in enumerate(volumes):
+            if i not in created:
+                continue
+            volume = created[i]
+            v["volumeId"] = volume["VolumeId"]
+            self._add_volume(device_stored, v)
+            volume_ids.append(volume["VolumeId"])
+        if error is not None:
+            raise error
+        return volume_ids
+
+    def _launch_volumes(self, defn):
+        """Return the devices whose volumes EC2 creates along with the instance."""
+        if not defn.create_volumes_at_launch:
+            return []
+        return [
+            (device_stored, v)
+            for device_stored, v in sorted(defn.block_device_mapping.items())
+            if v["disk"] == "" or v["disk"].startswith("snap-")
+        ]
+
+    def _record_launch_volumes(self, defn, instance=None):
+        """
+        Record the volumes EC2 created along with the instance.  The launch
+        response may not list them yet, in which case this is retried with
+        a fresh description of the instance on first boot.
+        """
+        pending = [
+            (device_stored, v)
+            for device_stored, v in self._launch_volumes(defn)
+            if device_stored not in self.block_device_mapping
+        ]
+        if not pending:
+            return
+        attached = _attached_volumes(instance or self._get_instance(update=True))
+        for device_stored, v in pending:
+            ebs = attached.get(device_name_to_boto_expected(device_stored), {})
+            if not ebs.get("VolumeId"):
+                continue
+            v["volumeId"] = ebs["VolumeId"]
+            v["charonDeleteOnTermination"] = v["deleteOnTermination"]
+            self.update_block_device_mapping(device_stored, v)
+
+    def _find_instance_by_client_token(self):
+        """Return the instance launched with this machine's client token, if any."""
+        reservations = self._connect_boto3().describe_instances(
+            Filters=[{"Name": "client-token", "Values": [self.client_token]}]
+        )["Reservations"]
+        for instance in [i for r in reservations for i in r["Instances"]]:
+            if self.launch_index in (None, instance["AmiLaunchIndex"]):
+                return instance
+        return None
+
+    def _launch_in_group(self, defn, args, instance_tags, spot_tags, fatal_codes):
+        """Launch the instance together with the other machines of its launch group."""
+        if self.client_token and self.launch_index is not None:
+            # We got interrupted during a group launch: pick up our instance,
+            # which may be missing the tags that differ between machines.
+            instance = self._find_instance_by_client_token()
+            if instance is not None:
+                self._create_tags([instance["InstanceId"]], instance_tags)
+                if instance.get("SpotInstanceRequestId"):
+                    self._create_tags([instance["SpotInstanceRequestId"]], spot_tags)
+                return instance
+
+        def prepare(client_token, launch_index):
+            with self.depl._db:
+                self.client_token = client_token
+                self.launch_index = launch_index
+                self.state = self.STARTING
+
+        launcher = nixops_aws.launcher.get_launcher(self.region, self.access_key_id)
+        instance, tag_specifications = launcher.run_instance(
+            defn.launch_group, args, prepare, fatal_codes
+        )
+
+        # Apply the tags that weren't common to the whole group.
+        launched_tags = {
+            spec["ResourceType"]: {t["Key"] for t in spec["Tags"]}
+            for spec in tag_specifications
+        }
+        for resource_id, resource_type, tags in [
+            (instance["InstanceId"], "instance", instance_tags),
+            (
+                instance.get("SpotInstanceRequestId"),
+                "spot-instances-request",
+                spot_tags,
+            ),
+        ]:
+            missing = {
+                k: v
+                for k, v in tags.items()
+                if k not in launched_tags.get(resource_type, set())
+            }
+            if resource_id and missing:
+                self._create_tags([resource_id], missing)
         return instance
 
-    def create_instance(self, defn, zone, user_data, ebs_optimized, args):
+    def _run_instance(self, defn, args, instance_tags, spot_tags, retry_capacity):
+        """
+        Launch one instance with the given RunInstances parameters.  Capacity
+        errors are only retried if ``retry_capacity`` is set.
+        """
+        fatal_codes = () if retry_capacity else nixops_aws.throttle.CAPACITY_ERROR_CODES
+        if defn.launch_group:
+            return self._launch_in_group(
+                defn, args, instance_tags, spot_tags, fatal_codes
+            )
+
+        args["MaxCount"] = 1  # We always want to deploy one instance.
+        args["MinCount"] = 1
+
+        # Use a client token to ensure that instance creation is
+        # idempotent; i.e., if we get interrupted before recording
+        # the instance ID, we'll get the same instance ID on the
+        # next run.
+        if not self.client_token:
+            with self.depl._db:
+                self.client_token = nixops.util.generate_random_string(
+                    length=48
+                )  # = 64 ASCII chars
+                self.state = self.STARTING
+
+        args["ClientToken"] = self.client_token
+
+        reservation = self._retry(
+            lambda: self._connect_boto3().run_instances(**args),
+            fatal_codes=fatal_codes,
+        )
+        return reservation["Instances"][0]
+
+    def create_instance(
+        self,
+        defn,
+        zone,
+        user_data,
+        ebs_optimized,
+        args,
+        fallback_zones=(),
+        spot_placement=False,
+    ):
         IamInstanceProfile = {}
         if defn.instance_profile.startswith("arn:"):
             IamInstanceProfile["Arn"] = defn.instance_profile
@@ -956,50 +1595,109 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         if defn.tenancy:
             placement["Tenancy"] = defn.tenancy
 
-        args["InstanceType"] = defn.instance_type
         args["ImageId"] = defn.ami
         args["IamInstanceProfile"] = IamInstanceProfile
         args["KeyName"] = defn.key_pair
-        args["Placement"] = placement
         args["UserData"] = user_data
         args["EbsOptimized"] = ebs_optimized
-        args["MaxCount"] = 1  # We always want to deploy one instance.
-        args["MinCount"] = 1
 
-        # Use a client token to ensure that instance creation is
-        # idempotent; i.e., if we get interrupted before recording
-        # the instance ID, we'll get the same instance ID on the
-        # next run.
-        if not self.client_token:
-            with self.depl._db:
-                self.client_token = nixops.util.generate_random_string(
-                    length=48
-                )  # = 64 ASCII chars
-                self.state = self.STARTING
+        # Tag the instance (and spot request) as part of the launch, so that
+        # no separate CreateTags call is needed.
+        instance_tags = self.get_tags(self._get_user_tags(defn))
+        args["TagSpecifications"] = nixops_aws.tagging.tag_specifications(
+            "instance", instance_tags
+        )
+        spot_tags = {}
+        if defn.spot_instance_price:
+            spot_tags = {"Name": self.get_default_name_tag()}
+            spot_tags.update(defn.tags)
+            spot_tags.update(self.get_common_tags())
+            args["TagSpecifications"] += nixops_aws.tagging.tag_specifications(
+                "spot-instances-request", spot_tags
+            )
 
-        args["ClientToken"] = self.client_token
+        # Try the acceptable instance types and zones in order until EC2 has
+        # capacity for one of them.  When resuming an interrupted launch,
+        # start with the one tried then, so that the client token matches.
+        candidates = [
+            (instance_type, candidate_zone)
+            for instance_type in defn.instance_types()
+            for candidate_zone in [zone] + [z for z in fallback_zones if z != zone]
+        ]
+        if spot_placement:
+            candidates = self._rank_spot_candidates(defn, candidates)
+        resumed = (self.instance_type, self.zone)
+        # A ranked zone need not be among the zones of the definition.
+        if self.client_token and (
+            resumed in candidates or (spot_placement and self.zone)
+        ):
+            if resumed in candidates:
+                candidates.remove(resumed)
+            candidates.insert(0, resumed)
 
-        reservation = self._retry(lambda: self._connect_boto3().run_instances(**args))
+        for n, (instance_type, candidate_zone) in enumerate(candidates):
+            args["InstanceType"] = instance_type
+            args["Placement"] = dict(placement, AvailabilityZone=candidate_zone or "")
+            with self.depl._db:
+                self.instance_type = instance_type
+                self.zone = candidate_zone
+            fallback = candidates[n + 1] if n + 1 < len(candidates) else None
+            try:
+                instance = self._run_instance(
+                    defn, args, instance_tags, spot_tags, retry_capacity=not fallback
+                )
+                break
+            except botocore.exceptions.ClientError as e:
+                code = _error_code(e)
+                if not fallback or code not in nixops_aws.throttle.CAPACITY_ERROR_CODES:
+                    raise
+                self.warn(
+                    "cannot launch ‘{0}’ in {1} ({2}), trying ‘{3}’ in {4}...".format(
+                        instance_type,
+                        _zone_name(candidate_zone),
+                        code,
+                        fallback[0],
+                        _zone_name(fallback[1]),
+                    )
+                )
+                with self.depl._db:
+                    self.client_token = None
+                    self.launch_index = None
 
         if not defn.spot_instance_price:
             # On demand instance, no need to any more checks, return it.
-            return self._get_instance(reservation["Instances"][0]["InstanceId"])
+            return instance
 
         with self.depl._db:
             self.spot_instance_price = defn.spot_instance_price
-            self.spot_instance_request_id = reservation["Instances"][0][
-                "SpotInstanceRequestId"
-            ]
-
-        tags = {"Name": "{0} [{1}]".format(self.depl.description, self.name)}
-        tags.update(defn.tags)
-        tags.update(self.get_common_tags())
-        self._retry(
-            lambda: self._connect().create_tags([self.spot_instance_request_id], tags)
-        )
+            self.spot_instance_request_id = instance["SpotInstanceRequestId"]
 
         return self._wait_for_spot_request_fulfillment(self.spot_instance_request_id)
 
+    def _rank_spot_candidates(self, defn, candidates):
+        """
+        Order the (instance type, zone) candidates of a spot launch by how
+        likely EC2 is to fulfill them quickly within the spot price.
+        """
+        ranked = nixops_aws.spot.rank(
+            self.region,
+            self.access_key_id,
+            candidates,
+            defn.spot_instance_price / 100.0,
+        )
+        if not ranked:
+            self.warn(
+                "no candidate placement is known to be within the spot price, "
+                "trying them in order..."
+            )
+            return candidates
+        self.log(
+            "placing spot instance as ‘{0}’ in zone ‘{1}’".format(
+                ranked[0][0], ranked[0][1]
+            )
+        )
+        return ranked
+
     def _cancel_spot_request(self):
         if self.spot_instance_request_id is None:
             return
@@ -1010,33 +1708,33 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         )
 
         # Cancel the request.
-        request = self._get_spot_instance_request_by_id(
-            self.spot_instance_request_id, allow_missing=True
-        )
-        if request is not None:
-            request.cancel()
+        try:
+            self._connect_boto3().cancel_spot_instance_requests(
+                SpotInstanceRequestIds=[self.spot_instance_request_id]
+            )
+        except botocore.exceptions.ClientError as e:
+            if _error_code(e) != "InvalidSpotInstanceRequestID.NotFound":
+                raise
 
         # Wait until it's really cancelled. It's possible that the
         # request got fulfilled while we were cancelling it. In that
         # case, record the instance ID.
-        while True:
-            request = self._get_spot_instance_request_by_id(
-                self.spot_instance_request_id, allow_missing=True
-            )
+        def cancelled(request):
             if request is None:
-                break
-            self.log_continue("[{0}] ".format(request.status.code))
-            if request.instance_id is not None and request.instance_id != self.vm_id:
+                return True
+            self.log_continue("[{0}] ".format(request["Status"]["Code"]))
+            instance_id = request.get("InstanceId")
+            if instance_id is not None and instance_id != self.vm_id:
                 if self.vm_id is not None:
                     raise Exception(
                         "spot instance request got fulfilled unexpectedly as instance ‘{0}’".format(
-                            request.instance_id
+                            instance_id
                         )
                     )
-                self.vm_id = request.instance_id
-            if request.state != "open":
-                break
-            time.sleep(3)
+                self.vm_id = instance_id
+            return request["State"] != "open"
+
+        self._get_waiter("spot_requests").wait(self.spot_instance_request_id, cancelled)
 
         self.log_end("")
 
@@ -1060,14 +1758,13 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 assert v.get("volumeId", None)
 
                 self.log("detaching device ‘{0}’...".format(device_real))
-                volumes = self._connect().get_all_volumes(
-                    [],
-                    filters={
-                        "attachment.instance-id": self.vm_id,
-                        "attachment.device": device_stored,
-                        "volume-id": v["volumeId"],
-                    },
-                )
+                volumes = self._connect_boto3().describe_volumes(
+                    Filters=[
+                        {"Name": "attachment.instance-id", "Values": [self.vm_id]},
+                        {"Name": "attachment.device", "Values": [device_stored]},
+                        {"Name": "volume-id", "Values": [v["volumeId"]]},
+                    ]
+                )["Volumes"]
                 assert len(volumes) <= 1
 
                 if len(volumes) == 1:
@@ -1091,15 +1788,12 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                         self.run_command(
                             "umount -l {0}".format(device_real), check=False
                         )
-                    if not self._connect().detach_volume(
-                        volumes[0].id, instance_id=self.vm_id, device=device_stored
-                    ):
-                        raise Exception(
-                            "unable to detach volume ‘{0}’ from EC2 machine ‘{1}’".format(
-                                v["volumeId"], self.name
-                            )
-                        )
-                        # FIXME: Wait until the volume is actually detached.
+                    self._connect_boto3().detach_volume(
+                        VolumeId=volumes[0]["VolumeId"],
+                        InstanceId=self.vm_id,
+                        Device=device_stored,
+                    )
+                    # FIXME: Wait until the volume is actually detached.
 
                 if v.get("charonDeleteOnTermination", False) or v.get(
                     "deleteOnTermination", False
@@ -1158,7 +1852,7 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             and allow_reboot
             and self._booted_from_ebs()
             and (
-                self.instance_type != defn.instance_type
+                self.instance_type not in defn.instance_types()
                 or self.ebs_optimized != defn.ebs_optimized
             )
         ):
@@ -1170,7 +1864,8 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         if self.vm_id and check:
             instance = self._get_instance(allow_missing=True)
 
-            if instance is None or instance.state in {"shutting-down", "terminated"}:
+            state = instance["State"]["Name"] if instance else None
+            if instance is None or state in {"shutting-down", "terminated"}:
                 if not allow_recreate:
                     raise Exception(
                         "EC2 instance ‘{0}’ went away; use ‘--allow-recreate’ to create a new one".format(
@@ -1179,22 +1874,25 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                     )
                 self.log(
                     "EC2 instance went away (state ‘{0}’), will recreate".format(
-                        instance.state if instance else "gone"
+                        state or "gone"
                     )
                 )
                 self._reset_state()
                 self.region = defn.region
-            elif instance.state == "stopped":
+            elif state == "stopped":
                 self.log("EC2 instance was stopped, restarting...")
 
                 # Modify the instance type, if desired.
-                if self.instance_type != defn.instance_type:
+                if self.instance_type not in defn.instance_types():
                     self.log(
                         "changing instance type from ‘{0}’ to ‘{1}’...".format(
                             self.instance_type, defn.instance_type
                         )
                     )
-                    instance.modify_attribute("instanceType", defn.instance_type)
+                    self._connect_boto3().modify_instance_attribute(
+                        InstanceId=self.vm_id,
+                        InstanceType={"Value": defn.instance_type},
+                    )
                     self.instance_type = defn.instance_type
 
                 if self.ebs_optimized != defn.ebs_optimized:
@@ -1203,19 +1901,24 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                             self.ebs_optimized, defn.ebs_optimized
                         )
                     )
-                    instance.modify_attribute("ebsOptimized", defn.ebs_optimized)
+                    self._connect_boto3().modify_instance_attribute(
+                        InstanceId=self.vm_id,
+                        EbsOptimized={"Value": defn.ebs_optimized},
+                    )
                     self.ebs_optimized = defn.ebs_optimized
 
                 # When we restart, we'll probably get a new IP.  So forget the current one.
                 self.public_ipv4 = None
                 self.private_ipv4 = None
 
-                instance.start()
+                self._change_power_state("start_instances")
+                self._cached_instance = None
 
                 self.state = self.STARTING
 
         resize_root = False
         update_instance_profile = True
+        tagged_at_launch = False
 
         # Create the instance.
         if not self.vm_id:
@@ -1230,16 +1933,15 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 self.region = defn.region
 
             # Figure out whether this AMI is EBS-backed.
-            amis = self._connect_boto3().describe_images(ImageIds=[defn.ami])
-            if len(amis) == 0:
+            ami = nixops_aws.images.lookup(
+                self.region, self.access_key_id, defn.ami, self._fleet_amis
+            )
+            if ami is None:
                 raise Exception(
                     "AMI ‘{0}’ does not exist in region ‘{1}’".format(
                         defn.ami, self.region
                     )
                 )
-            ami = self._connect_boto3().describe_images(ImageIds=[defn.ami])["Images"][
-                0
-            ]
             self.root_device_type = ami["RootDeviceType"]
 
             # Check if we need to resize the root disk
@@ -1290,25 +1992,47 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                     ),
                 )
                 args["BlockDeviceMappings"].append(root_mapping)
+
+            # Have EC2 create new data volumes along with the instance.
+            for device_stored, v in self._launch_volumes(defn):
+                ebs = dict(VolumeType=v["volumeType"], DeleteOnTermination=False)
+                if v["size"]:
+                    ebs["VolumeSize"] = v["size"]
+                if v["iops"]:
+                    ebs["Iops"] = v["iops"]
+                if v["disk"].startswith("snap-"):
+                    # Volumes restored from a snapshot inherit its encryption.
+                    ebs["SnapshotId"] = v["disk"]
+                elif v.get("encryptionType", "luks") == "ebs":
+                    ebs["Encrypted"] = True
+                args["BlockDeviceMappings"].append(
+                    dict(
+                        DeviceName=device_name_to_boto_expected(device_stored), Ebs=ebs
+                    )
+                )
+
             # If we're attaching any EBS volumes, then make sure that
             # we create the instance in the right placement zone.
             zone = defn.zone or None
+            # Other zones can only be tried if nothing pins the instance here.
+            pinned = bool(defn.subnet_id)
             for device_stored, v in defn.block_device_mapping.items():
                 if not v["disk"].startswith("vol-"):
                     continue
+                pinned = True
                 # Make note of the placement zone of the volume.
-                volume = nixops_aws.ec2_utils.get_volume_by_id(self._conn, v["disk"])
+                volume_zone = self._get_volume(v["disk"])["AvailabilityZone"]
                 if not zone:
                     self.log(
                         "starting EC2 instance in zone ‘{0}’ due to volume ‘{1}’".format(
-                            volume.zone, v["disk"]
+                            volume_zone, v["disk"]
                         )
                     )
-                    zone = volume.zone
-                elif zone != volume.zone:
+                    zone = volume_zone
+                elif zone != volume_zone:
                     raise Exception(
                         "unable to start EC2 instance ‘{0}’ in zone ‘{1}’ because volume ‘{2}’ is in zone ‘{3}’".format(
-                            self.name, zone, v["disk"], volume.zone
+                            self.name, zone, v["disk"], volume_zone
                         )
                     )
 
@@ -1320,37 +2044,61 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
 
             # if we have PIOPS volume and instance type supports EBS Optimized flags, then use ebs_optimized
             ebs_optimized = prefer_ebs_optimized and defn.ebs_optimized
-            # Generate a public/private host key.
-            if not self.public_host_key:
-                (private, public) = nixops.util.create_key_pair(
-                    type=defn.host_key_type()
-                )
+            # Generate a public/private host key, unless the instance is
+            # to generate its own.  Machines launched together get the same
+            # user data, so a launch group shares one.
+            if not self.public_host_key and not defn.host_key_from_console:
+                if defn.launch_group:
+                    (private, public) = nixops_aws.launcher.get_launcher(
+                        self.region, self.access_key_id
+                    ).host_key(defn.launch_group, defn.host_key_type())
+                else:
+                    (private, public) = nixops.util.create_key_pair(
+                        type=defn.host_key_type()
+                    )
                 with self.depl._db:
                     self.public_host_key = public
                     self.private_host_key = private
 
-            user_data = "SSH_HOST_{2}_KEY_PUB:{0}\nSSH_HOST_{2}_KEY:{1}\n".format(
-                self.public_host_key,
-                self.private_host_key.replace("\n", "|"),
-                defn.host_key_type().upper(),
-            )
+            user_data = ""
+            if self.private_host_key:
+                user_data = "SSH_HOST_{2}_KEY_PUB:{0}\nSSH_HOST_{2}_KEY:{1}\n".format(
+                    self.public_host_key,
+                    self.private_host_key.replace("\n", "|"),
+                    defn.host_key_type().upper(),
+                )
 
-            instance = self.create_instance(defn, zone, user_data, ebs_optimized, args)
+            instance = self.create_instance(
+                defn,
+                zone,
+                user_data,
+                ebs_optimized,
+                args,
+                fallback_zones=[] if pinned else defn.fallback_zones,
+                spot_placement=bool(
+                    defn.spot_instance_price
+                    and defn.spot_instance_placement
+                    and not pinned
+                ),
+            )
             update_instance_profile = False
+            tagged_at_launch = True
 
             with self.depl._db:
-                self.vm_id = instance.id
+                self.vm_id = instance["InstanceId"]
                 self.ami = defn.ami
-                self.instance_type = defn.instance_type
+                self.instance_type = instance["InstanceType"]
                 self.ebs_optimized = ebs_optimized
                 self.key_pair = defn.key_pair
                 self.security_groups = defn.security_groups
                 self.placement_group = defn.placement_group
-                self.zone = instance.placement
+                self.zone = instance["Placement"]["AvailabilityZone"]
                 self.tenancy = defn.tenancy
                 self.instance_profile = defn.instance_profile
                 self.client_token = None
+                self.launch_index = None
                 self.private_host_key = None
+            self._record_launch_volumes(defn, instance)
 
             # Cancel spot instance request, it isn't needed after the
             # instance has been provisioned in case of "one-time" requests
@@ -1360,21 +2108,27 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         # There is a short time window during which EC2 doesn't
         # know the instance ID yet.  So wait until it does.
         if self.state != self.UP or check:
-            while True:
-                if self._get_instance(allow_missing=True):
-                    break
-                self.log(
-                    "EC2 instance ‘{0}’ not known yet, waiting...".format(self.vm_id)
-                )
-                time.sleep(3)
+
+            def known(instance):
+                if instance is None:
+                    self.log(
+                        "EC2 instance ‘{0}’ not known yet, waiting...".format(
+                            self.vm_id
+                        )
+                    )
+                return instance is not None
+
+            self._cached_instance = self._get_waiter("instances").wait(
+                self.vm_id, known
+            )
 
         if not self.virtualization_type:
-            self.virtualization_type = self._get_instance().virtualization_type
+            self.virtualization_type = self._get_instance()["VirtualizationType"]
 
         instance = self._get_instance()
 
         # Warn about some EC2 options that we cannot update for an existing instance.
-        if self.instance_type != defn.instance_type:
+        if self.instance_type not in defn.instance_types():
             self.warn(
                 "cannot change type of a running instance (from ‘{0}‘ to ‘{1}‘): use ‘--allow-reboot’".format(
                     self.instance_type, defn.instance_type
@@ -1384,7 +2138,7 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             self.warn(
                 "cannot change ebs optimized attribute of a running instance: use ‘--allow-reboot’"
             )
-        if defn.zone and self.zone != defn.zone:
+        if defn.zone and self.zone not in [defn.zone] + list(defn.fallback_zones):
             self.warn(
                 "cannot change availability zone of a running (from ‘{0}‘ to ‘{1}‘)".format(
                     self.zone, defn.zone
@@ -1392,7 +2146,7 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             )
         if (
             not defn.subnet_id
-            and not instance.subnet_id
+            and not instance.get("SubnetId")
             and set(defn.security_groups) != set(self.security_groups)
         ):
             self.warn(
@@ -1402,23 +2156,25 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 )
             )
 
-        instance_groups = [g.id for g in instance.groups]
+        instance_groups = [g["GroupId"] for g in instance.get("SecurityGroups", [])]
         if defn.subnet_id:
             new_instance_groups = self.security_groups_to_ids(
                 defn.subnet_id, defn.security_group_ids
             )
-        elif instance.vpc_id:
+        elif instance.get("VpcId"):
             new_instance_groups = self.security_groups_to_ids(
-                instance.subnet_id, defn.security_groups
+                instance["SubnetId"], defn.security_groups
             )
 
-        if instance.vpc_id and set(instance_groups) != set(new_instance_groups):
+        if instance.get("VpcId") and set(instance_groups) != set(new_instance_groups):
             self.log(
                 "updating security groups from {0} to {1}...".format(
                     instance_groups, new_instance_groups
                 )
             )
-            instance.modify_attribute("groupSet", new_instance_groups)
+            self._connect_boto3().modify_instance_attribute(
+                InstanceId=self.vm_id, Groups=new_instance_groups
+            )
 
         if defn.placement_group != (self.placement_group or ""):
             self.warn(
@@ -1483,14 +2239,18 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 self.instance_profile = defn.instance_profile
 
         # Reapply tags if they have changed.
-        common_tags = dict(defn.tags)  # Make mutable
-        if defn.owners != []:
-            common_tags["Owners"] = ", ".join(defn.owners)
-        self.update_tags(self.vm_id, user_tags=common_tags, check=check)
+        common_tags = self._get_user_tags(defn)
+        if tagged_at_launch:
+            self.tags = self.get_tags(common_tags)
+            self._record_tags(self.vm_id, self.tags)
+        else:
+            self.update_tags(self.vm_id, user_tags=common_tags, check=check)
 
         # Reapply sourceDestCheck if it has changed.
         if self.source_dest_check != defn.source_dest_check:
-            instance.modify_attribute("sourceDestCheck", defn.source_dest_check)
+            self._connect_boto3().modify_instance_attribute(
+                InstanceId=self.vm_id, SourceDestCheck={"Value": defn.source_dest_check}
+            )
             self.source_dest_check = defn.source_dest_check
 
         # Assign the elastic IP.  If necessary, dereference the resource.
@@ -1517,6 +2277,14 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         if defn.dns_hostname:
             self._update_route53(defn)
 
+        # Watch a new instance boot rather than probing SSH blindly.
+        if self.first_boot:
+            fingerprints = self._wait_for_boot(
+                need_fingerprints=not self.public_host_key
+            )
+            if not self.public_host_key:
+                self._fetch_host_key(defn, fingerprints)
+
         # Wait until the instance is reachable via SSH.
         self.wait_for_ssh(check=check)
 
@@ -1539,9 +2307,12 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
 
         # Add disks that were in the original device mapping of image.
         if self.first_boot:
-            for device_stored, dm in self._get_instance().block_device_mapping.items():
-                if device_stored not in self.block_device_mapping and dm.volume_id:
-                    bdm = {"volumeId": dm.volume_id, "partOfImage": True}
+            self._record_launch_volumes(defn)
+            for device_stored, ebs in _attached_volumes(self._get_instance()).items():
+                if device_stored not in self.block_device_mapping and ebs.get(
+                    "VolumeId"
+                ):
+                    bdm = {"volumeId": ebs["VolumeId"], "partOfImage": True}
                     self.update_block_device_mapping(
                         device_stored, bdm
                     )  # TODO: it stores root device as sd though its really attached as nvme
@@ -1549,10 +2320,10 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
 
         # Detect if volumes were manually detached.  If so, reattach
         # them.
+        attached = _attached_volumes(self._get_instance())
         for device_stored, v in self.block_device_mapping.items():
             if (
-                device_name_to_boto_expected(device_stored)
-                not in self._get_instance().block_device_mapping.keys()
+                device_name_to_boto_expected(device_stored) not in attached
                 and not v.get("needsAttach", False)
                 and v.get("volumeId", None)
             ):
@@ -1564,10 +2335,7 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         # Detect if volumes were manually destroyed.
         for device_stored, v in self.block_device_mapping.items():
             if v.get("needsAttach", False):
-                volume = nixops_aws.ec2_utils.get_volume_by_id(
-                    self._conn, v["volumeId"], allow_missing=True
-                )
-                if volume:
+                if self._get_volume(v["volumeId"], allow_missing=True):
                     continue
                 if device_stored not in defn.block_device_mapping:
                     self.warn(
@@ -1591,23 +2359,17 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 self.update_block_device_mapping(device_stored, None)
 
         # Create missing volumes.
+        new_volumes = []
         for device_stored, v in defn.block_device_mapping.items():
             device_real = device_name_stored_to_real(device_stored)
 
-            volume = None
             if v["disk"] == "":
                 if device_stored in self.block_device_mapping:
                     continue
                 self.log("creating EBS volume of {0} GiB...".format(v["size"]))
                 ebs_encrypt = v.get("encryptionType", "luks") == "ebs"
-                volume = self._connect().create_volume(
-                    size=v["size"],
-                    zone=self.zone,
-                    volume_type=v["volumeType"],
-                    iops=v["iops"],
-                    encrypted=ebs_encrypt,
-                )
-                v["volumeId"] = volume.id
+                new_volumes.append((device_stored, v, dict(encrypted=ebs_encrypt)))
+                continue
 
             elif v["disk"].startswith("vol-"):
                 if device_stored in self.block_device_mapping:
@@ -1648,14 +2410,8 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 if device_stored in self.block_device_mapping:
                     continue
                 self.log("creating volume from snapshot ‘{0}’...".format(v["disk"]))
-                volume = self._connect().create_volume(
-                    size=v["size"],
-                    snapshot=v["disk"],
-                    zone=self.zone,
-                    volume_type=v["volumeType"],
-                    iops=v["iops"],
-                )
-                v["volumeId"] = volume.id
+                new_volumes.append((device_stored, v, dict(snapshot_id=v["disk"])))
+                continue
 
             else:
                 if device_stored in self.block_device_mapping:
@@ -1668,26 +2424,19 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                     )
                 )
 
-            # ‘charonDeleteOnTermination’ denotes whether we have to
-            # delete the volume.  This is distinct from
-            # ‘deleteOnTermination’ for backwards compatibility with
-            # the time that we still used auto-created volumes.
-            v["charonDeleteOnTermination"] = v["deleteOnTermination"]
-            v["needsAttach"] = True
-            self.update_block_device_mapping(device_stored, v)
+            self._add_volume(device_stored, v)
 
-            # Wait for volume to get to available state for newly
-            # created volumes only (EC2 sometimes returns weird
-            # temporary states for newly created volumes, e.g. shortly
-            # in-use).  Doing this after updating the device mapping
-            # state, to make it recoverable in case an exception
-            # happens (e.g. in other machine's deployments).
-            if volume:
-                nixops_aws.ec2_utils.wait_for_volume_available(
-                    self._conn, volume.id, self.logger
-                )
+        # Wait for volumes to get to available state for newly
+        # created volumes only (EC2 sometimes returns weird
+        # temporary states for newly created volumes, e.g. shortly
+        # in-use).  Doing this after updating the device mapping
+        # state, to make it recoverable in case an exception
+        # happens (e.g. in other machine's deployments).
+        new_volume_ids = self._create_volumes(defn, new_volumes)
+        if new_volume_ids:
+            self._wait_for_volumes_available(new_volume_ids)
 
-        # Always apply tags to the volumes we just created.
+        # Reconcile the tags of managed volumes; unchanged tag sets cost no calls.
         for device_stored, v in self.block_device_mapping.items():
             device_real = device_name_stored_to_real(device_stored)
 
@@ -1703,23 +2452,20 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                 or "partOfImage" in v
             ):
                 continue
-            volume_tags = {}
-            volume_tags.update(common_tags)
-            volume_tags.update(defn.tags)
-            volume_tags["Name"] = "{0} [{1} - {2}]".format(
-                self.depl.description, self.name, device_real
-            )
-            self._retry(
-                lambda: self._connect().create_tags([v["volumeId"]], volume_tags)
+            self._reconcile_tags(
+                v["volumeId"], self._get_volume_tags(defn, device_real), check=check
             )
 
         # Attach missing volumes.
-
-        for device_stored, v in self.sorted_block_device_mapping():
-            if v.get("needsAttach", False):
-                self.attach_volume(device_stored, v["volumeId"])
-                del v["needsAttach"]
-                self.update_block_device_mapping(device_stored, v)
+        to_attach = [
+            (device_stored, v)
+            for device_stored, v in self.sorted_block_device_mapping()
+            if v.get("needsAttach", False)
+        ]
+        self.attach_volumes([(d, v["volumeId"]) for d, v in to_attach])
+        for device_stored, v in to_attach:
+            del v["needsAttach"]
+            self.update_block_device_mapping(device_stored, v)
 
         # FIXME: process changes to the deleteOnTermination flag.
 
@@ -1739,12 +2485,10 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             f,
             error_codes=["Throttling", "PriorRequestNotComplete"] + error_codes,
             logger=self,
+            service="route53",
         )
 
     def _update_route53(self, defn):
-        import boto.route53
-        import boto.route53.record
-
         self.dns_hostname = defn.dns_hostname.lower()
         self.dns_ttl = defn.dns_ttl
         self.route53_access_key_id = (
@@ -1786,74 +2530,68 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         )
 
         hosted_zone = ".".join(self.dns_hostname.split(".")[1:])
+        client = self._connect_route53()
         zones = self._retry_route53(
-            lambda: self._connect_route53().get_all_hosted_zones()
+            lambda: [
+                zone
+                for page in client.get_paginator("list_hosted_zones").paginate()
+                for zone in page["HostedZones"]
+            ]
         )
 
         def testzone(hosted_zone, zone):
             """returns True if there is a subcomponent match"""
             hostparts = hosted_zone.split(".")
-            zoneparts = zone.Name.split(".")[:-1]  # strip the last ""
+            zoneparts = zone["Name"].split(".")[:-1]  # strip the last ""
 
             return hostparts[::-1][: len(zoneparts)][::-1] == zoneparts
 
-        zones = [
-            zone
-            for zone in zones["ListHostedZonesResponse"]["HostedZones"]
-            if testzone(hosted_zone, zone)
-        ]
+        zones = [zone for zone in zones if testzone(hosted_zone, zone)]
         if len(zones) == 0:
             raise Exception("hosted zone for {0} not found".format(hosted_zone))
 
         # use hosted zone with longest match
-        longest_zone = max(zones, key=lambda x: len(x.Name))
+        longest_zone = max(zones, key=lambda x: len(x["Name"]))
         zoneid = longest_zone["Id"].split("/")[2]
         dns_name = "{0}.".format(self.dns_hostname)
 
-        prev_a_rrs = [
-            prev
-            for prev in self._retry_route53(
-                lambda: self._connect_route53().get_all_rrsets(
-                    hosted_zone_id=zoneid, type="A", name=dns_name
-                )
+        def previous_rrs(record_type):
+            rrsets = self._retry_route53(
+                lambda: client.list_resource_record_sets(
+                    HostedZoneId=zoneid,
+                    StartRecordName=dns_name,
+                    StartRecordType=record_type,
+                )["ResourceRecordSets"]
             )
-            if prev.name == dns_name and prev.type == "A"
-        ]
+            return [
+                prev
+                for prev in rrsets
+                if prev["Name"] == dns_name and prev["Type"] == record_type
+            ]
 
-        prev_cname_rrs = [
-            prev
-            for prev in self._retry_route53(
-                lambda: self._connect_route53().get_all_rrsets(
-                    hosted_zone_id=zoneid, type="CNAME", name=self.dns_hostname
-                )
-            )
-            if prev.name == dns_name and prev.type == "CNAME"
+        # Deleting a record set requires repeating it exactly.
+        changes = [
+            {"Action": "DELETE", "ResourceRecordSet": prevrr}
+            for prevrr in previous_rrs("A") + previous_rrs("CNAME")
         ]
-
-        changes = boto.route53.record.ResourceRecordSets(
-            connection=self._conn_route53, hosted_zone_id=zoneid
+        changes.append(
+            {
+                "Action": "CREATE",
+                "ResourceRecordSet": {
+                    "Name": self.dns_hostname,
+                    "Type": record_type,
+                    "TTL": self.dns_ttl,
+                    "ResourceRecords": [{"Value": dns_value}],
+                },
+            }
         )
-        if len(prev_a_rrs) > 0:
-            for prevrr in prev_a_rrs:
-                change = changes.add_change(
-                    "DELETE", self.dns_hostname, "A", ttl=prevrr.ttl
-                )
-                change.add_value(",".join(prevrr.resource_records))
-        if len(prev_cname_rrs) > 0:
-            for prevrr in prev_cname_rrs:
-                change = changes.add_change(
-                    "DELETE", prevrr.name, "CNAME", ttl=prevrr.ttl
-                )
-                change.add_value(",".join(prevrr.resource_records))
-
-        change = changes.add_change(
-            "CREATE", self.dns_hostname, record_type, ttl=self.dns_ttl
-        )
-        change.add_value(dns_value)
         # add InvalidChangeBatch to error codes to retry on. Unfortunately AWS sometimes returns
         # this due to eventual consistency
         self._retry_route53(
-            lambda: changes.commit(), error_codes=["InvalidChangeBatch"]
+            lambda: client.change_resource_record_sets(
+                HostedZoneId=zoneid, ChangeBatch={"Changes": changes}
+            ),
+            error_codes=["InvalidChangeBatch"],
         )
 
     def _delete_volume(self, volume_id, allow_keep=False):
@@ -1865,13 +2603,15 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
             else:
                 raise Exception("not destroying EBS volume ‘{0}’".format(volume_id))
         self.log("destroying EBS volume ‘{0}’...".format(volume_id))
-        volume = nixops_aws.ec2_utils.get_volume_by_id(
-            self._connect(), volume_id, allow_missing=True
+        self._forget_tags(volume_id)
+        volume = self._get_waiter("volumes").wait(
+            volume_id,
+            lambda volume: volume is None or volume["State"] == "available",
+            timeout=600,
         )
         if not volume:
             return
-        nixops.util.check_wait(lambda: volume.update() == "available")
-        volume.delete()
+        self._connect_boto3().delete_volume(VolumeId=volume_id)
 
     def destroy(self, wipe=False):
         self._cancel_spot_request()
@@ -1892,30 +2632,30 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         # The latter allows us to destroy instances that were "leaked"
         # in create() due to it being interrupted after the instance
         # was created but before it registered the ID in the database.
-        instance = None
-        if self.vm_id:
-            instance = self._get_instance(allow_missing=True)
-        else:
-            reservations = self._connect().get_all_instances(
-                filters={"client-token": self.client_token}
-            )
-            if len(reservations) > 0:
-                instance = reservations[0].instances[0]
+        instance_id = self.vm_id
+        if not instance_id:
+            instance = self._find_instance_by_client_token()
+            if instance is not None:
+                instance_id = instance["InstanceId"]
 
-        if instance:
-            instance.terminate()
+        if instance_id:
+            try:
+                self._connect_boto3().terminate_instances(InstanceIds=[instance_id])
+            except botocore.exceptions.ClientError as e:
+                if _error_code(e) != "InvalidInstanceID.NotFound":
+                    raise
+                instance_id = None
 
+        if instance_id:
             # Wait until it's really terminated.
-            while True:
-                self.log_continue("[{0}] ".format(instance.state))
-                if instance.state == "terminated":
-                    break
-                time.sleep(3)
-                instance = self._get_instance(update=True)
+            self._get_waiter("instances").wait_for_state(
+                instance_id, ["terminated"], logger=self, timeout=15 * 60
+            )
 
         self.log_end("")
 
-        nixops.known_hosts.remove(self.public_ipv4, self.public_host_key)
+        if self.public_host_key:
+            nixops.known_hosts.remove(self.public_ipv4, self.public_host_key)
 
         # Destroy volumes created for this instance.
         for device_stored, v in self.block_device_mapping.items():
@@ -1937,56 +2677,79 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
 
         self.log_start("stopping EC2 machine... ")
 
-        instance = self._get_instance()
-        instance.stop()  # no-op if the machine is already stopped
+        # A no-op if the machine is already stopped.
+        self._change_power_state("stop_instances")
 
         self.state = self.STOPPING
 
         # Wait until it's really stopped.
-        def check_stopped():
-            instance = self._get_instance(update=True)
-            self.log_continue("[{0}] ".format(instance.state))
-            if instance.state == "stopped":
+        def stopped(instance):
+            if instance is None:
+                raise EC2InstanceDisappeared(
+                    "EC2 instance ‘{0}’ disappeared!".format(self.vm_id)
+                )
+            state = instance["State"]["Name"]
+            if state == "stopped":
                 return True
-            if instance.state not in {"running", "stopping"}:
+            if state not in {"running", "stopping"}:
                 raise Exception(
                     "EC2 instance ‘{0}’ failed to stop (state is ‘{1}’)".format(
-                        self.vm_id, instance.state
+                        self.vm_id, state
                     )
                 )
             return False
 
-        if not nixops.util.check_wait(
-            check_stopped, initial=3, max_tries=300, exception=False
-        ):  # = 15 min
-            # If stopping times out, then do an unclean shutdown.
+        def log_state(instance):
+            if instance is None:
+                return
+            self.log_continue("[{0}] ".format(instance["State"]["Name"]))
+
+        def wait_stopped(timeout, exception=False):
+            return self._get_waiter("instances").wait(
+                self.vm_id,
+                stopped,
+                on_update=log_state,
+                timeout=timeout,
+                exception=exception,
+            )
+
+        if not wait_stopped(15 * 60):
+            # If stopping times out, then do an unclean shutdown.  The
+            # machines that timed out together are force-stopped together.
             self.log_end("(timed out)")
             self.log_start("force-stopping EC2 machine... ")
-            instance.stop(force=True)
-            if not nixops.util.check_wait(
-                check_stopped, initial=3, max_tries=100, exception=False
-            ):  # = 5 min
+            self._change_power_state("stop_instances", Force=True)
+            if not wait_stopped(5 * 60):
                 # Amazon docs suggest doing a force stop twice...
                 self.log_end("(timed out)")
                 self.log_start("force-stopping EC2 machine... ")
-                instance.stop(force=True)
-                nixops.util.check_wait(
-                    check_stopped, initial=3, max_tries=100
-                )  # = 5 min
+                self._change_power_state("stop_instances", Force=True)
+                wait_stopped(5 * 60, exception=True)
 
+        self._cached_instance = None
         self.log_end("")
 
         self.state = self.STOPPED
         self.ssh_master = None
 
+    def _change_power_state(self, operation, **params):
+        """
+        Stop, start or reboot the instance (see nixops_aws.power), in one call
+        with the other machines of the region doing the same.
+        """
+        nixops_aws.power.get_power_batcher(self.region, self.access_key_id).call(
+            operation, self.vm_id, **params
+        )
+
     def start(self):
         if not self._booted_from_ebs():
             return
 
         self.log("starting EC2 machine...")
 
-        instance = self._get_instance()
-        instance.start()  # no-op if the machine is already started
+        # A no-op if the machine is already started.
+        self._change_power_state("start_instances")
+        self._cached_instance = None
 
         self.state = self.STARTING
 
@@ -2011,27 +2774,86 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
         self.wait_for_ssh(check=True)
         self.send_keys()
 
+    def _fleet_instance_ids(self):
+        """Return the instance IDs of the machines sharing this one's inventory."""
+        return [
+            m.vm_id
+            for m in self.depl.active_resources.values()
+            if isinstance(m, EC2State)
+            and m.vm_id
+            and m.region == self.region
+            and m.access_key_id == self.access_key_id
+        ]
+
+    def _fleet_amis(self):
+        """Return the AMIs of the machines defined in this one's region."""
+        return [
+            defn.ami
+            for defn in (self.depl.definitions or {}).values()
+            if isinstance(defn, EC2Definition) and defn.region == self.region
+        ]
+
+    def _fleet_snapshot_ids(self):
+        """Return the backup snapshots of the machines sharing this one's inventory."""
+        return [
+            snapshot_id
+            for m in self.depl.active_resources.values()
+            if isinstance(m, EC2State)
+            and m.region == self.region
+            and m.access_key_id == self.access_key_id
+            for backup in m.backups.values()
+            for snapshot_id in backup.values()
+        ]
+
+    def _describe_instance(self):
+        """
+        Describe this machine's instance from the deployment inventory.  Should
+        it be missing from the snapshot, the instances of all machines in the
+        region are described in one go, so that checking a fleet takes the
+        same few calls whether or not its instances are in the snapshot.
+        """
+        return self._get_inventory().describe(
+            "instances", self.vm_id, self._fleet_instance_ids
+        )
+
+    def _volume_exists(self, volume_id):
+        volumes = [
+            v["volumeId"]
+            for v in self.block_device_mapping.values()
+            if v.get("volumeId")
+        ]
+        return (
+            self._get_inventory().describe("volumes", volume_id, lambda: volumes)
+            is not None
+        )
+
     def _check(self, res):
         if not self.vm_id:
             res.exists = False
             return
 
-        instance = self._get_instance(allow_missing=True)
-        # self.log("instance state is ‘{0}’".format(instance.state if instance else "gone"))
+        instance = self._describe_instance()
+        state = instance["State"]["Name"] if instance else None
+        # self.log("instance state is ‘{0}’".format(state or "gone"))
 
-        if instance is None or instance.state in {"shutting-down", "terminated"}:
+        if instance is None or state in {"shutting-down", "terminated"}:
             self.state = self.MISSING
             self.vm_id = None
             return
 
+        if instance.get("LaunchTime"):
+            self.start_time = calendar.timegm(instance["LaunchTime"].utctimetuple())
+
         res.exists = True
-        if instance.state == "pending":
+        if state == "pending":
             res.is_up = False
             self.state = self.STARTING
 
-        elif instance.state == "running":
+        elif state == "running":
             res.is_up = True
 
+            attached = _attached_volumes(instance)
+
             res.disks_ok = True
             for device_stored, v in self.block_device_mapping.items():
                 device_real = device_name_stored_to_real(device_stored)
@@ -2039,74 +2861,77 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                     device_real
                 )  # boto expects only sd names
 
-                if device_that_boto_expects not in instance.block_device_mapping.keys() and v.get(
-                    "volumeId", None
-                ):
+                if device_that_boto_expects not in attached and v.get("volumeId", None):
                     res.disks_ok = False
                     res.messages.append(
                         "volume ‘{0}’ not attached to ‘{1}’".format(
                             v["volumeId"], device_real
                         )
                     )
-                    volume = nixops_aws.ec2_utils.get_volume_by_id(
-                        self._connect(), v["volumeId"], allow_missing=True
-                    )
-                    if not volume:
+                    if not self._volume_exists(v["volumeId"]):
                         res.messages.append(
                             "volume ‘{0}’ no longer exists".format(v["volumeId"])
                         )
 
                 if (
-                    device_that_boto_expects in instance.block_device_mapping.keys()
-                    and instance.block_device_mapping[device_that_boto_expects].status
-                    != "attached"
+                    device_that_boto_expects in attached
+                    and attached[device_that_boto_expects]["Status"] != "attached"
                 ):
                     res.disks_ok = False
                     res.messages.append(
                         "volume ‘{0}’ on device ‘{1}’ has unexpected state: ‘{2}’".format(
                             v["volumeId"],
                             device_real,
-                            instance.block_device_mapping[device_stored].status,
+                            attached[device_that_boto_expects]["Status"],
                         )
                     )
 
+            private_ip_address = instance.get("PrivateIpAddress")
+            ip_address = instance.get("PublicIpAddress")
             if (
-                self.private_ipv4 != instance.private_ip_address
-                or self.public_ipv4 != instance.ip_address
+                self.private_ipv4 != private_ip_address
+                or self.public_ipv4 != ip_address
             ):
                 self.warn("IP address has changed, you may need to run ‘nixops deploy’")
-                self.private_ipv4 = instance.private_ip_address
-                self.public_ipv4 = instance.ip_address
+                self.private_ipv4 = private_ip_address
+                self.public_ipv4 = ip_address
 
             super()._check(res)
 
-        elif instance.state == "stopping":
+        elif state == "stopping":
             res.is_up = False
             self.state = self.STOPPING
 
-        elif instance.state == "stopped":
+        elif state == "stopped":
             res.is_up = False
             self.state = self.STOPPED
 
         # check for scheduled events
-        instance_status = self._connect().get_all_instance_status(
-            instance_ids=[instance.id]
-        )
-        for ist in instance_status:
-            if ist.events:
-                for e in ist.events:
-                    res.messages.append("Event ‘{0}’:".format(e.code))
-                    res.messages.append("  * {0}".format(e.description))
-                    res.messages.append(
-                        "  * {0} - {1}".format(e.not_before, e.not_after)
-                    )
+        instance_status = self._get_inventory().instance_status(self.vm_id)
+        for e in (instance_status or {}).get("Events", []):
+            res.messages.append("Event ‘{0}’:".format(e["Code"]))
+            res.messages.append("  * {0}".format(e["Description"]))
+            res.messages.append(
+                "  * {0} - {1}".format(e.get("NotBefore"), e.get("NotAfter"))
+            )
 
     def reboot(self, hard=False):
         self.log("rebooting EC2 machine...")
-        instance = self._get_instance()
-        instance.reboot()
+        self._change_power_state("reboot_instances")
         self.state = self.STARTING
 
+    def _get_console_output(self):
+        """Return the most recent console output of the instance, if any."""
+        client = self._connect_boto3()
+        try:
+            # Only Nitro instances give the output as of now.
+            response = client.get_console_output(InstanceId=self.vm_id, Latest=True)
+        except botocore.exceptions.ClientError as e:
+            if _error_code(e) != "UnsupportedOperation":
+                raise
+            response = client.get_console_output(InstanceId=self.vm_id)
+        return response.get("Output")
+
     def get_console_output(self):
         if not self.vm_id:
             raise Exception(
@@ -2114,9 +2939,84 @@ class EC2State(MachineState[EC2Definition], EC2CommonState):
                     self.name
                 )
             )
-        return (
-            self._connect().get_console_output(self.vm_id).output or "(not available)"
+        return self._get_console_output() or "(not available)"
+
+    def _wait_for_boot(self, need_fingerprints=False):
+        """
+        Wait until sshd has started on a new instance, as shown by the host key
+        fingerprints it prints on the console, by its SSH port answering or by
+        EC2 reporting the instance as reachable.  Fail if EC2 finds it
+        unreachable.  Return the fingerprints, or None if they weren't seen.
+
+        If ``need_fingerprints`` is set, only the fingerprints will do.
+        """
+        self.log_start("waiting for the instance to boot... ")
+
+        def reachable(status):
+            if status is None:
+                return False
+            details = {
+                d["Name"]: d["Status"] for d in status["InstanceStatus"]["Details"]
+            }
+            if details.get("reachability") == "failed":
+                raise Exception(
+                    "EC2 instance ‘{0}’ is unreachable, see ‘nixops show-console-output’".format(
+                        self.vm_id
+                    )
+                )
+            return details.get("reachability") == "passed"
+
+        def log_status(status):
+            if status is not None:
+                self.log_continue("[{0}] ".format(status["InstanceStatus"]["Status"]))
+
+        deadline = time.monotonic() + BOOT_PROBE_TIMEOUT
+        next_console = time.monotonic()
+        while True:
+            if time.monotonic() >= next_console:
+                next_console = time.monotonic() + CONSOLE_INTERVAL
+                fingerprints = nixops_aws.host_keys.console_fingerprints(
+                    self._get_console_output() or ""
+                )
+                if fingerprints is not None:
+                    self.log_end("sshd started")
+                    return fingerprints
+            if not need_fingerprints and nixops.util.ping_tcp_port(
+                self.get_ssh_name(), self.ssh_port
+            ):
+                self.log_end("SSH port open")
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.log_end("")
+                return None
+            # The statuses of all booting instances are polled together.
+            status = self._get_waiter("instance_statuses").wait(
+                self.vm_id,
+                reachable,
+                on_update=log_status,
+                timeout=min(BOOT_PROBE_INTERVAL, remaining),
+                exception=False,
+            )
+            if status is not None and not need_fingerprints:
+                self.log_end("reachable")
+                return None
+
+    def _fetch_host_key(self, defn, fingerprints):
+        """Record the host key the instance generated, checked against its console."""
+        if fingerprints is None:
+            raise Exception(
+                "cannot verify the host key of ‘{0}’: its fingerprints did not appear on the console".format(
+                    self.name
+                )
+            )
+        self.log("fetching host key...")
+        key = nixops_aws.host_keys.verified_key(
+            self.get_ssh_name(), self.ssh_port, defn.host_key_type(), fingerprints
         )
+        with self.depl._db:
+            self.public_host_key = key
+        nixops.known_hosts.add(self._ip_for_ssh_key(), self.public_host_key)
 
     def next_charge_time(self):
         if not self.start_time:
@@ -50,14 +50,20 @@ class Ec2Options(ResourceOptions):
     ami: str
     associatePublicIpAddress: bool
     blockDeviceMapping: Mapping[str, BlockdevicemappingOptions]
+    createVolumesAtLaunch: bool
     ebsBoot: bool
     ebsInitialRootDiskSize: int
     ebsOptimized: bool
     elasticIPv4: str
+    fallbackInstanceTypes: Sequence[str]
+    fallbackZones: Sequence[str]
+    fastSnapshotRestore: bool
+    hostKeyFromConsole: bool
     instanceId: str
     instanceProfile: str
     instanceType: str
     keyPair: str
+    launchGroup: str
     physicalProperties: Mapping[str, Union[int, str, bool]]
     placementGroup: str
     privateKey: str
@@ -68,6 +74,7 @@ class Ec2Options(ResourceOptions):
     spotInstanceInterruptionBehavior: Union[
         Literal["terminate"], Literal["stop"], Literal["hibernate"]
     ]
+    spotInstancePlacement: bool
     spotInstancePrice: int
     spotInstanceRequestType: Union[Literal["one-time"], Literal["persistent"]]
     spotInstanceTimeout: int
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Coalescing of concurrent requests into shared API calls.
+
+A :class:`Coalescer` collects the requests made by concurrently deploying
+resources for a short window and groups them by key.  The first caller of a
+window then flushes every group, with one call of the coalescer's ``flush``
+function per group, while the others block until it is done; requests thus
+stay synchronous from a caller's point of view.  ``flush`` sets a result or
+an error on each member of its group, so that every caller gets its own
+outcome, and a group that fails altogether only fails its own members.
+
+Used by :mod:`nixops_aws.tagging`, :mod:`nixops_aws.launcher` and
+:mod:`nixops_aws.power`.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import botocore.exceptions
+
+
+class Member:
+    """A caller's request in a batch, and its outcome."""
+
+    def __init__(self, request: Any):
+        self.request = request
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _Batch:
+    def __init__(self):
+        self.groups: Dict[str, List[Member]] = {}
+        self.done = threading.Event()
+
+
+class Coalescer:
+    """
+    Groups concurrent requests by key and flushes each group with one call
+    of ``flush(members)``, ``window`` seconds after the first request.  Unless
+    ``wait_alone`` is set, a request with no other request made within the
+    window is flushed right away.
+    """
+
+    def __init__(
+        self,
+        window: float,
+        flush: Callable[[List[Member]], None],
+        wait_alone: bool = True,
+    ):
+        self.window = window
+        self.flush = flush
+        self.wait_alone = wait_alone
+        self._lock = threading.Lock()
+        self._batch: Optional[_Batch] = None
+        self._last_request = 0.0
+
+    def submit(self, key: str, request: Any) -> Any:
+        """
+        Add a request to the group ``key`` of the current batch, wait until
+        the batch has been flushed and return the request's result.
+        """
+        member = Member(request)
+        with self._lock:
+            now = time.monotonic()
+            alone = now - self._last_request >= self.window
+            self._last_request = now
+            batch = self._batch
+            leader = batch is None
+            if leader:
+                batch = self._batch = _Batch()
+            assert batch is not None
+            batch.groups.setdefault(key, []).append(member)
+
+        if leader:
+            if self.wait_alone or not alone:
+                time.sleep(self.window)
+            with self._lock:
+                self._batch = None
+            self._flush(batch)
+        else:
+            batch.done.wait()
+
+        if member.error is not None:
+            raise member.error
+        return member.result
+
+    def _flush(self, batch: _Batch) -> None:
+        try:
+            for members in batch.groups.values():
+                try:
+                    self.flush(members)
+                except BaseException as e:
+                    for member in members:
+                        if member.error is None:
+                            member.error = e
+        finally:
+            batch.done.set()
+
+
+def call_in_chunks(
+    ids: List[str], size: int, call: Callable[[List[str]], None]
+) -> Dict[str, BaseException]:
+    """
+    Call ``call`` on ``ids``, at most ``size`` at a time.  One unsuitable ID
+    fails a whole call, so the IDs of a failed call are retried one by one.
+    Return the errors by ID.
+    """
+    errors: Dict[str, BaseException] = {}
+    for i in range(0, len(ids), size):
+        chunk = ids[i : i + size]
+        try:
+            call(chunk)
+        except botocore.exceptions.ClientError as e:
+            if len(chunk) == 1:
+                errors[chunk[0]] = e
+                continue
+            for one_id in chunk:
+                try:
+                    call([one_id])
+                except botocore.exceptions.ClientError as error:
+                    errors[one_id] = error
+    return errors
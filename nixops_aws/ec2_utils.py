@@ -1,19 +1,89 @@
 # -*- coding: utf-8 -*-
 
+# boto, boto3 and botocore.config are imported by the functions that use
+# them: they take a large share of NixOps' startup time, and many commands
+# never talk to AWS.
+
 import os
-import time
-import random
-import nixops.util
-import boto3
-import boto.ec2
-import boto.vpc
-from boto.exception import EC2ResponseError
-from boto.exception import SQSError
-from boto.exception import BotoServerError
-from botocore.exceptions import ClientError
-from boto.pyami.config import Config
-import botocore
-from typing import Tuple
+import sys
+import threading
+import nixops_aws.metrics
+import nixops_aws.throttle
+import nixops_aws.waiter
+from typing import Any, Dict, Optional, Tuple
+
+
+def _parse_ec2_keys(path):
+    """Index the key pairs in an ~/.ec2-keys file by access key ID and alias."""
+    index: Dict[str, Tuple[str, str]] = {}
+    with open(path, "r") as f:
+        for line in f.read().splitlines():
+            line = line.split("#")[0]  # drop comments
+            w = line.split()
+            if len(w) < 2 or len(w) > 3:
+                continue
+            # The first line mentioning a key (as alias or as ID) wins.
+            if len(w) == 3:
+                index.setdefault(w[2], (w[0], w[1]))
+            index.setdefault(w[0], (w[0], w[1]))
+    return index
+
+
+def _parse_aws_credentials(path):
+    """Index the profiles in an ~/.aws/credentials file by access key ID."""
+    from boto.pyami.config import Config
+
+    conf = Config(path)
+    index: Dict[str, Tuple[str, str]] = {}
+    default_key_id = conf.get("default", "aws_access_key_id")
+    if default_key_id:
+        index[default_key_id] = (
+            default_key_id,
+            conf.get("default", "aws_secret_access_key"),
+        )
+    for section in conf.sections():
+        index.setdefault(
+            section,
+            (
+                conf.get(section, "aws_access_key_id"),
+                conf.get(section, "aws_secret_access_key"),
+            ),
+        )
+    return index
+
+
+class _CredentialFileCache:
+    """
+        Parsed credential files, indexed by access key ID.
+
+        Each file is only parsed again when its modification time changes, so
+        repeated lookups cost a stat() and a dictionary lookup.
+    """
+
+    def __init__(self, parse):
+        self._parse = parse
+        self._entries: Dict[str, Tuple[int, Dict[str, Tuple[str, str]]]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, path, access_key_id):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != mtime:
+                entry = (mtime, self._parse(path))
+                self._entries[path] = entry
+        return entry[1].get(access_key_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_ec2_keys_cache = _CredentialFileCache(_parse_ec2_keys)
+_aws_credentials_cache = _CredentialFileCache(_parse_aws_credentials)
 
 
 def fetch_aws_secret_key(access_key_id) -> Tuple[str, str]:
@@ -24,33 +94,15 @@ def fetch_aws_secret_key(access_key_id) -> Tuple[str, str]:
 
     def parse_ec2_keys():
         path = os.path.expanduser("~/.ec2-keys")
-        if os.path.isfile(path):
-            with open(path, "r") as f:
-                contents = f.read()
-                for line in contents.splitlines():
-                    line = line.split("#")[0]  # drop comments
-                    w = line.split()
-                    if len(w) < 2 or len(w) > 3:
-                        continue
-                    if len(w) == 3 and w[2] == access_key_id:
-                        return (w[0], w[1])
-                    if w[0] == access_key_id:
-                        return (access_key_id, w[1])
-        return None
-
-    def parse_aws_credentials():
-        path = os.getenv("AWS_SHARED_CREDENTIALS_FILE", "~/.aws/credentials")
-        if not os.path.exists(os.path.expanduser(path)):
+        if not os.path.isfile(path):
             return None
+        return _ec2_keys_cache.lookup(path, access_key_id)
 
-        conf = Config(os.path.expanduser(path))
-
-        if access_key_id == conf.get("default", "aws_access_key_id"):
-            return (access_key_id, conf.get("default", "aws_secret_access_key"))
-        return (
-            conf.get(access_key_id, "aws_access_key_id"),
-            conf.get(access_key_id, "aws_secret_access_key"),
+    def parse_aws_credentials():
+        path = os.path.expanduser(
+            os.getenv("AWS_SHARED_CREDENTIALS_FILE", "~/.aws/credentials")
         )
+        return _aws_credentials_cache.lookup(path, access_key_id)
 
     def ec2_keys_from_env():
         return (
@@ -81,6 +133,8 @@ def fetch_aws_secret_key(access_key_id) -> Tuple[str, str]:
 
 def connect(region, access_key_id):
     """Connect to the specified EC2 region using the given access key."""
+    import boto.ec2
+
     assert region
     (access_key_id, secret_access_key) = fetch_aws_secret_key(access_key_id)
     conn = boto.ec2.connect_to_region(
@@ -90,23 +144,82 @@ def connect(region, access_key_id):
     )
     if not conn:
         raise Exception("invalid EC2 region ‘{0}’".format(region))
+    nixops_aws.metrics.instrument_boto2_connection(conn, "ec2", region)
     return conn
 
 
+# Upper bound on the number of keep-alive connections each pooled client keeps
+# open.  Deployments run many resources in parallel threads against the same
+# client, so the botocore default of 10 is too small.
+MAX_POOL_CONNECTIONS = 50
+
+_boto3_clients: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+_boto3_clients_lock = threading.Lock()
+
+
+def get_boto3_client(service, region, access_key_id):
+    """
+        Return the process-wide boto3 client for the given service, region and
+        access key ID, creating it on first use.
+
+        boto3 clients are thread-safe, so every resource talking to the same
+        endpoint with the same credentials shares one client and thereby one
+        keep-alive connection pool.  (IAM roles and RDS instances are still
+        managed through boto2, with connections of their own.)
+    """
+    key = (service, region, access_key_id)
+    with _boto3_clients_lock:
+        client = _boto3_clients.get(key)
+        if client is None:
+            import boto3
+            import botocore.config
+
+            (key_id, secret_access_key) = fetch_aws_secret_key(access_key_id)
+            client = boto3.session.Session().client(
+                service,
+                region_name=region,
+                aws_access_key_id=key_id,
+                aws_secret_access_key=secret_access_key,
+                config=botocore.config.Config(
+                    max_pool_connections=MAX_POOL_CONNECTIONS
+                ),
+            )
+            nixops_aws.metrics.instrument_boto3_client(client)
+            _boto3_clients[key] = client
+    return client
+
+
+def boto3_client_stats():
+    """
+        Return the number of pooled boto3 clients and the number of sockets
+        their connection pools have opened so far.  Sockets are counted by
+        the call instrumentation of nixops_aws.metrics, so their number is
+        None unless that is enabled.
+    """
+    with _boto3_clients_lock:
+        clients = len(_boto3_clients)
+
+    sockets = None
+    if nixops_aws.metrics.enabled:
+        sockets = nixops_aws.metrics.recorder.connections()
+    return {"clients": clients, "sockets": sockets}
+
+
+def reset_boto3_clients():
+    """Drop all pooled boto3 clients (e.g. after credentials changed)."""
+    with _boto3_clients_lock:
+        _boto3_clients.clear()
+
+
 def connect_ec2_boto3(region, access_key_id):
     assert region
-    (access_key_id, secret_access_key) = fetch_aws_secret_key(access_key_id)
-    client = boto3.session.Session().client(
-        "ec2",
-        region_name=region,
-        aws_access_key_id=access_key_id,
-        aws_secret_access_key=secret_access_key,
-    )
-    return client
+    return get_boto3_client("ec2", region, access_key_id)
 
 
 def connect_vpc(region, access_key_id):
     """Connect to the specified VPC region using the given access key."""
+    import boto.vpc
+
     assert region
     (access_key_id, secret_access_key) = fetch_aws_secret_key(access_key_id)
     conn = boto.vpc.connect_to_region(
@@ -116,6 +229,7 @@ def connect_vpc(region, access_key_id):
     )
     if not conn:
         raise Exception("invalid VPC region ‘{0}’".format(region))
+    nixops_aws.metrics.instrument_boto2_connection(conn, "ec2", region)
     return conn
 
 
@@ -123,69 +237,43 @@ def get_access_key_id():
     return os.environ.get("EC2_ACCESS_KEY") or os.environ.get("AWS_ACCESS_KEY_ID")
 
 
-def retry(f, error_codes=[], logger=None):
-    """
-        Retry function f up to 7 times. If error_codes argument is empty list, retry on all EC2 response errors,
-        otherwise, only on the specified error codes.
-    """
+def _retryable_errors():
+    from botocore.exceptions import ClientError
 
-    def handle_exception(e):
-        if hasattr(e, "error_code"):
-            err_code = e.error_code
-            err_msg = e.error_message
-        else:
-            err_code = e.response["Error"]["Code"]
-            err_msg = e.response["Error"]["Message"]
-
-        if i == num_retries or (error_codes != [] and err_code not in error_codes):
-            raise e
-        if logger is not None:
-            logger.log(
-                "got (possibly transient) EC2 error code '{0}': {1}. retrying...".format(
-                    err_code, err_msg
-                )
-            )
+    # boto2 errors can only be raised once boto has been loaded, so don't
+    # load it just to catch them.
+    if "boto.exception" not in sys.modules:
+        return (ClientError,)
+    from boto.exception import EC2ResponseError, SQSError, BotoServerError
 
-    def handle_boto3_exception(e):
-        if i == num_retries:
-            raise e
-        if logger is not None:
-            if hasattr(e, "response"):
-                logger.log(
-                    "got (possibly transient) EC2 error '{}', retrying...".format(
-                        str(e.response["Error"])
-                    )
-                )
-
-    i = 0
-    num_retries = 7
-    while i <= num_retries:
-        i += 1
-        next_sleep = 5 + random.random() * (2 ** i)
+    return (EC2ResponseError, SQSError, BotoServerError, ClientError)
 
-        try:
-            return f()
-        except EC2ResponseError as e:
-            handle_exception(e)
-        except SQSError as e:
-            handle_exception(e)
-        except ClientError as e:
-            handle_boto3_exception(e)
-        except BotoServerError as e:
-            if e.error_code == "RequestLimitExceeded":
-                num_retries += 1
-            else:
-                handle_exception(e)
-        except botocore.exceptions.ClientError as e:
-            handle_exception(e)
-        except Exception as e:
-            raise e
 
-        time.sleep(next_sleep)
+def retry(f, error_codes=[], logger=None, service="ec2", region=None, fatal_codes=()):
+    """
+        Retry function f up to 7 times. If error_codes argument is empty list, retry on all EC2 response errors,
+        otherwise, only on the specified error codes (boto3 errors included).  Errors with a code in fatal_codes
+        are never retried.
+
+        Calls are rate limited per (service, region) and throttling errors are
+        retried with backoff, up to a limit per call and as long as the global
+        retry budget lasts; see nixops_aws.throttle.
+    """
+    return nixops_aws.throttle.call_with_retry(
+        f,
+        _retryable_errors,
+        service=service,
+        region=region,
+        error_codes=error_codes,
+        logger=logger,
+        fatal_codes=fatal_codes,
+    )
 
 
 def get_volume_by_id(conn, volume_id, allow_missing=False):
     """Get volume object by volume id."""
+    import boto.exception
+
     try:
         volumes = conn.get_all_volumes([volume_id])
         if len(volumes) != 1:
@@ -197,24 +285,60 @@ def get_volume_by_id(conn, volume_id, allow_missing=False):
     return None
 
 
-def wait_for_volume_available(conn, volume_id, logger, states=["available"]):
+def wait_for_volume_available(
+    region, access_key_id, volume_id, logger, states=["available"]
+):
     """Wait for an EBS volume to become available."""
 
     logger.log_start(
         "waiting for volume ‘{0}’ to become available... ".format(volume_id)
     )
 
-    def check_available():
-        # Allow volume to be missing due to eventual consistency.
-        volume = get_volume_by_id(conn, volume_id, allow_missing=True)
-        logger.log_continue("[{0}] ".format(volume.status))
-        return volume.status in states
-
-    nixops.util.check_wait(check_available, max_tries=90)
+    # Allow volume to be missing due to eventual consistency.  The waiter is
+    # keyed by the configured access key (possibly a profile name), as
+    # get_boto3_client resolves its secret from that.
+    waiter = nixops_aws.waiter.get_waiter("volumes", region, access_key_id)
+    waiter.wait_for_state(volume_id, states, logger=logger, timeout=900)
 
     logger.log_end("")
 
 
+# Number of snapshots deleted at the same time by delete_snapshots().
+MAX_CONCURRENT_DELETES = 16
+
+
+def delete_snapshots(region, access_key_id, snapshot_ids):
+    """
+    Delete EBS snapshots concurrently, through the region's rate limiter.
+    Snapshots that no longer exist count as deleted.  Return the errors of
+    the deletions that failed, by snapshot ID.
+    """
+    import concurrent.futures
+    from botocore.exceptions import ClientError
+
+    client = get_boto3_client("ec2", region, access_key_id)
+
+    def delete(snapshot_id):
+        try:
+            retry(
+                lambda: client.delete_snapshot(SnapshotId=snapshot_id),
+                error_codes=nixops_aws.throttle.TRANSIENT_ERROR_CODES,
+                region=region,
+            )
+        except ClientError as e:
+            if nixops_aws.throttle.error_code(e) != "InvalidSnapshot.NotFound":
+                raise
+
+    snapshot_ids = sorted(set(snapshot_ids))
+    errors = {}
+    with concurrent.futures.ThreadPoolExecutor(MAX_CONCURRENT_DELETES) as pool:
+        futures = {i: pool.submit(delete, i) for i in snapshot_ids}
+    for snapshot_id, future in futures.items():
+        if future.exception() is not None:
+            errors[snapshot_id] = future.exception()
+    return errors
+
+
 def name_to_security_group(conn, name, vpc_id):
     if not vpc_id or name.startswith("sg-"):
         return name
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+SSH host keys verified through the EC2 console.
+
+Once sshd has started, NixOS EC2 images print the fingerprints of their SSH
+host keys on the console, between :data:`FINGERPRINTS_BEGIN` and
+:data:`FINGERPRINTS_END`.  The console output can only be obtained through
+the (authenticated) EC2 API, so a host key fetched over the network with
+ssh-keyscan can be trusted if its fingerprint is among them.  This lets an
+instance generate its own host key on first boot, instead of being passed a
+key in its user data that is readable by anyone on the instance.
+"""
+
+import base64
+import hashlib
+import subprocess
+from typing import List, Optional, Set
+
+FINGERPRINTS_BEGIN = "-----BEGIN SSH HOST KEY FINGERPRINTS-----"
+FINGERPRINTS_END = "-----END SSH HOST KEY FINGERPRINTS-----"
+
+# Seconds ssh-keyscan waits for the host to answer.
+SCAN_TIMEOUT = 10
+
+
+def console_fingerprints(output: str) -> Optional[List[str]]:
+    """
+    Return the host key fingerprints printed last on the console, or None if
+    sshd hasn't printed them (completely) yet.
+    """
+    begin = output.rfind(FINGERPRINTS_BEGIN)
+    if begin == -1:
+        return None
+    end = output.find(FINGERPRINTS_END, begin)
+    if end == -1:
+        return None
+    # Lines look like "256 SHA256:... root@machine (ED25519)".
+    return [
+        line.split()[1]
+        for line in output[begin + len(FINGERPRINTS_BEGIN) : end].splitlines()
+        if len(line.split()) >= 2
+    ]
+
+
+def fingerprints(public_key: str) -> Set[str]:
+    """Return the SHA256 and (legacy) MD5 fingerprints of an OpenSSH public key."""
+    blob = base64.b64decode(public_key.split()[1])
+    sha256 = base64.b64encode(hashlib.sha256(blob).digest()).decode().rstrip("=")
+    md5 = hashlib.md5(blob).hexdigest()
+    return {
+        "SHA256:" + sha256,
+        "MD5:" + ":".join(md5[i : i + 2] for i in range(0, len(md5), 2)),
+        ":".join(md5[i : i + 2] for i in range(0, len(md5), 2)),
+    }
+
+
+def scan(host: str, port: int, key_type: str) -> List[str]:
+    """Return the public host keys of the given type offered by a host."""
+    result = subprocess.run(
+        ["ssh-keyscan", "-T", str(SCAN_TIMEOUT), "-p", str(port), "-t", key_type, host],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        universal_newlines=True,
+    )
+    # Lines look like "host ssh-ed25519 AAAA...".
+    return [
+        " ".join(line.split()[1:3])
+        for line in result.stdout.splitlines()
+        if not line.startswith("#") and len(line.split()) >= 3
+    ]
+
+
+def verified_key(
+    host: str, port: int, key_type: str, trusted_fingerprints: List[str]
+) -> str:
+    """
+    Return the host key of the given type offered by a host, after checking
+    that its fingerprint is among ``trusted_fingerprints``.
+    """
+    keys = scan(host, port, key_type)
+    for key in keys:
+        if fingerprints(key) & set(trusted_fingerprints):
+            return key
+    if not keys:
+        raise Exception("cannot fetch the {0} host key of ‘{1}’".format(key_type, host))
+    raise Exception(
+        "the {0} host key of ‘{1}’ does not match the fingerprints on its "
+        "console".format(key_type, host)
+    )
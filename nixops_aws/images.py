@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of AMI metadata.
+
+Creating a machine needs a few attributes of its AMI (root device type and
+name, block device mappings, ...).  AMI IDs are immutable, so these are
+described once and kept in a JSON file shared by all machines, deployments
+and runs (``$XDG_CACHE_HOME/nixops-aws/images.json`` unless :data:`path` is
+set).  Entries are keyed by region and AMI ID, as AMI IDs are only unique
+within a region.
+
+On a miss, :func:`lookup` describes all the AMIs the deployment still needs
+in that region with one DescribeImages call, so a fleet of machines costs at
+most one call per region, and none at all once its AMIs are cached.  The
+cache is best effort: an unreadable or unwritable file only costs the
+describe calls it would have saved.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import nixops_aws.ec2_utils
+
+# Location of the cache file; None selects the default under $XDG_CACHE_HOME.
+path: Optional[str] = None
+
+# Bumped whenever the format of the cached entries changes.
+VERSION = 1
+
+# The attributes of an image that are cached.
+FIELDS = (
+    "RootDeviceType",
+    "RootDeviceName",
+    "BlockDeviceMappings",
+    "VirtualizationType",
+    "EnaSupport",
+)
+
+# Number of values passed in one image-id filter.
+ID_FILTER_BATCH = 200
+
+_entries: Optional[Dict[str, Dict[str, Any]]] = None
+_entries_path: Optional[str] = None
+_lock = threading.Lock()
+_fetch_locks: Dict[Tuple[str, Optional[str]], threading.Lock] = {}
+
+
+def _path() -> str:
+    if path is not None:
+        return path
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(cache_home, "nixops-aws", "images.json")
+
+
+def _key(region: str, ami: str) -> str:
+    return region + "/" + ami
+
+
+def _read(file_path: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        with open(file_path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != VERSION:
+        return {}
+    return data.get("images", {})
+
+
+def _write(file_path: str, entries: Dict[str, Dict[str, Any]]) -> None:
+    """Replace the cache file atomically, keeping what other runs added to it."""
+    directory = os.path.dirname(file_path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        merged = _read(file_path)
+        merged.update(entries)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".images-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": VERSION, "images": merged}, f, sort_keys=True)
+            os.replace(tmp, file_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        pass
+
+
+def _cached() -> Dict[str, Dict[str, Any]]:
+    """Return the cached entries, loading the cache file on first use."""
+    global _entries, _entries_path
+    file_path = _path()
+    if _entries is None or _entries_path != file_path:
+        _entries = _read(file_path)
+        _entries_path = file_path
+    return _entries
+
+
+def _fetch(
+    region: str, access_key_id: Optional[str], amis: Iterable[str]
+) -> Dict[str, Dict[str, Any]]:
+    # Unlike ImageIds, a filter doesn't fail the whole call when one of the
+    # AMIs doesn't exist.
+    client = nixops_aws.ec2_utils.get_boto3_client("ec2", region, access_key_id)
+    amis = sorted(amis)
+    images: Dict[str, Dict[str, Any]] = {}
+    for i in range(0, len(amis), ID_FILTER_BATCH):
+        filters = [{"Name": "image-id", "Values": amis[i : i + ID_FILTER_BATCH]}]
+        response = nixops_aws.ec2_utils.retry(
+            lambda: client.describe_images(Filters=filters), region=region
+        )
+        for image in response["Images"]:
+            images[image["ImageId"]] = image
+    return images
+
+
+def lookup(
+    region: str,
+    access_key_id: Optional[str],
+    ami: str,
+    related: Callable[[], Iterable[str]] = lambda: (),
+) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached attributes of an AMI, or None if it doesn't exist.  On a
+    miss, the AMIs returned by ``related()`` that are not cached yet are
+    described along with it.
+    """
+    with _lock:
+        entry = _cached().get(_key(region, ami))
+        fetch_lock = _fetch_locks.setdefault((region, access_key_id), threading.Lock())
+    if entry is not None:
+        return entry
+
+    with fetch_lock:
+        # Another machine may have described this AMI while we waited.
+        with _lock:
+            entries = _cached()
+            entry = entries.get(_key(region, ami))
+            if entry is not None:
+                return entry
+            wanted = {ami} | {a for a in related() if _key(region, a) not in entries}
+
+        images = _fetch(region, access_key_id, wanted)
+        fetched = {
+            _key(region, image_id): {f: image[f] for f in FIELDS if f in image}
+            for image_id, image in images.items()
+            # Pending images are not complete yet.
+            if image.get("State", "available") == "available"
+        }
+        with _lock:
+            entries = _cached()
+            entries.update(fetched)
+            if fetched:
+                _write(_path(), fetched)
+
+    image = images.get(ami)
+    return None if image is None else {f: image[f] for f in FIELDS if f in image}
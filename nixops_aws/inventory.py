@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Region-scoped snapshot of the EC2 resources belonging to a deployment.
+
+Checking a deployment used to issue one describe call per resource.  An
+:class:`Inventory` instead fetches every instance, volume, snapshot, address
+and subnet of a region once, using paginated describes filtered on the
+``CharonNetworkUUID`` tag that ``get_common_tags`` writes, and serves lookups
+from an in-memory index.
+
+A resource that is not found in the snapshot is not necessarily gone (it may
+be untagged or younger than the snapshot), so callers fall back to a direct
+describe when a lookup returns None.  :meth:`Inventory.describe` makes that
+fallback fleet-wide: the resources of all machines missing from the snapshot
+are described together, by ID, on the first miss.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import nixops_aws.ec2_utils
+
+# How long a fetched snapshot of one resource kind is considered current.
+MAX_AGE = 30.0
+
+# Resource kind -> (describe operation, result key, id key, filter on tag).
+# Elastic IPs are not tagged by NixOps, but there are few enough of them per
+# region to fetch them all.
+KINDS: Dict[str, Tuple[str, str, str, bool]] = {
+    "instances": ("describe_instances", "Reservations", "InstanceId", True),
+    "volumes": ("describe_volumes", "Volumes", "VolumeId", True),
+    "snapshots": ("describe_snapshots", "Snapshots", "SnapshotId", True),
+    "addresses": ("describe_addresses", "Addresses", "PublicIp", False),
+    "subnets": ("describe_subnets", "Subnets", "SubnetId", True),
+}
+
+# Filter selecting resources of a kind by ID.  Unlike the *Ids parameters,
+# a filter doesn't fail the whole call when one of the IDs no longer exists.
+ID_FILTERS = {
+    "instances": "instance-id",
+    "volumes": "volume-id",
+    "snapshots": "snapshot-id",
+}
+
+# Number of values passed in one ID filter.
+ID_FILTER_BATCH = 200
+
+# DescribeInstanceStatus accepts at most this many instance IDs per call.
+INSTANCE_STATUS_BATCH = 100
+
+
+class Inventory:
+    """Snapshot of one deployment's EC2 resources in one region."""
+
+    def __init__(self, depl_uuid: str, region: str, access_key_id: str):
+        self.depl_uuid = depl_uuid
+        self.region = region
+        self.access_key_id = access_key_id
+        self._index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._locks = {kind: threading.Lock() for kind in KINDS}
+        self._locks["instance_status"] = threading.Lock()
+        # Kind -> (time of the snapshot they complement, {ID: describe result
+        # or None}) for the resources looked up by describe().
+        self._described: Dict[str, Tuple[Optional[float], Dict[str, Any]]] = {}
+        self._described_lock = threading.Lock()
+        self._status_instance_ids: Set[str] = set()
+
+    def _client(self):
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "ec2", self.region, self.access_key_id
+        )
+
+    def _describe(self, operation: str, result_key: str, **kwargs) -> List[Any]:
+        client = self._client()
+
+        def fetch_pages():
+            if client.can_paginate(operation):
+                return list(client.get_paginator(operation).paginate(**kwargs))
+            return [getattr(client, operation)(**kwargs)]
+
+        items: List[Any] = []
+        for page in nixops_aws.ec2_utils.retry(fetch_pages, region=self.region):
+            items.extend(page.get(result_key, []))
+        return items
+
+    def _fetch(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        operation, result_key, id_key, tagged = KINDS[kind]
+        kwargs: Dict[str, Any] = {}
+        if tagged:
+            kwargs["Filters"] = [
+                {"Name": "tag:CharonNetworkUUID", "Values": [self.depl_uuid]}
+            ]
+        if kind == "snapshots":
+            kwargs["OwnerIds"] = ["self"]
+
+        items = self._describe(operation, result_key, **kwargs)
+        if kind == "instances":
+            items = [i for r in items for i in r["Instances"]]
+        return {item[id_key]: item for item in items}
+
+    def _fresh(self, kind: str) -> bool:
+        fetched_at = self._fetched_at.get(kind)
+        return fetched_at is not None and time.monotonic() - fetched_at < MAX_AGE
+
+    def all(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        """Return all resources of the given kind, fetching them if needed."""
+        with self._locks[kind]:
+            if not self._fresh(kind):
+                self._index[kind] = self._fetch(kind)
+                self._fetched_at[kind] = time.monotonic()
+            return self._index[kind]
+
+    def get(self, kind: str, resource_id: str) -> Optional[Dict[str, Any]]:
+        """Return the describe result for a resource, or None if not in the snapshot."""
+        return self.all(kind).get(resource_id)
+
+    def _described_items(self, kind: str) -> Dict[str, Any]:
+        # Must be called with _described_lock held.
+        fetched_at, items = self._described.get(kind, (None, {}))
+        if fetched_at != self._fetched_at.get(kind):
+            # The snapshot was refreshed or invalidated since.
+            items = {}
+            self._described[kind] = (self._fetched_at.get(kind), items)
+        return items
+
+    def describe(
+        self,
+        kind: str,
+        resource_id: str,
+        related: Callable[[], Iterable[str]] = lambda: (),
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the describe result for a resource, or None if it doesn't exist.
+        Resources missing from the snapshot are described by ID, together with
+        the IDs returned by `related` (typically the other resources of the
+        same kind in the deployment), so that those find their results here
+        without a call of their own.
+        """
+        snapshot = self.all(kind)
+        if resource_id in snapshot:
+            return snapshot[resource_id]
+
+        with self._described_lock:
+            items = self._described_items(kind)
+            if resource_id not in items:
+                wanted = sorted(
+                    ({resource_id} | set(related())) - set(snapshot) - set(items)
+                )
+                operation, result_key, id_key, _ = KINDS[kind]
+                for i in range(0, len(wanted), ID_FILTER_BATCH):
+                    batch = wanted[i : i + ID_FILTER_BATCH]
+                    found = self._describe(
+                        operation,
+                        result_key,
+                        Filters=[{"Name": ID_FILTERS[kind], "Values": batch}],
+                    )
+                    if kind == "instances":
+                        found = [i for r in found for i in r["Instances"]]
+                    items.update(dict.fromkeys(batch))
+                    items.update((item[id_key], item) for item in found)
+            return items[resource_id]
+
+    def _known_instance_ids(self) -> List[str]:
+        known = set(self.all("instances"))
+        with self._described_lock:
+            items = self._described_items("instances")
+            known.update(i for i, instance in items.items() if instance is not None)
+        return sorted(known)
+
+    def _fetch_instance_status(
+        self, instance_ids: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        statuses: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(instance_ids), INSTANCE_STATUS_BATCH):
+            for status in self._describe(
+                "describe_instance_status",
+                "InstanceStatuses",
+                InstanceIds=instance_ids[i : i + INSTANCE_STATUS_BATCH],
+                IncludeAllInstances=True,
+            ):
+                statuses[status["InstanceId"]] = status
+        return statuses
+
+    def instance_status(self, instance_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the DescribeInstanceStatus entry of an instance.  Statuses of all
+        instances in the snapshot or found by describe() are fetched together;
+        other instances are looked up individually.
+        """
+        instance_ids = self._known_instance_ids()
+        if instance_id not in instance_ids:
+            statuses = self._describe(
+                "describe_instance_status",
+                "InstanceStatuses",
+                InstanceIds=[instance_id],
+                IncludeAllInstances=True,
+            )
+            return statuses[0] if statuses else None
+
+        with self._locks["instance_status"]:
+            # Instances found by describe() after the statuses were fetched
+            # cause one more fetch, rather than one call each.
+            if (
+                not self._fresh("instance_status")
+                or instance_id not in self._status_instance_ids
+            ):
+                self._index["instance_status"] = self._fetch_instance_status(
+                    instance_ids
+                )
+                self._status_instance_ids = set(instance_ids)
+                self._fetched_at["instance_status"] = time.monotonic()
+            return self._index["instance_status"].get(instance_id)
+
+    def invalidate(self, kind: Optional[str] = None) -> None:
+        """Forget the snapshot of one resource kind, or of all of them."""
+        if kind is None:
+            self._fetched_at.clear()
+        else:
+            self._fetched_at.pop(kind, None)
+
+
+_inventories: Dict[Tuple[str, str, str], Inventory] = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(depl_uuid: str, region: str, access_key_id: str) -> Inventory:
+    """Return the shared inventory of a deployment in a region."""
+    key = (depl_uuid, region, access_key_id)
+    with _inventories_lock:
+        inventory = _inventories.get(key)
+        if inventory is None:
+            inventory = _inventories[key] = Inventory(depl_uuid, region, access_key_id)
+        return inventory
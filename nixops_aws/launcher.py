@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Coalesced EC2 instance launches.
+
+RunInstances can launch many identical instances at once.  A :class:`Launcher`
+collects the launches issued by concurrently deploying machines of the same
+launch group (``deployment.ec2.launchGroup``) for a short window (see
+:mod:`nixops_aws.coalesce`), groups them by identical parameters and issues
+one RunInstances call per group, with a client token shared by the group.
+Callers block until their instance has been launched and get the instance
+with the same AMI launch index as their position in the group, so launching
+stays synchronous from a machine's point of view.
+
+All instances of a RunInstances call get the same user data, and thus the
+same SSH host key: that is why machines have to opt in to sharing launches,
+and why the machines of a launch group share their host key (see
+:meth:`Launcher.host_key`).
+
+Tags differ per machine, so only the tags common to a group are applied at
+launch; callers get the tag specifications the group was launched with and
+apply the rest themselves.
+"""
+
+import json
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import nixops.util
+
+import nixops_aws.coalesce
+import nixops_aws.ec2_utils
+
+# How long the first machine waits for others to join its launch.  Machines
+# of a group get here after a few describe calls of their own, which take
+# longer to line up than the tag writes coalesced by nixops_aws.tagging.
+COALESCE_WINDOW = 1.0
+
+# Parameters that differ per machine without preventing a shared launch.
+PER_MACHINE_PARAMETERS = ("ClientToken", "MinCount", "MaxCount", "TagSpecifications")
+
+
+class _Launch:
+    def __init__(
+        self,
+        args: Dict[str, Any],
+        prepare: Callable[[str, int], None],
+        fatal_codes: Tuple[str, ...],
+    ):
+        self.args = args
+        self.prepare = prepare
+        self.fatal_codes = fatal_codes
+
+
+def _common_tag_specifications(launches: List[_Launch]) -> List[Dict[str, Any]]:
+    """Return the tags that all launches want applied to each resource type."""
+    common: Optional[Dict[str, Dict[str, str]]] = None
+    for launch in launches:
+        wanted = {
+            spec["ResourceType"]: {t["Key"]: t["Value"] for t in spec["Tags"]}
+            for spec in launch.args.get("TagSpecifications", [])
+        }
+        if common is None:
+            common = wanted
+            continue
+        common = {
+            resource_type: {
+                k: v
+                for k, v in tags.items()
+                if wanted.get(resource_type, {}).get(k) == v
+            }
+            for resource_type, tags in common.items()
+        }
+    return [
+        {
+            "ResourceType": resource_type,
+            "Tags": [{"Key": k, "Value": v} for k, v in sorted(tags.items())],
+        }
+        for resource_type, tags in sorted((common or {}).items())
+        if tags
+    ]
+
+
+class Launcher:
+    """Coalesces RunInstances calls for one region and access key."""
+
+    def __init__(self, region: str, access_key_id: Optional[str]):
+        self.region = region
+        self.access_key_id = access_key_id
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._coalescer = nixops_aws.coalesce.Coalescer(COALESCE_WINDOW, self._launch)
+        self._host_keys: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+    def host_key(self, group: str, key_type: str) -> Tuple[str, str]:
+        """Return the (private, public) SSH host key pair of a launch group."""
+        with self._lock:
+            key = self._host_keys.get((group, key_type))
+            if key is None:
+                key = self._host_keys[(group, key_type)] = nixops.util.create_key_pair(
+                    type=key_type
+                )
+            return key
+
+    def run_instance(
+        self,
+        group: str,
+        args: Dict[str, Any],
+        prepare: Callable[[str, int], None],
+        fatal_codes: Iterable[str] = (),
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Launch one instance with the RunInstances parameters ``args``, sharing
+        the call with the machines of the same group launching identical
+        instances.  ``prepare(client_token, launch_index)`` is called before
+        the launch and must record both, so that the instance can be found
+        should the launch be interrupted.  Errors with a code in
+        ``fatal_codes`` are not retried.  Return the instance and the tag
+        specifications it was launched with.
+        """
+        params = {k: v for k, v in args.items() if k not in PER_MACHINE_PARAMETERS}
+        fatal_codes = tuple(sorted(fatal_codes))
+        key = json.dumps([group, params, fatal_codes], sort_keys=True, default=str)
+        return self._coalescer.submit(key, _Launch(args, prepare, fatal_codes))
+
+    def _launch(self, members: List[nixops_aws.coalesce.Member]) -> None:
+        client = nixops_aws.ec2_utils.get_boto3_client(
+            "ec2", self.region, self.access_key_id
+        )
+        launches = [member.request for member in members]
+        client_token = nixops.util.generate_random_string(length=48)
+        for launch_index, launch in enumerate(launches):
+            launch.prepare(client_token, launch_index)
+
+        args = {
+            k: v for k, v in launches[0].args.items() if k not in PER_MACHINE_PARAMETERS
+        }
+        tag_specifications = _common_tag_specifications(launches)
+        if tag_specifications:
+            args["TagSpecifications"] = tag_specifications
+        args.update(
+            ClientToken=client_token, MinCount=len(members), MaxCount=len(members)
+        )
+        reservation = nixops_aws.ec2_utils.retry(
+            lambda: client.run_instances(**args),
+            region=self.region,
+            fatal_codes=launches[0].fatal_codes,
+        )
+        with self._lock:
+            self.calls += 1
+
+        instances = {i["AmiLaunchIndex"]: i for i in reservation["Instances"]}
+        for launch_index, member in enumerate(members):
+            member.result = (instances[launch_index], tag_specifications)
+
+
+_launchers: Dict[Tuple[str, Optional[str]], Launcher] = {}
+_launchers_lock = threading.Lock()
+
+
+def get_launcher(region: str, access_key_id: Optional[str]) -> Launcher:
+    """Return the shared launcher for a region and access key."""
+    key = (region, access_key_id)
+    with _launchers_lock:
+        launcher = _launchers.get(key)
+        if launcher is None:
+            launcher = _launchers[key] = Launcher(region, access_key_id)
+        return launcher
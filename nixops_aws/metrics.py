@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Optional instrumentation of the AWS API calls made by this plugin.
+
+Set ``NIXOPS_AWS_METRICS`` to enable it: every boto3 call (through
+botocore's event system) and every boto2 EC2/VPC request (by wrapping the
+connections made in ``ec2_utils``) is recorded with its operation, region,
+latency, retries, throttles and the resource it was made for.  When the
+nixops command exits, a human-readable summary is written to stderr; if the
+variable holds a path rather than ``1``, a JSON report is written there too.
+
+The boto3 clients that made calls are counted as well, together with the
+number of keep-alive connections their pools had to open.  A pool only opens
+a connection when all of its open ones are busy, so that is the peak number
+of calls in flight through the client at once.
+
+The resource a call is attributed to is tracked per thread: resources
+announce themselves through :func:`set_current_resource` whenever they talk
+to AWS, and nixops runs each resource in its own worker thread.
+
+When the variable is unset nothing is registered or wrapped, so the only
+cost is a boolean check in the retry path.
+"""
+
+import atexit
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import nixops_aws.throttle
+
+ENV_VAR = "NIXOPS_AWS_METRICS"
+
+# Number of operations and resources listed in the human summary.
+TOP_N = 10
+
+UNKNOWN_RESOURCE = "(none)"
+
+
+def _configured() -> Optional[str]:
+    value = os.environ.get(ENV_VAR, "")
+    return None if value in ("", "0") else value
+
+
+enabled = _configured() is not None
+
+
+class _Call:
+    __slots__ = (
+        "resource",
+        "service",
+        "region",
+        "operation",
+        "start",
+        "latency",
+        "error_code",
+        "retries",
+    )
+
+    def __init__(
+        self, resource, service, region, operation, start, latency, error_code, retries
+    ):
+        self.resource = resource
+        self.service = service
+        self.region = region
+        self.operation = operation
+        self.start = start
+        self.latency = latency
+        self.error_code = error_code
+        self.retries = retries
+
+
+class Recorder:
+    """Collects API call records from all threads."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.calls: List[_Call] = []
+        # Retries issued by ec2_utils.retry, per resource.  Throttles are
+        # counted there as well: that loop sees them for boto2 and boto3 alike,
+        # whereas call records only know the error code of boto3 calls.
+        self.retries: Dict[str, int] = {}
+        self.throttles: Dict[str, int] = {}
+        # Client number -> calls currently in flight, and the most there were.
+        self.in_flight: Dict[int, int] = {}
+        self.peak_in_flight: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def set_current_resource(self, name: Optional[str]) -> None:
+        self._local.resource = name
+
+    def current_resource(self) -> str:
+        return getattr(self._local, "resource", None) or UNKNOWN_RESOURCE
+
+    def record_call(
+        self,
+        service: str,
+        region: Optional[str],
+        operation: str,
+        start: float,
+        latency: float,
+        error_code: Optional[str] = None,
+        retries: int = 0,
+    ) -> None:
+        call = _Call(
+            self.current_resource(),
+            service,
+            region,
+            operation,
+            start - self.started,
+            latency,
+            error_code,
+            retries,
+        )
+        with self._lock:
+            self.calls.append(call)
+
+    def call_started(self, client: int) -> None:
+        with self._lock:
+            in_flight = self.in_flight[client] = self.in_flight.get(client, 0) + 1
+            self.peak_in_flight[client] = max(
+                self.peak_in_flight.get(client, 0), in_flight
+            )
+
+    def call_finished(self, client: int) -> None:
+        with self._lock:
+            if client in self.in_flight:
+                self.in_flight[client] -= 1
+
+    def connections(self) -> int:
+        """Return the number of connections opened by the clients' pools."""
+        with self._lock:
+            return sum(self.peak_in_flight.values())
+
+    def record_retry(self, kind: str) -> None:
+        resource = self.current_resource()
+        counter = (
+            self.throttles if kind == nixops_aws.throttle.THROTTLE else self.retries
+        )
+        with self._lock:
+            counter[resource] = counter.get(resource, 0) + 1
+
+    def report(self) -> Dict[str, Any]:
+        """Aggregate the recorded calls into a JSON-serialisable report."""
+        with self._lock:
+            calls = list(self.calls)
+            outer_retries = dict(self.retries)
+            outer_throttles = dict(self.throttles)
+            clients = len(self.peak_in_flight)
+            connections = sum(self.peak_in_flight.values())
+
+        def is_throttle(call):
+            return (
+                nixops_aws.throttle.classify_error(call.error_code)
+                == nixops_aws.throttle.THROTTLE
+            )
+
+        operations: Dict[tuple, Dict[str, Any]] = {}
+        resources: Dict[str, Dict[str, Any]] = {}
+        for call in calls:
+            op = operations.setdefault(
+                (call.service, call.operation, call.region),
+                {
+                    "service": call.service,
+                    "operation": call.operation,
+                    "region": call.region,
+                    "count": 0,
+                    "total_time": 0.0,
+                    "max_time": 0.0,
+                    "retries": 0,
+                    "throttles": 0,
+                    "errors": 0,
+                },
+            )
+            op["count"] += 1
+            op["total_time"] += call.latency
+            op["max_time"] = max(op["max_time"], call.latency)
+            op["retries"] += call.retries
+            op["throttles"] += int(is_throttle(call))
+            op["errors"] += int(call.error_code is not None)
+
+            res = resources.setdefault(
+                call.resource,
+                {
+                    "name": call.resource,
+                    "calls": 0,
+                    "api_time": 0.0,
+                    "first_call": call.start,
+                    "last_call_end": 0.0,
+                    "retries": outer_retries.get(call.resource, 0),
+                    "throttles": outer_throttles.get(call.resource, 0),
+                    "operations": {},
+                },
+            )
+            res["calls"] += 1
+            res["api_time"] += call.latency
+            res["first_call"] = min(res["first_call"], call.start)
+            res["last_call_end"] = max(res["last_call_end"], call.start + call.latency)
+            res["retries"] += call.retries
+            res["operations"][call.operation] = (
+                res["operations"].get(call.operation, 0.0) + call.latency
+            )
+
+        for res in resources.values():
+            res["span"] = res["last_call_end"] - res["first_call"]
+            res["operations"] = [
+                {"operation": name, "total_time": t}
+                for name, t in sorted(
+                    res["operations"].items(), key=lambda x: x[1], reverse=True
+                )
+            ]
+
+        # The resource whose last call finished last held up the command.
+        critical = max(
+            resources.values(), key=lambda r: r["last_call_end"], default=None
+        )
+
+        return {
+            "command": " ".join(sys.argv[1:2]),
+            "wall_time": time.monotonic() - self.started,
+            "totals": {
+                "calls": len(calls),
+                "api_time": sum(c.latency for c in calls),
+                "retries": sum(c.retries for c in calls) + sum(outer_retries.values()),
+                "throttles": sum(outer_throttles.values()),
+                "clients": clients,
+                "connections": connections,
+            },
+            "operations": sorted(
+                operations.values(), key=lambda o: o["total_time"], reverse=True
+            ),
+            "resources": sorted(
+                resources.values(), key=lambda r: r["last_call_end"], reverse=True
+            ),
+            "critical_path": critical["name"] if critical else None,
+        }
+
+
+def format_summary(report: Dict[str, Any]) -> str:
+    """Render a report as a short human-readable summary."""
+    totals = report["totals"]
+    lines = [
+        "AWS API usage for ‘{0}’: {1} calls, {2:.1f}s API time in {3:.1f}s, "
+        "{4} retries, {5} throttles, {6} connections from {7} clients".format(
+            report["command"],
+            totals["calls"],
+            totals["api_time"],
+            report["wall_time"],
+            totals["retries"],
+            totals["throttles"],
+            totals["connections"],
+            totals["clients"],
+        ),
+        "top operations by time:",
+    ]
+    for op in report["operations"][:TOP_N]:
+        lines.append(
+            "  {0}.{1} ({2}): {3} calls, {4:.2f}s total, {5:.2f}s max".format(
+                op["service"],
+                op["operation"],
+                op["region"] or "global",
+                op["count"],
+                op["total_time"],
+                op["max_time"],
+            )
+        )
+    lines.append("top operations by count:")
+    for op in sorted(report["operations"], key=lambda o: o["count"], reverse=True)[
+        :TOP_N
+    ]:
+        lines.append(
+            "  {0}.{1} ({2}): {3} calls".format(
+                op["service"], op["operation"], op["region"] or "global", op["count"]
+            )
+        )
+    lines.append("resources by completion:")
+    for res in report["resources"][:TOP_N]:
+        mostly = ""
+        if res["operations"]:
+            slowest = res["operations"][0]
+            mostly = ", mostly {0} ({1:.1f}s)".format(
+                slowest["operation"], slowest["total_time"]
+            )
+        lines.append(
+            "  {0}{1}: done at {2:.1f}s, {3} calls, {4:.1f}s API time{5}".format(
+                res["name"],
+                " (critical path)" if res["name"] == report["critical_path"] else "",
+                res["last_call_end"],
+                res["calls"],
+                res["api_time"],
+                mostly,
+            )
+        )
+    return "\n".join(lines)
+
+
+recorder = Recorder()
+
+_client_numbers = itertools.count()
+
+
+def set_current_resource(name: Optional[str]) -> None:
+    """Attribute the AWS calls made by this thread to the named resource."""
+    if enabled:
+        recorder.set_current_resource(name)
+
+
+def record_retry(kind: str) -> None:
+    """Count a retry issued by ec2_utils.retry (see nixops_aws.throttle)."""
+    if enabled:
+        recorder.record_retry(kind)
+
+
+def instrument_boto3_client(client) -> None:
+    """Record the calls made through a boto3 client."""
+    if not enabled:
+        return
+    service = client.meta.service_model.service_name
+    region = client.meta.region_name
+    number = next(_client_numbers)
+
+    def before_call(context, **kwargs):
+        context["nixops_aws_metrics_start"] = time.monotonic()
+        recorder.call_started(number)
+
+    def after_call_error(context, **kwargs):
+        if context.pop("nixops_aws_metrics_start", None) is not None:
+            recorder.call_finished(number)
+
+    def after_call(parsed, model, context, **kwargs):
+        start = context.pop("nixops_aws_metrics_start", None)
+        if start is None:
+            return
+        recorder.call_finished(number)
+        recorder.record_call(
+            service,
+            region,
+            model.name,
+            start,
+            time.monotonic() - start,
+            error_code=parsed.get("Error", {}).get("Code"),
+            retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+        )
+
+    client.meta.events.register("before-call.*.*", before_call)
+    client.meta.events.register("after-call.*.*", after_call)
+    client.meta.events.register("after-call-error.*.*", after_call_error)
+
+
+def instrument_boto2_connection(conn, service: str, region: str) -> None:
+    """Record the requests made through a boto2 query connection."""
+    if not enabled:
+        return
+    make_request = conn.make_request
+
+    def instrumented_make_request(action, *args, **kwargs):
+        start = time.monotonic()
+        error_code = None
+        try:
+            response = make_request(action, *args, **kwargs)
+            if response.status >= 300:
+                error_code = str(response.status)
+            return response
+        except Exception as e:
+            error_code = type(e).__name__
+            raise
+        finally:
+            recorder.record_call(
+                service, region, action, start, time.monotonic() - start, error_code
+            )
+
+    conn.make_request = instrumented_make_request
+
+
+def _emit_report() -> None:
+    destination = _configured()
+    report = recorder.report()
+    if not report["totals"]["calls"]:
+        return
+    sys.stderr.write(format_summary(report) + "\n")
+    if destination not in (None, "1"):
+        with open(destination, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if enabled:
+    atexit.register(_emit_report)
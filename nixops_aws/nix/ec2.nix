@@ -218,6 +218,20 @@ in
       '';
     };
 
+    deployment.ec2.fallbackZones = mkOption {
+      default = [];
+      example = [ "us-east-1d" "us-east-1e" ];
+      type = types.listOf types.str;
+      description = ''
+        Availability zones to try, in order, when EC2 has no capacity for
+        the instance in <option>deployment.ec2.zone</option>.  Ignored
+        when the zone is determined by
+        <option>deployment.ec2.subnetId</option> or by an existing EBS
+        volume in <option>deployment.ec2.blockDeviceMapping</option>.
+        The zone the instance was launched in is kept for its lifetime.
+      '';
+    };
+
     deployment.ec2.tenancy = mkOption {
       default = "default";
       type = types.enum [ "default" "dedicated" "host" ];
@@ -251,6 +265,49 @@ in
       '';
     };
 
+    deployment.ec2.createVolumesAtLaunch = mkOption {
+      default = false;
+      type = types.bool;
+      description = ''
+        Whether to create the EBS volumes of
+        <option>deployment.ec2.blockDeviceMapping</option> that are new
+        (<literal>disk = ""</literal>) or restored from a snapshot as part of
+        launching the instance, rather than creating and attaching them
+        once it is running.  EC2 then provisions them along with the
+        instance.  Only applies to the creation of the instance; disks
+        added later are still created and attached separately.
+      '';
+    };
+
+    deployment.ec2.fastSnapshotRestore = mkOption {
+      default = false;
+      type = types.bool;
+      description = ''
+        Whether <command>nixops restore</command> enables Fast Snapshot
+        Restore for the snapshots of the backup in the machine's
+        availability zone while it creates the restored volumes, so that
+        these deliver their full performance right away instead of
+        loading their blocks from S3 on first access.  Fast Snapshot
+        Restore is billed per snapshot and hour, and is disabled again
+        once the volumes have been created.
+      '';
+    };
+
+    deployment.ec2.hostKeyFromConsole = mkOption {
+      default = false;
+      type = types.bool;
+      description = ''
+        Whether a new instance generates its own SSH host key on first
+        boot, rather than being passed a temporary one in its user data
+        that NixOps replaces over SSH (restarting sshd) once the instance
+        is up.  The generated key is fetched with
+        <command>ssh-keyscan</command> and only trusted if its
+        fingerprint is among those the NixOS EC2 image prints on the
+        instance's console once sshd has started.  Requires an image that
+        prints these fingerprints, as NixOS EC2 images do.
+      '';
+    };
+
     deployment.ec2.ami = mkOption {
       example = "ami-00000000";
       type = types.str;
@@ -271,6 +328,18 @@ in
       '';
     };
 
+    deployment.ec2.fallbackInstanceTypes = mkOption {
+      default = [];
+      example = [ "m5a.large" "m4.large" ];
+      type = types.listOf types.str;
+      description = ''
+        Instance types to try, in order, when EC2 has no capacity for
+        <option>deployment.ec2.instanceType</option> in any of the
+        acceptable zones.  An instance running with one of these types is
+        not changed back to <option>deployment.ec2.instanceType</option>.
+      '';
+    };
+
     deployment.ec2.instanceId = mkOption {
       default = "";
       type = types.str;
@@ -384,6 +453,20 @@ in
       '';
     };
 
+    deployment.ec2.launchGroup = mkOption {
+      default = "";
+      example = "web";
+      type = types.str;
+      description = ''
+        Machines in the same launch group that are created at the same
+        time with identical EC2 parameters are launched together, with a
+        single request to EC2.  All instances launched by one request get
+        the same user data, which carries the SSH host key, so the machines
+        of a launch group share their SSH host key.  The default ("")
+        launches every machine on its own, with its own host key.
+      '';
+    };
+
     deployment.ec2.tags = commonEC2Options.tags;
 
     deployment.ec2.blockDeviceMapping = mkOption {
@@ -437,6 +520,27 @@ in
       '';
     };
 
+    deployment.ec2.spotInstancePlacement = mkOption {
+      default = false;
+      type = types.bool;
+      description = ''
+        Whether to choose the availability zone (and, among
+        <option>deployment.ec2.fallbackInstanceTypes</option>, the
+        instance type) of a spot instance by the spot placement scores
+        and current spot prices of the region, so that the request is
+        likely to be fulfilled quickly below
+        <option>deployment.ec2.spotInstancePrice</option>.  The zones
+        considered are <option>deployment.ec2.zone</option> and
+        <option>deployment.ec2.fallbackZones</option>, or all zones of
+        the region if these are not set.  Ignored when the zone is
+        determined by <option>deployment.ec2.subnetId</option> or by an
+        existing EBS volume in
+        <option>deployment.ec2.blockDeviceMapping</option>.  Placement
+        scores require the <literal>ec2:GetSpotPlacementScores</literal>
+        permission; without it, zones are chosen by price alone.
+      '';
+    };
+
     deployment.ec2.spotInstanceRequestType = mkOption {
       default = "one-time";
       type = types.enum [ "one-time" "persistent" ];
@@ -2,6 +2,8 @@ import os.path
 import nixops.plugins
 from nixops.plugins import Plugin
 
+import nixops_aws.resources
+
 
 class NixopsAWSPlugin(Plugin):
     @staticmethod
@@ -11,10 +13,8 @@ class NixopsAWSPlugin(Plugin):
     @staticmethod
     def load():
         return [
-            "nixops_aws.resources",
-            "nixops_aws.backends.ec2",
-            "nixops_aws.resources.ec2_keypair",
-        ]
+            "nixops_aws.resources." + name for name in nixops_aws.resources.__all__
+        ] + ["nixops_aws.backends.ec2"]
 
 
 @nixops.plugins.hookimpl
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Coalesced instance state changes.
+
+StopInstances, StartInstances and RebootInstances accept many instance IDs.
+A :class:`PowerBatcher` collects the state changes requested by concurrently
+stopping, starting or rebooting machines for a short window (see
+:mod:`nixops_aws.coalesce`), groups them by operation and parameters (a
+forced stop is a separate group) and issues one call per group.  Callers
+block until their call has been made, so the operations stay synchronous
+from a machine's point of view.  As machines that time out waiting for a
+stop do so at about the same time, their forced stops are coalesced as
+well.
+
+One unsuitable instance (for instance one that is still stopping when asked
+to start) fails the whole call; the instances of a failed group are then
+retried one by one, so that each caller gets its own result.
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import nixops_aws.coalesce
+import nixops_aws.ec2_utils
+
+# How long the first caller waits for others to join its batch.
+COALESCE_WINDOW = 0.2
+
+# Instance IDs passed in one call.
+MAX_INSTANCES_PER_CALL = 200
+
+OPERATIONS = ("stop_instances", "start_instances", "reboot_instances")
+
+# Errors about individual instances, which retrying the call doesn't help.
+FATAL_CODES = (
+    "IncorrectInstanceState",
+    "InvalidInstanceID.NotFound",
+    "InvalidInstanceID.Malformed",
+    "UnsupportedOperation",
+)
+
+
+class PowerBatcher:
+    """Coalesces instance state changes for one region and access key."""
+
+    def __init__(self, region: str, access_key_id: Optional[str]):
+        self.region = region
+        self.access_key_id = access_key_id
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._coalescer = nixops_aws.coalesce.Coalescer(COALESCE_WINDOW, self._flush)
+
+    def call(self, operation: str, instance_id: str, **params: Any) -> None:
+        """
+        Perform ``operation`` (one of :data:`OPERATIONS`) on the instance,
+        sharing the call with other machines asking for the same.
+        """
+        assert operation in OPERATIONS
+        self._coalescer.submit(
+            json.dumps([operation, params], sort_keys=True),
+            (operation, params, instance_id),
+        )
+
+    def _call(
+        self, client, operation: str, params: Dict[str, Any], instance_ids: List[str]
+    ) -> None:
+        nixops_aws.ec2_utils.retry(
+            lambda: getattr(client, operation)(InstanceIds=instance_ids, **params),
+            region=self.region,
+            fatal_codes=FATAL_CODES,
+        )
+        with self._lock:
+            self.calls += 1
+
+    def _flush(self, members: List[nixops_aws.coalesce.Member]) -> None:
+        client = nixops_aws.ec2_utils.get_boto3_client(
+            "ec2", self.region, self.access_key_id
+        )
+        operation, params, _ = members[0].request
+        instance_ids: List[str] = []
+        for member in members:
+            if member.request[2] not in instance_ids:
+                instance_ids.append(member.request[2])
+        errors = nixops_aws.coalesce.call_in_chunks(
+            instance_ids,
+            MAX_INSTANCES_PER_CALL,
+            lambda chunk: self._call(client, operation, params, chunk),
+        )
+        for member in members:
+            member.error = errors.get(member.request[2])
+
+
+_batchers: Dict[Tuple[str, Optional[str]], PowerBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_power_batcher(region: str, access_key_id: Optional[str]) -> PowerBatcher:
+    """Return the shared power batcher for a region and access key."""
+    key = (region, access_key_id)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = PowerBatcher(region, access_key_id)
+        return batcher
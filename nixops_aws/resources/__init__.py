@@ -1,3 +1,15 @@
+"""
+Resource types provided by this plugin.
+
+The modules listed in ``__all__`` are imported on first attribute access
+rather than with the package, so that importing a single resource module or
+the EC2 backend doesn't load all the others.  ``plugin.load()`` still lists
+every module, as nixops finds resource types among the loaded classes.
+"""
+
+import importlib
+from typing import TYPE_CHECKING
+
 __all__ = (
     "aws_vpn_connection",
     "aws_vpn_connection_route",
@@ -39,41 +51,50 @@ __all__ = (
     "vpc_subnet",
 )
 
-from . import aws_vpn_connection
-from . import aws_vpn_connection_route
-from . import aws_vpn_gateway
-from . import cloudwatch_log_group
-from . import cloudwatch_log_stream
-from . import cloudwatch_metric_alarm
-from . import ebs_volume
-from . import ec2_common
-from . import ec2_keypair
-from . import ec2_placement_group
-from . import ec2_rds_dbinstance
-from . import ec2_rds_dbsecurity_group
-from . import ec2_security_group
-from . import efs_common
-from . import elastic_file_system
-from . import elastic_file_system_mount_target
-from . import elastic_ip
-from . import iam_role
-from . import route53_health_check
-from . import route53_hosted_zone
-from . import route53_recordset
-from . import s3_bucket
-from . import sns_topic
-from . import sqs_queue
-from . import vpc
-from . import vpc_customer_gateway
-from . import vpc_dhcp_options
-from . import vpc_egress_only_internet_gateway
-from . import vpc_endpoint
-from . import vpc_internet_gateway
-from . import vpc_nat_gateway
-from . import vpc_network_acl
-from . import vpc_network_interface
-from . import vpc_network_interface_attachment
-from . import vpc_route
-from . import vpc_route_table
-from . import vpc_route_table_association
-from . import vpc_subnet
+if TYPE_CHECKING:
+    from . import (
+        aws_vpn_connection,
+        aws_vpn_connection_route,
+        aws_vpn_gateway,
+        cloudwatch_log_group,
+        cloudwatch_log_stream,
+        cloudwatch_metric_alarm,
+        ebs_volume,
+        ec2_common,
+        ec2_keypair,
+        ec2_placement_group,
+        ec2_rds_dbinstance,
+        ec2_rds_dbsecurity_group,
+        ec2_security_group,
+        efs_common,
+        elastic_file_system,
+        elastic_file_system_mount_target,
+        elastic_ip,
+        iam_role,
+        route53_health_check,
+        route53_hosted_zone,
+        route53_recordset,
+        s3_bucket,
+        sns_topic,
+        sqs_queue,
+        vpc,
+        vpc_customer_gateway,
+        vpc_dhcp_options,
+        vpc_egress_only_internet_gateway,
+        vpc_endpoint,
+        vpc_internet_gateway,
+        vpc_nat_gateway,
+        vpc_network_acl,
+        vpc_network_interface,
+        vpc_network_interface_attachment,
+        vpc_route,
+        vpc_route_table,
+        vpc_route_table_association,
+        vpc_subnet,
+    )
+
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import botocore
+import botocore.exceptions
 from nixops.state import StateDict
 from nixops.diff import Handler
 import nixops.util
@@ -115,10 +115,7 @@ class AWSVPNGatewayState(nixops.resources.DiffEngineResourceState, EC2CommonStat
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["vpnGatewayId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["vpnGatewayId"], tags)
 
     def _destroy(self):
         if self.state != self.UP:
@@ -2,8 +2,7 @@
 
 # Automatic provisioning of AWS cloudwatch log groups.
 
-import boto
-import boto.logs
+import botocore.exceptions
 import nixops.util
 import nixops.resources
 import nixops_aws.ec2_utils
@@ -50,7 +49,6 @@ class CloudWatchLogGroupState(
 
     def __init__(self, depl, name, id):
         nixops.resources.ResourceState.__init__(self, depl, name, id)
-        self._conn = None
 
     def show_type(self):
         s = super(CloudWatchLogGroupState, self).show_type()
@@ -71,27 +69,21 @@ class CloudWatchLogGroupState(
     def get_definition_prefix(self):
         return "resources.cloudwatchLogGroups."
 
-    def _connect(self):
-        if self._conn:
-            return self._conn
+    def _get_logs_client(self):
         assert self.region
-        (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
-            self.access_key_id
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "logs", self.region, self.access_key_id
         )
-        self._conn = boto.logs.connect_to_region(
-            region_name=self.region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-        )
-        return self._conn
 
     def _destroy(self):
         if self.state != self.UP:
             return
         self.log("destroying cloudwatch log group ‘{0}’...".format(self.log_group_name))
         try:
-            self._connect().delete_log_group(self.log_group_name)
-        except boto.logs.exceptions.ResourceNotFoundException:
+            self._get_logs_client().delete_log_group(logGroupName=self.log_group_name)
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
             self.log(
                 "the log group ‘{0}’ was already deleted".format(self.log_group_name)
             )
@@ -102,19 +94,17 @@ class CloudWatchLogGroupState(
             self.retention_in_days = None
             self.arn = None
 
-    def lookup_cloudwatch_log_group(self, log_group_name, next_token=None):
+    def lookup_cloudwatch_log_group(self, log_group_name):
         if log_group_name:
-            response = self._connect().describe_log_groups(
-                log_group_name_prefix=log_group_name, next_token=next_token
+            pages = (
+                self._get_logs_client()
+                .get_paginator("describe_log_groups")
+                .paginate(logGroupNamePrefix=log_group_name)
             )
-            if "logGroups" in response:
-                for log in response["logGroups"]:
+            for page in pages:
+                for log in page["logGroups"]:
                     if log_group_name == log["logGroupName"]:
                         return True, log["arn"]
-            if "nextToken" in response:
-                self.lookup_cloudwatch_log_group(
-                    log_group_name=log_group_name, next_token=response["nextToken"],
-                )
         return False, None
 
     def create(self, defn, check, allow_reboot, allow_recreate):
@@ -132,7 +122,6 @@ class CloudWatchLogGroupState(
         ):
             self.log("cloudwatch log group definition changed, recreating...")
             self._destroy()
-            self._conn = None
 
         self.region = defn.config["region"]
         exist, arn = self.lookup_cloudwatch_log_group(
@@ -144,7 +133,7 @@ class CloudWatchLogGroupState(
             self.log(
                 "creating cloudwatch log group ‘{0}’...".format(defn.config["name"])
             )
-            self._connect().create_log_group(defn.config["name"])
+            self._get_logs_client().create_log_group(logGroupName=defn.config["name"])
             exist, arn = self.lookup_cloudwatch_log_group(
                 log_group_name=defn.config["name"]
             )
@@ -155,10 +144,15 @@ class CloudWatchLogGroupState(
                     defn.config["name"], defn.config["retentionInDays"]
                 )
             )
-            self._connect().set_retention(
-                log_group_name=defn.config["name"],
-                retention_in_days=defn.config["retentionInDays"],
-            )
+            if defn.config["retentionInDays"] is None:
+                self._get_logs_client().delete_retention_policy(
+                    logGroupName=defn.config["name"]
+                )
+            else:
+                self._get_logs_client().put_retention_policy(
+                    logGroupName=defn.config["name"],
+                    retentionInDays=defn.config["retentionInDays"],
+                )
 
         with self.depl._db:
             self.state = self.UP
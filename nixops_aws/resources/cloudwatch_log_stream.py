@@ -2,8 +2,7 @@
 
 # Automatic provisioning of AWS cloudwatch log streams.
 
-import boto
-import boto.logs
+import botocore.exceptions
 import nixops.util
 import nixops.resources
 import nixops_aws.ec2_utils
@@ -49,7 +48,6 @@ class CloudWatchLogStreamState(
 
     def __init__(self, depl, name, id):
         nixops.resources.ResourceState.__init__(self, depl, name, id)
-        self._conn = None
 
     def show_type(self):
         s = super(CloudWatchLogStreamState, self).show_type()
@@ -70,19 +68,11 @@ class CloudWatchLogStreamState(
     def get_definition_prefix(self):
         return "resources.cloudwatchLogStreams."
 
-    def _connect(self):
-        if self._conn:
-            return self._conn
+    def _get_logs_client(self):
         assert self.region
-        (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
-            self.access_key_id
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "logs", self.region, self.access_key_id
         )
-        self._conn = boto.logs.connect_to_region(
-            region_name=self.region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-        )
-        return self._conn
 
     def _destroy(self):
         if self.state != self.UP:
@@ -91,10 +81,12 @@ class CloudWatchLogStreamState(
             "destroying cloudwatch log stream ‘{0}’...".format(self.log_stream_name)
         )
         try:
-            self._connect().delete_log_stream(
-                log_group_name=self.log_group_name, log_stream_name=self.log_stream_name
+            self._get_logs_client().delete_log_stream(
+                logGroupName=self.log_group_name, logStreamName=self.log_stream_name
             )
-        except boto.logs.exceptions.ResourceNotFoundException:
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
             self.log(
                 "the log group ‘{0}’ or log stream ‘{1}’ was already deleted".format(
                     self.log_group_name, self.log_stream_name
@@ -107,25 +99,19 @@ class CloudWatchLogStreamState(
             self.region = None
             self.arn = None
 
-    def lookup_cloudwatch_log_stream(
-        self, log_group_name, log_stream_name, next_token=None
-    ):
+    def lookup_cloudwatch_log_stream(self, log_group_name, log_stream_name):
         if log_stream_name:
-            response = self._connect().describe_log_streams(
-                log_group_name=log_group_name,
-                log_stream_name_prefix=log_stream_name,
-                next_token=next_token,
+            pages = (
+                self._get_logs_client()
+                .get_paginator("describe_log_streams")
+                .paginate(
+                    logGroupName=log_group_name, logStreamNamePrefix=log_stream_name
+                )
             )
-            if "logStreams" in response:
-                for log_stream in response["logStreams"]:
+            for page in pages:
+                for log_stream in page["logStreams"]:
                     if log_stream_name == log_stream["logStreamName"]:
                         return True, log_stream["arn"]
-            if "nextToken" in response:
-                self.lookup_cloudwatch_log_stream(
-                    log_group_name=log_group_name,
-                    log_stream_name=log_stream_name,
-                    next_token=response["nextToken"],
-                )
         return False, None
 
     def create_after(self, resources, defn):
@@ -153,7 +139,6 @@ class CloudWatchLogStreamState(
         ):
             self.log("cloudwatch log stream definition changed, recreating...")
             self._destroy()
-            self._conn = None
 
         self.region = defn.config["region"]
         exist, arn = self.lookup_cloudwatch_log_stream(
@@ -166,9 +151,9 @@ class CloudWatchLogStreamState(
                     defn.config["name"], defn.config["logGroupName"]
                 )
             )
-            self._connect().create_log_stream(
-                log_stream_name=defn.config["name"],
-                log_group_name=defn.config["logGroupName"],
+            self._get_logs_client().create_log_stream(
+                logStreamName=defn.config["name"],
+                logGroupName=defn.config["logGroupName"],
             )
             exist, arn = self.lookup_cloudwatch_log_stream(
                 log_group_name=defn.config["logGroupName"],
@@ -3,8 +3,7 @@
 # Automatic provisioning of AWS Cloudwatch Metric Alarms.
 
 import os
-import botocore
-import boto3
+import botocore.exceptions
 import nixops.util
 import nixops.resources
 import nixops_aws.ec2_utils
@@ -67,7 +66,6 @@ class CloudwatchMetricAlarmState(
 
     def __init__(self, depl, name, id):
         nixops.resources.ResourceState.__init__(self, depl, name, id)
-        self._boto_session = None
 
     @property
     def resource_id(self):
@@ -79,18 +77,10 @@ class CloudwatchMetricAlarmState(
     def get_physical_spec(self):
         return {}
 
-    def boto_session(self, region):
-        if self._boto_session is None:
-            (
-                access_key_id,
-                secret_access_key,
-            ) = nixops_aws.ec2_utils.fetch_aws_secret_key(self.access_key_id)
-            self._boto_session = boto3.session.Session(
-                aws_access_key_id=access_key_id,
-                aws_secret_access_key=secret_access_key,
-                region_name=self.region,
-            )
-        return self._boto_session
+    def _get_cloudwatch_client(self, region):
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "cloudwatch", region, self.access_key_id
+        )
 
     def create(self, defn, check, allow_reboot, allow_recreate):
         self.access_key_id = (
@@ -99,7 +89,7 @@ class CloudwatchMetricAlarmState(
 
         if not (self.access_key_id or os.environ["AWS_ACCESS_KEY_ID"]):
             raise Exception("please set ‘accessKeyId’ or $AWS_ACCESS_KEY_ID")
-        client = self.boto_session(self.region or defn.region).client("cloudwatch")
+        client = self._get_cloudwatch_client(self.region or defn.region)
 
         if self.alarm_name and self.alarm_name != defn.alarm_name:
             raise Exception("Cannot change name of a CloudWatch Metric Alarm")
@@ -168,7 +158,7 @@ class CloudwatchMetricAlarmState(
     def destroy(self, wipe=False):
         if not self.alarm_name:
             return True
-        client = self.boto_session(self.region).client("cloudwatch")
+        client = self._get_cloudwatch_client(self.region)
 
         self.log("destroying cloudwatch metric alarm {}".format(self.alarm_name))
         try:
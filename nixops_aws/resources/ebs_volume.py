@@ -5,6 +5,7 @@
 
 import nixops.util
 import nixops_aws.ec2_utils
+import nixops_aws.tagging
 import nixops.resources
 import botocore.exceptions
 from . import ec2_common
@@ -42,6 +43,7 @@ class EBSVolumeState(nixops.resources.ResourceState, ec2_common.EC2CommonState):
     size = nixops.util.attr_property("ec2.size", None, int)
     iops = nixops.util.attr_property("ec2.iops", None, int)
     volume_type = nixops.util.attr_property("ec2.volumeType", None)
+    client_token = nixops.util.attr_property("ec2.clientToken", None)
 
     @classmethod
     def get_type(cls):
@@ -163,32 +165,55 @@ class EBSVolumeState(nixops.resources.ResourceState, ec2_common.EC2CommonState):
                         "please set a zone where the volume will be created"
                     )
 
-                volume = self._connect(defn.config["region"]).create_volume(
-                    zone=defn.config["zone"],
-                    size=defn.config["size"],
-                    snapshot=defn.config["snapshot"],
-                    iops=defn.config["iops"],
-                    volume_type=defn.config["volumeType"],
+                tags = self.get_tags(defn.config["tags"])
+                args = dict(
+                    AvailabilityZone=defn.config["zone"],
+                    VolumeType=defn.config["volumeType"],
+                    TagSpecifications=nixops_aws.tagging.tag_specifications(
+                        "volume", tags
+                    ),
+                )
+                if defn.config["size"]:
+                    args["Size"] = defn.config["size"]
+                if defn.config["snapshot"]:
+                    args["SnapshotId"] = defn.config["snapshot"]
+                if defn.config["iops"]:
+                    args["Iops"] = defn.config["iops"]
+
+                # Use a client token so that retrying the call, or creating
+                # the volume again after being interrupted before recording
+                # its ID, gives the same volume instead of a new one.
+                if not self.client_token:
+                    self.client_token = nixops.util.generate_random_string(length=48)
+                args["ClientToken"] = self.client_token
+                volume = self._retry(
+                    lambda: self._connect_boto3(defn.config["region"]).create_volume(
+                        **args
+                    ),
+                    region=defn.config["region"],
                 )
-                # FIXME: if we crash before the next step, we forget the
-                # volume we just created.  Doesn't seem to be anything we
-                # can do about this.
 
                 with self.depl._db:
+                    self.client_token = None
                     self.state = self.STARTING
                     self.region = defn.config["region"]
                     self.zone = defn.config["zone"]
                     self.size = defn.config["size"]
-                    self.volume_id = volume.id
+                    self.volume_id = volume["VolumeId"]
+                    self.tags = tags
+                    self._record_tags(self.volume_id, tags)
                     self.iops = defn.config["iops"]
                     self.volume_type = defn.config["volumeType"]
 
                 self.log("volume ID is ‘{0}’".format(self.volume_id))
 
+        # Cheap when nothing changed: only differing tag sets reach AWS.
+        self.update_tags(self.volume_id, user_tags=defn.config["tags"], check=check)
+
         if self.state == self.STARTING or check:
-            self.update_tags(self.volume_id, user_tags=defn.config["tags"], check=check)
             nixops_aws.ec2_utils.wait_for_volume_available(
-                self._connect(self.region),
+                self.region,
+                self.access_key_id,
                 self.volume_id,
                 self.logger,
                 states=["available", "in-use"],
@@ -196,6 +221,8 @@ class EBSVolumeState(nixops.resources.ResourceState, ec2_common.EC2CommonState):
             self.state = self.UP
 
     def check(self):
+        if self._get_inventory().get("volumes", self.volume_id) is not None:
+            return
         volume = nixops_aws.ec2_utils.get_volume_by_id(
             self._connect(self.region), self.volume_id
         )
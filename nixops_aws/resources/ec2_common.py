@@ -2,18 +2,21 @@ from __future__ import annotations
 import socket
 import getpass
 
-import boto3
 import nixops.util
 import nixops.deployment
 import nixops.resources
 import nixops_aws.ec2_utils
+import nixops_aws.inventory
+import nixops_aws.metrics
+import nixops_aws.tagging
+import nixops_aws.waiter
 from nixops.state import StateDict
 from typing import Optional
-from boto.ec2.connection import EC2Connection
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     import mypy_boto3_ec2
+    from boto.ec2.connection import EC2Connection
 
 
 class EC2CommonState:
@@ -26,13 +29,40 @@ class EC2CommonState:
     _conn: EC2Connection
     access_key_id: Optional[str]
 
-    COMMON_EC2_RESERVED = ["accessKeyId", "ec2.tags"]
+    COMMON_EC2_RESERVED = ["accessKeyId", "ec2.tags", "ec2.tagHashes"]
 
     def _retry(self, fun, **kwargs):
+        nixops_aws.metrics.set_current_resource(self.name)
+        kwargs.setdefault("region", self._get_region())
         return nixops_aws.ec2_utils.retry(fun, logger=self, **kwargs)
 
+    def _get_region(self) -> Optional[str]:
+        region = getattr(self, "region", None)
+        if region is None and hasattr(self, "_state"):
+            region = self._state.get("region", None)
+        return region
+
     tags = nixops.util.attr_property("ec2.tags", {}, "json")
 
+    # AWS ID -> {"hash": hash of the last applied tag set, "keys": its keys}.
+    tag_hashes = nixops.util.attr_property("ec2.tagHashes", {}, "json")
+
+    def _get_inventory(self, region=None):
+        """Return the snapshot of this deployment's EC2 resources in the region."""
+        return nixops_aws.inventory.get_inventory(
+            self.depl.uuid,
+            region or self._get_region(),
+            self.access_key_id or nixops_aws.ec2_utils.get_access_key_id(),
+        )
+
+    def _get_waiter(self, kind, region=None):
+        """Return the shared waiter for resources of the given kind in the region."""
+        return nixops_aws.waiter.get_waiter(
+            kind,
+            region or self._get_region(),
+            self.access_key_id or nixops_aws.ec2_utils.get_access_key_id(),
+        )
+
     def get_common_tags(self):
         tags = {
             "CharonNetworkUUID": self.depl.uuid,
@@ -48,25 +78,92 @@ class EC2CommonState:
     def get_default_name_tag(self):
         return "{0} [{1}]".format(self.depl.description, self.name)
 
-    def update_tags_using(self, updater, user_tags={}, check=False):
+    def get_tags(self, user_tags={}):
+        """Return the full set of tags to apply to this resource."""
         tags = {"Name": self.get_default_name_tag()}
         tags.update(user_tags)
         tags.update(self.get_common_tags())
+        return tags
+
+    def update_tags_using(self, updater, user_tags={}, check=False):
+        tags = self.get_tags(user_tags)
 
         if tags != self.tags or check:
             updater(tags)
             self.tags = tags
 
-    def update_tags(self, id, user_tags={}, check=False):
-        def updater(tags):
-            # FIXME: handle removing tags.
-            self._retry(lambda: self._conn.create_tags([id], tags))
+    def _create_tags(self, ids, tags, region=None):
+        """Tag EC2 resources, coalescing the call with concurrent identical writes."""
+        nixops_aws.tagging.get_tag_batcher(
+            region or self._get_region(),
+            self.access_key_id or nixops_aws.ec2_utils.get_access_key_id(),
+        ).create_tags(ids, tags)
+
+    def _record_tags(self, id, tags):
+        """Remember that the given tag set has been applied to an AWS ID."""
+        tag_hashes = dict(self.tag_hashes)
+        tag_hashes[id] = {
+            "hash": nixops_aws.tagging.tags_hash(tags),
+            "keys": sorted(tags.keys()),
+        }
+        self.tag_hashes = tag_hashes
 
-        self.update_tags_using(updater, user_tags=user_tags, check=check)
+    def _forget_tags(self, id):
+        if id in self.tag_hashes:
+            tag_hashes = dict(self.tag_hashes)
+            del tag_hashes[id]
+            self.tag_hashes = tag_hashes
+
+    def _reconcile_tags(self, id, tags, check=False, region=None):
+        """
+        Make the tags of an AWS resource match ``tags``.  Nothing is sent to
+        AWS if ``tags`` hashes the same as the tag set last applied to ``id``,
+        unless ``check`` is set.  Otherwise the current tags are fetched and
+        only added/changed keys are written and removed keys deleted.
+        """
+        applied = self.tag_hashes.get(id)
+        if (
+            not check
+            and applied is not None
+            and applied["hash"] == nixops_aws.tagging.tags_hash(tags)
+        ):
+            return
+
+        region = region or self._get_region()
+        client = nixops_aws.ec2_utils.get_boto3_client(
+            "ec2",
+            region,
+            self.access_key_id or nixops_aws.ec2_utils.get_access_key_id(),
+        )
+        response = self._retry(
+            lambda: client.describe_tags(
+                Filters=[{"Name": "resource-id", "Values": [id]}]
+            ),
+            region=region,
+        )
+        current = {t["Key"]: t["Value"] for t in response["Tags"]}
+        to_set, to_delete = nixops_aws.tagging.diff_tags(
+            current, tags, applied["keys"] if applied else []
+        )
+        if to_set:
+            self._create_tags([id], to_set, region=region)
+        if to_delete:
+            self._retry(
+                lambda: client.delete_tags(
+                    Resources=[id], Tags=[{"Key": k} for k in to_delete]
+                ),
+                region=region,
+            )
+        self._record_tags(id, tags)
+
+    def update_tags(self, id, user_tags={}, check=False):
+        tags = self.get_tags(user_tags)
+        self._reconcile_tags(id, tags, check=check)
+        self.tags = tags
 
     def get_client(self):
         """
-        Generic method to get a cached EC2 AWS client or create it.
+        Generic method to get the shared EC2 AWS client for this resource's region.
         """
 
         # Here be dragons!
@@ -75,6 +172,7 @@ class EC2CommonState:
         new_access_key_id = (
             self.get_defn()["accessKeyId"] if self.depl.definitions else None  # type: ignore
         ) or nixops_aws.ec2_utils.get_access_key_id()
+        nixops_aws.metrics.set_current_resource(self.name)
         if new_access_key_id is not None:
             self.access_key_id = new_access_key_id
         if self.access_key_id is None:
@@ -86,14 +184,8 @@ class EC2CommonState:
                 return self._client
         assert self._state["region"]
         region: str = str(self._state["region"])
-        (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
-            self.access_key_id
-        )
-        self._client: "mypy_boto3_ec2.EC2Client" = boto3.session.Session().client(
-            service_name="ec2",
-            region_name=region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
+        self._client = nixops_aws.ec2_utils.get_boto3_client(
+            "ec2", region, self.access_key_id
         )
         return self._client
 
@@ -2,7 +2,6 @@
 
 # Automatic provisioning of EC2 placement groups
 
-import boto.ec2.placementgroup
 import nixops.resources
 import nixops.util
 import nixops_aws.ec2_utils
@@ -79,6 +78,8 @@ class EC2PlacementGroupState(
         self._conn = nixops_aws.ec2_utils.connect(self.region, self.access_key_id)
 
     def create(self, defn, check, allow_reboot, allow_recreate):
+        import boto.exception
+
         # Name or region change means a completely new security group
         if self.placement_group_name and (
             defn.placement_group_name != self.placement_group_name
@@ -136,6 +137,8 @@ class EC2PlacementGroupState(
         self.state = self.UP
 
     def after_activation(self, defn):
+        import boto.exception
+
         region = self.region
 
         conn = self._connect()
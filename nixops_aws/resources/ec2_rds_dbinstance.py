@@ -2,7 +2,6 @@
 
 # Automatic provisioning of AWS RDS Database Instances.
 
-import boto.rds
 import nixops.resources
 import nixops.util
 import nixops_aws.ec2_utils
@@ -119,6 +118,8 @@ class EC2RDSDbInstanceState(nixops.resources.ResourceState[EC2RDSDbInstanceDefin
         }
 
     def _connect(self):
+        import boto.rds
+
         if self._conn:
             return
         (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
@@ -164,6 +165,8 @@ class EC2RDSDbInstanceState(nixops.resources.ResourceState[EC2RDSDbInstanceDefin
             raise Exception(message)
 
     def _try_fetch_dbinstance(self, instance_id):
+        import boto.exception
+
         dbinstance = None
         try:
             dbinstance = self._connect().get_all_dbinstances(instance_id=instance_id)[0]
@@ -2,7 +2,6 @@
 
 # Automatic provisioning of EC2 security groups.
 
-import boto.ec2.securitygroup
 import nixops.resources
 import nixops.util
 import nixops_aws.ec2_utils
@@ -118,8 +117,12 @@ class EC2SecurityGroupState(nixops.resources.ResourceState[EC2SecurityGroupDefin
         return self._conn
 
     def create(self, defn, check, allow_reboot, allow_recreate):  # noqa: C901
+        import boto.ec2.securitygroup
+
         def retry_notfound(f):
-            nixops_aws.ec2_utils.retry(f, error_codes=["InvalidGroup.NotFound"])
+            nixops_aws.ec2_utils.retry(
+                f, error_codes=["InvalidGroup.NotFound"], region=defn.region
+            )
 
         # Name or region change means a completely new security group
         if self.security_group_name and (
@@ -331,6 +334,8 @@ class EC2SecurityGroupState(nixops.resources.ResourceState[EC2SecurityGroupDefin
             )[0]
 
     def after_activation(self, defn):
+        import boto.exception
+
         region = self.region
 
         conn = self._connect()
@@ -346,6 +351,8 @@ class EC2SecurityGroupState(nixops.resources.ResourceState[EC2SecurityGroupDefin
         self.old_security_groups = []
 
     def destroy(self, wipe=False):
+        import boto.exception
+
         if self.state == self.UP or self.state == self.STARTING:
             self.logger.log(
                 "deleting EC2 security group `{0}' ID `{1}'...".format(
@@ -359,6 +366,7 @@ class EC2SecurityGroupState(nixops.resources.ResourceState[EC2SecurityGroupDefin
                         group_id=self.security_group_id
                     ),
                     error_codes=["DependencyViolation"],
+                    region=self.region,
                 )
             except boto.exception.EC2ResponseError as e:
                 if e.error_code != "InvalidGroup.NotFound":
@@ -4,7 +4,7 @@
 
 
 import uuid
-import botocore
+import botocore.exceptions
 import nixops.util
 import nixops_aws.ec2_utils
 import nixops.resources
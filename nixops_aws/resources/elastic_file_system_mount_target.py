@@ -3,7 +3,7 @@
 # AWS Elastic File System mount targets.
 
 
-import botocore
+import botocore.exceptions
 import nixops.util
 import nixops_aws.ec2_utils
 import nixops.resources
@@ -206,15 +206,29 @@ class ElasticFileSystemMountTargetState(
         return True
 
     def security_groups_to_ids(self, region, access_key_id, subnetId, groups):
-        conn = nixops_aws.ec2_utils.connect(region, access_key_id)
-        conn_vpc = nixops_aws.ec2_utils.connect_vpc(region, access_key_id)
+        client = nixops_aws.ec2_utils.get_boto3_client("ec2", region, access_key_id)
 
         sg_names = [g for g in groups if not g.startswith("sg-")]
         if sg_names != [] and subnetId != "":
-            vpc_id = conn_vpc.get_all_subnets([subnetId])[0].vpc_id
-            groups = [
-                nixops_aws.ec2_utils.name_to_security_group(conn, g, vpc_id)
-                for g in groups
+            vpc_id = client.describe_subnets(SubnetIds=[subnetId])["Subnets"][0][
+                "VpcId"
             ]
+            response = client.describe_security_groups(
+                Filters=[
+                    {"Name": "group-name", "Values": sg_names},
+                    {"Name": "vpc-id", "Values": [vpc_id]},
+                ]
+            )
+            name_to_id = {
+                sg["GroupName"]: sg["GroupId"] for sg in response["SecurityGroups"]
+            }
+            for g in sg_names:
+                if g not in name_to_id:
+                    raise Exception(
+                        "could not resolve security group name '{0}' in VPC '{1}'".format(
+                            g, vpc_id
+                        )
+                    )
+            groups = [name_to_id.get(g, g) for g in groups]
 
         return groups
@@ -5,6 +5,7 @@
 import nixops.util
 import nixops.resources
 import nixops_aws.ec2_utils
+import nixops_aws.inventory
 import botocore.exceptions
 
 from .types.elastic_ip import ElasticIpOptions
@@ -74,6 +75,14 @@ class ElasticIPState(nixops.resources.ResourceState[ElasticIPDefinition]):
         )
         return self._conn_boto3
 
+    def _get_inventory(self):
+        """Return the snapshot of this deployment's EC2 resources in the region."""
+        return nixops_aws.inventory.get_inventory(
+            self.depl.uuid,
+            self.region,
+            self.access_key_id or nixops_aws.ec2_utils.get_access_key_id(),
+        )
+
     def create(self, defn, check, allow_reboot, allow_recreate):
 
         self.access_key_id = (
@@ -134,6 +143,8 @@ class ElasticIPState(nixops.resources.ResourceState[ElasticIPDefinition]):
         return response["Addresses"][0]
 
     def check(self):
+        if self._get_inventory().get("addresses", self.public_ipv4) is not None:
+            return
         eip = self.describe_eip()
         if eip is None:
             self.state = self.MISSING
@@ -2,22 +2,32 @@
 
 # Automatic provisioning of AWS IAM roles.
 
-import boto
-import boto.iam
 import nixops.util
 import nixops.resources
 import nixops_aws.resources
 import nixops_aws.ec2_utils
-from boto.exception import BotoServerError
 
 from .types.iam_role import IamRoleOptions
 
 
-class IamPermissionException(BotoServerError):
+class IamError(Exception):
+    """An IAM error response, with the attributes of boto's BotoServerError."""
+
+    def __init__(self, status, reason, body=None):
+        super().__init__(status, reason, body)
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+    def __str__(self):
+        return "{0} {1}\n{2}".format(self.status, self.reason, self.body or "")
+
+
+class IamPermissionException(IamError):
     pass
 
 
-class IamNotFound(BotoServerError):
+class IamNotFound(IamError):
     pass
 
 
@@ -81,12 +91,16 @@ class IAMRoleState(nixops.resources.ResourceState[IAMRoleDefinition]):
         (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
             self.access_key_id
         )
+        import boto
+
         self._conn = boto.connect_iam(
             aws_access_key_id=access_key_id, aws_secret_access_key=secret_access_key
         )
         return self._conn
 
     def _destroy(self):  # noqa: C901
+        from boto.exception import BotoServerError
+
         if self.state != self.UP:
             return
 
@@ -174,6 +188,8 @@ class IAMRoleState(nixops.resources.ResourceState[IAMRoleDefinition]):
         }
 
     def _get_instance_profile(self, name, allow404=True):
+        from boto.exception import BotoServerError
+
         try:
             return self._connect().get_instance_profile(name)
         except BotoServerError as e:
@@ -188,6 +204,8 @@ class IAMRoleState(nixops.resources.ResourceState[IAMRoleDefinition]):
             raise
 
     def _get_role_policy(self, name, allow404=True):
+        from boto.exception import BotoServerError
+
         try:
             return self._connect().get_role_policy(name, name)
         except BotoServerError as e:
@@ -202,6 +220,8 @@ class IAMRoleState(nixops.resources.ResourceState[IAMRoleDefinition]):
             raise
 
     def _get_role(self, name, allow404=True):
+        from boto.exception import BotoServerError
+
         try:
             return self._connect().get_role(name)
         except BotoServerError as e:
@@ -3,7 +3,6 @@
 # Automatic provisioning of AWS Route53 RecordSets.
 
 import os
-import boto3
 import nixops.util
 import nixops.resources
 import nixops_aws.ec2_utils
@@ -77,7 +76,6 @@ class Route53RecordSetState(nixops.resources.ResourceState[Route53RecordSetDefin
 
     def __init__(self, depl, name, id):
         nixops.resources.ResourceState.__init__(self, depl, name, id)
-        self._boto_session = None
 
     @property
     def resource_id(self):
@@ -86,16 +84,10 @@ class Route53RecordSetState(nixops.resources.ResourceState[Route53RecordSetDefin
     def get_definition_prefix(self):
         return "resources.route53RecordSets."
 
-    def boto_session(self):
-        if self._boto_session is None:
-            (
-                access_key_id,
-                secret_access_key,
-            ) = nixops_aws.ec2_utils.fetch_aws_secret_key(self.access_key_id)
-            self._boto_session = boto3.session.Session(
-                aws_access_key_id=access_key_id, aws_secret_access_key=secret_access_key
-            )
-        return self._boto_session
+    def _get_route53_client(self):
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "route53", None, self.access_key_id
+        )
 
     def create(self, defn, check, allow_reboot, allow_recreate):  # noqa: C901
         self.access_key_id = (
@@ -117,7 +109,7 @@ class Route53RecordSetState(nixops.resources.ResourceState[Route53RecordSetDefin
                 )
             )
 
-        client = self.boto_session().client("route53")
+        client = self._get_route53_client()
 
         zone_name = defn.zone_name
         zone_id = defn.zone_id
@@ -322,7 +314,7 @@ class Route53RecordSetState(nixops.resources.ResourceState[Route53RecordSetDefin
             "are you sure you want to destroy record: {}".format(self.to_string(self))
         ):
             self.log("destroying record set ({})".format(self.to_string(self)))
-            client = self.boto_session().client("route53")
+            client = self._get_route53_client()
 
             # TODO: catch exception
             self.route53_retry(
@@ -338,7 +330,10 @@ class Route53RecordSetState(nixops.resources.ResourceState[Route53RecordSetDefin
 
     def route53_retry(self, f):
         return nixops_aws.ec2_utils.retry(
-            f, error_codes=["Throttling", "PriorRequestNotComplete"], logger=self
+            f,
+            error_codes=["Throttling", "PriorRequestNotComplete"],
+            logger=self,
+            service="route53",
         )
 
     def create_after(self, resources, defn):
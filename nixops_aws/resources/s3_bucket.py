@@ -2,8 +2,7 @@
 
 # Automatic provisioning of AWS S3 buckets.
 
-import botocore
-import boto3
+import botocore.exceptions
 import json
 import nixops.util
 import nixops.resources
@@ -78,13 +77,10 @@ class S3BucketState(nixops.resources.ResourceState[S3BucketDefinition]):
     def _connect(self):
         if self._conn:
             return self._conn
-        (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
-            self.access_key_id
-        )
-        self._conn = boto3.session.Session(
-            region_name=self.region if self.region != "US" else "us-east-1",
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
+        self._conn = nixops_aws.ec2_utils.get_boto3_client(
+            "s3",
+            self.region if self.region != "US" else "us-east-1",
+            self.access_key_id,
         )
         return self._conn
 
@@ -105,7 +101,7 @@ class S3BucketState(nixops.resources.ResourceState[S3BucketDefinition]):
                 )
             )
 
-        s3client = self._connect().client("s3")
+        s3client = self._connect()
         if check or self.state != self.UP:
 
             self.log("creating S3 bucket ‘{0}’...".format(defn.bucket_name))
@@ -217,9 +213,9 @@ class S3BucketState(nixops.resources.ResourceState[S3BucketDefinition]):
 
             try:
                 self.log("destroying S3 bucket ‘{0}’...".format(self.bucket_name))
-                bucket = self._connect().resource("s3").Bucket(self.bucket_name)
+                s3client = self._connect()
                 try:
-                    bucket.delete()
+                    s3client.delete_bucket(Bucket=self.bucket_name)
                 except botocore.exceptions.ClientError as e:
                     if e.response["Error"]["Code"] != "BucketNotEmpty":
                         raise
@@ -229,13 +225,22 @@ class S3BucketState(nixops.resources.ResourceState[S3BucketDefinition]):
                         )
                     ):
                         return False
-                    bucket.objects.all().delete()
-                    bucket.delete()
+                    self._delete_all_objects(s3client)
+                    s3client.delete_bucket(Bucket=self.bucket_name)
             except botocore.exceptions.ClientError as e:
                 if e.response["Error"]["Code"] != "NoSuchBucket":
                     raise
         return True
 
+    def _delete_all_objects(self, s3client):
+        paginator = s3client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name):
+            objects = [{"Key": o["Key"]} for o in page.get("Contents", [])]
+            if objects:
+                s3client.delete_objects(
+                    Bucket=self.bucket_name, Delete={"Objects": objects}
+                )
+
 
 def region_to_s3_location(region):
     # S3 location names are identical to EC2 regions, except for
@@ -2,8 +2,6 @@
 
 # Automatic provisioning of AWS SNS topics.
 
-import boto
-import boto.sns
 import nixops.util
 import nixops.resources
 import nixops_aws.ec2_utils
@@ -48,7 +46,6 @@ class SNSTopicState(nixops.resources.ResourceState[SNSTopicDefinition]):
 
     def __init__(self, depl, name, id):
         nixops.resources.ResourceState.__init__(self, depl, name, id)
-        self._conn = None
 
     def show_type(self):
         s = super(SNSTopicState, self).show_type()
@@ -69,26 +66,18 @@ class SNSTopicState(nixops.resources.ResourceState[SNSTopicDefinition]):
     def get_definition_prefix(self):
         return "resources.snsTopics."
 
-    def _connect(self):
-        if self._conn:
-            return self._conn
+    def _get_sns_client(self):
         assert self.region
-        (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
-            self.access_key_id
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "sns", self.region, self.access_key_id
         )
-        self._conn = boto.sns.connect_to_region(
-            region_name=self.region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-        )
-        return self._conn
 
     def _destroy(self):
         if self.state != self.UP:
             return
 
         self.log("destroying SNS topic ‘{0}’...".format(self.topic_name))
-        self._connect().delete_topic(self.arn)
+        self._get_sns_client().delete_topic(TopicArn=self.arn)
         with self.depl._db:
             self.state = self.MISSING
             self.topic_name = None
@@ -97,15 +86,11 @@ class SNSTopicState(nixops.resources.ResourceState[SNSTopicDefinition]):
             self.arn = None
 
     def topic_exists(self, arn):
-        response = self._connect().get_all_topics()
-        topics = response["ListTopicsResponse"]["ListTopicsResult"]["Topics"]
-        current_topics = []
-        if len(topics) > 0:
-            for topic in topics:
-                topic_arn = topic["TopicArn"]
-                current_topics.append(topic_arn)
-            if arn in current_topics:
-                return True
+        pages = self._get_sns_client().get_paginator("list_topics").paginate()
+        for page in pages:
+            for topic in page["Topics"]:
+                if topic["TopicArn"] == arn:
+                    return True
         return False
 
     def create(self, defn, check, allow_reboot, allow_recreate):
@@ -124,25 +109,26 @@ class SNSTopicState(nixops.resources.ResourceState[SNSTopicDefinition]):
         ):
             self.log("topic definition changed, recreating...")
             self._destroy()
-            self._conn = None
 
         self.region = defn.config["region"]
 
         if self.arn is None or not self.topic_exists(arn=self.arn):
             self.log("creating SNS topic ‘{0}’...".format(defn.config["name"]))
-            topic = self._connect().create_topic(defn.config["name"])
-            arn = topic.get("CreateTopicResponse").get("CreateTopicResult")["TopicArn"]
+            topic = self._get_sns_client().create_topic(Name=defn.config["name"])
+            arn = topic["TopicArn"]
 
         if defn.config["displayName"] is not None:
-            self._connect().set_topic_attributes(
-                topic=arn,
-                attr_name="DisplayName",
-                attr_value=defn.config["displayName"],
+            self._get_sns_client().set_topic_attributes(
+                TopicArn=arn,
+                AttributeName="DisplayName",
+                AttributeValue=defn.config["displayName"],
             )
 
         if defn.config["policy"] != "":
-            self._connect().set_topic_attributes(
-                topic=arn, attr_name="Policy", attr_value=defn.config["policy"]
+            self._get_sns_client().set_topic_attributes(
+                TopicArn=arn,
+                AttributeName="Policy",
+                AttributeValue=defn.config["policy"],
             )
 
         current_subscribers, current_subscriptions_arns = self.get_current_subscribers(
@@ -157,8 +143,8 @@ class SNSTopicState(nixops.resources.ResourceState[SNSTopicDefinition]):
                     self.log(
                         "adding SNS subscriber with endpoint '{0}'...".format(endpoint)
                     )
-                    self._connect().subscribe(
-                        topic=arn, protocol=protocol, endpoint=endpoint
+                    self._get_sns_client().subscribe(
+                        TopicArn=arn, Protocol=protocol, Endpoint=endpoint
                     )
 
         defn_endpoints = self.get_defn_endpoints(defn)
@@ -174,7 +160,9 @@ class SNSTopicState(nixops.resources.ResourceState[SNSTopicDefinition]):
                         )
                     )
                     if subscriber_arn != "PendingConfirmation":
-                        self._connect().unsubscribe(subscription=subscriber_arn)
+                        self._get_sns_client().unsubscribe(
+                            SubscriptionArn=subscriber_arn
+                        )
 
         with self.depl._db:
             self.state = self.UP
@@ -185,14 +173,15 @@ class SNSTopicState(nixops.resources.ResourceState[SNSTopicDefinition]):
             self.subscriptions = defn.config["subscriptions"]
 
     def get_current_subscribers(self, arn):
-        response = self._connect().get_all_subscriptions_by_topic(topic=arn)
-        current_subscribers = response["ListSubscriptionsByTopicResponse"][
-            "ListSubscriptionsByTopicResult"
-        ]["Subscriptions"]
+        pages = (
+            self._get_sns_client()
+            .get_paginator("list_subscriptions_by_topic")
+            .paginate(TopicArn=arn)
+        )
         current_endpoints = []
         current_subscriptions_arns = {}
-        if len(current_subscribers) > 0:
-            for subscriber in current_subscribers:
+        for page in pages:
+            for subscriber in page["Subscriptions"]:
                 current_endpoints.append(subscriber["Endpoint"])
                 current_subscriptions_arns[subscriber["Endpoint"]] = subscriber[
                     "SubscriptionArn"
@@ -3,7 +3,7 @@
 # Automatic provisioning of AWS SQS queues.
 
 import time
-import boto.sqs
+import botocore.exceptions
 import nixops.util
 import nixops.resources
 import nixops_aws.ec2_utils
@@ -53,7 +53,6 @@ class SQSQueueState(nixops.resources.ResourceState[SQSQueueDefinition]):
 
     def __init__(self, depl, name, id):
         nixops.resources.ResourceState.__init__(self, depl, name, id)
-        self._conn = None
 
     def show_type(self):
         s = super(SQSQueueState, self).show_type()
@@ -71,28 +70,29 @@ class SQSQueueState(nixops.resources.ResourceState[SQSQueueDefinition]):
     def resource_id(self):
         return self.queue_name
 
-    def _connect(self):
-        if self._conn:
-            return self._conn
+    def _get_sqs_client(self):
         assert self.region
-        (access_key_id, secret_access_key) = nixops_aws.ec2_utils.fetch_aws_secret_key(
-            self.access_key_id
+        return nixops_aws.ec2_utils.get_boto3_client(
+            "sqs", self.region, self.access_key_id
         )
-        self._conn = boto.sqs.connect_to_region(
-            region_name=self.region,
-            aws_access_key_id=access_key_id,
-            aws_secret_access_key=secret_access_key,
-        )
-        return self._conn
+
+    def _lookup_queue_url(self, queue_name):
+        try:
+            return self._get_sqs_client().get_queue_url(QueueName=queue_name)[
+                "QueueUrl"
+            ]
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "AWS.SimpleQueueService.NonExistentQueue":
+                return None
+            raise
 
     def _destroy(self):
         if self.state != self.UP:
             return
-        conn = self._connect()
-        q = conn.lookup(self.queue_name)
-        if q:
+        url = self._lookup_queue_url(self.queue_name)
+        if url:
             self.log("destroying SQS queue ‘{0}’...".format(self.queue_name))
-            conn.delete_queue(q)
+            self._get_sqs_client().delete_queue(QueueUrl=url)
         with self.depl._db:
             self.state = self.MISSING
             self.queue_name = None
@@ -117,16 +117,15 @@ class SQSQueueState(nixops.resources.ResourceState[SQSQueueDefinition]):
         ):
             self.log("queue definition changed, recreating...")
             self._destroy()
-            self._conn = None  # necessary if region changed
 
         if check or self.state != self.UP:
 
             self.region = defn.region
 
-            q = self._connect().lookup(defn.queue_name)
+            url = self._lookup_queue_url(defn.queue_name)
 
-            if not q or self.state != self.UP:
-                if q:
+            if not url or self.state != self.UP:
+                if url:
                     # SQS requires us to wait for 60 seconds to
                     # recreate a queue.
                     self.log(
@@ -134,21 +133,28 @@ class SQSQueueState(nixops.resources.ResourceState[SQSQueueDefinition]):
                             defn.queue_name
                         )
                     )
-                    self._connect().delete_queue(q)
+                    self._get_sqs_client().delete_queue(QueueUrl=url)
                     time.sleep(61)
                 self.log("creating SQS queue ‘{0}’...".format(defn.queue_name))
-                q = nixops_aws.ec2_utils.retry(
-                    lambda: self._connect().create_queue(
-                        defn.queue_name, defn.visibility_timeout
-                    ),
+                attributes = {}
+                if defn.visibility_timeout is not None:
+                    attributes["VisibilityTimeout"] = str(defn.visibility_timeout)
+                url = nixops_aws.ec2_utils.retry(
+                    lambda: self._get_sqs_client().create_queue(
+                        QueueName=defn.queue_name, Attributes=attributes
+                    )["QueueUrl"],
                     error_codes=["AWS.SimpleQueueService.QueueDeletedRecently"],
+                    service="sqs",
+                    region=defn.region,
                 )
 
             with self.depl._db:
                 self.state = self.UP
                 self.queue_name = defn.queue_name
-                self.url = q.url
-                self.arn = q.get_attributes()["QueueArn"]
+                self.url = url
+                self.arn = self._get_sqs_client().get_queue_attributes(
+                    QueueUrl=url, AttributeNames=["QueueArn"]
+                )["Attributes"]["QueueArn"]
 
     def destroy(self, wipe=False):
         self._destroy()
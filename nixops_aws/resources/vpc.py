@@ -2,7 +2,7 @@
 
 # Automatic provisioning of AWS VPCs.
 
-import botocore
+import botocore.exceptions
 import time
 import nixops.util
 import nixops.resources
@@ -138,27 +138,23 @@ class VPCState(nixops.resources.DiffEngineResourceState, EC2CommonState):
         }
 
     def wait_for_vpc_available(self, vpc_id):
-        while True:
-            response = self.get_client().describe_vpcs(VpcIds=[vpc_id])
-            if len(response["Vpcs"]) == 1:
-                vpc = response["Vpcs"][0]
-                if vpc["State"] == "available":
-                    break
-                elif vpc["State"] != "pending":
-                    raise Exception(
-                        "vpc {0} is in an unexpected state {1}".format(
-                            vpc_id, vpc["State"]
-                        )
-                    )
-
-                self.log_continue(".")
-                time.sleep(1)
-            else:
+        def vpc_available(vpc):
+            if vpc is None:
                 raise Exception(
                     "couldn't find vpc {}, please run a deploy with --check".format(
-                        self._state["vpcId"]
+                        vpc_id
                     )
                 )
+            if vpc["State"] == "available":
+                return True
+            if vpc["State"] != "pending":
+                raise Exception(
+                    "vpc {0} is in an unexpected state {1}".format(vpc_id, vpc["State"])
+                )
+            self.log_continue(".")
+            return False
+
+        self._get_waiter("vpcs").wait(vpc_id, vpc_available)
         self.log_end(" done")
 
         with self.depl._db:
@@ -195,10 +191,7 @@ class VPCState(nixops.resources.DiffEngineResourceState, EC2CommonState):
             self._state["instanceTenancy"] = config["instanceTenancy"]
 
         def tag_updater(tags):
-            self.get_client().create_tags(
-                Resources=[self.vpc_id],
-                Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-            )
+            self._create_tags([self.vpc_id], tags)
 
         self.update_tags_using(tag_updater, user_tags=config["tags"], check=True)
 
@@ -298,9 +291,7 @@ class VPCState(nixops.resources.DiffEngineResourceState, EC2CommonState):
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self.vpc_id], Tags=[{"Key": k, "Value": tags[k]} for k in tags]
-        )
+        self._reconcile_tags(self.vpc_id, tags)
 
     def destroy(self, wipe=False):
         self._destroy()
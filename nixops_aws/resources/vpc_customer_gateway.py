@@ -3,7 +3,7 @@
 # Automatic provisioning of AWS VPC customer gateways.
 
 
-import botocore
+import botocore.exceptions
 
 from nixops.state import StateDict
 from nixops.diff import Handler
@@ -112,10 +112,7 @@ class VPCCustomerGatewayState(nixops.resources.DiffEngineResourceState, EC2Commo
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["customerGatewayId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["customerGatewayId"], tags)
 
     def _destroy(self):
         if self.state != self.UP:
@@ -3,7 +3,7 @@
 # Automatic provisioning of AWS VPC DHCP options.
 
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
@@ -159,10 +159,7 @@ class VPCDhcpOptionsState(nixops.resources.DiffEngineResourceState, EC2CommonSta
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["dhcpOptionsId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["dhcpOptionsId"], tags)
 
     def _destroy(self):
         if self.state != self.UP:
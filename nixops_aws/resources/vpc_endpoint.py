@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import uuid
-import botocore
+import botocore.exceptions
 from nixops.state import StateDict
 from nixops.diff import Handler
 import nixops.util
@@ -117,10 +117,7 @@ class VPCInternetGatewayState(nixops.resources.DiffEngineResourceState, EC2Commo
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["internetGatewayId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["internetGatewayId"], tags)
 
     def _destroy(self):
         if self.state != self.UP:
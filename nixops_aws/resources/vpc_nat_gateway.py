@@ -3,9 +3,8 @@
 # Automatic provisioning of AWS VPC NAT gateways.
 
 import uuid
-import time
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
@@ -141,38 +140,24 @@ class VPCNatGatewayState(nixops.resources.DiffEngineResourceState, EC2CommonStat
                 self._state["natGatewayId"]
             )
         )
-        while True:
-            try:
-                response = self.get_client().describe_nat_gateways(
-                    NatGatewayIds=[self._state["natGatewayId"]]
-                )
-            except botocore.exceptions.ClientError as e:
-                if (
-                    e.response["Error"]["Code"] == "InvalidNatGatewayID.NotFound"
-                    or e.response["Error"]["Code"] == "NatGatewayNotFound"
-                ):
-                    self.warn(
-                        "nat gateway {} was already deleted".format(
-                            self._state["natGatewayId"]
-                        )
-                    )
-                    break
-                else:
-                    raise
-            if len(response["NatGateways"]) == 1:
-                if response["NatGateways"][0]["State"] == "deleted":
-                    break
-                elif response["NatGateways"][0]["State"] != "deleting":
-                    raise Exception(
-                        "nat gateway {0} in an unexpected state {1}".format(
-                            self._state["natGatewayId"],
-                            response["NatGateways"][0]["State"],
-                        )
+        nat_gateway_id = self._state["natGatewayId"]
+
+        def nat_gtw_deleted(gtw):
+            if gtw is None:
+                self.warn("nat gateway {} was already deleted".format(nat_gateway_id))
+                return True
+            if gtw["State"] == "deleted":
+                return True
+            if gtw["State"] != "deleting":
+                raise Exception(
+                    "nat gateway {0} in an unexpected state {1}".format(
+                        nat_gateway_id, gtw["State"]
                     )
-                self.log_continue(".")
-                time.sleep(1)
-            else:
-                break
+                )
+            self.log_continue(".")
+            return False
+
+        self._get_waiter("nat_gateways").wait(nat_gateway_id, nat_gtw_deleted)
         self.log_end(" done")
 
     def _destroy(self):
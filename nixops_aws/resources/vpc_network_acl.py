@@ -2,7 +2,7 @@
 
 # automatic provisioning of aws vpc network ACLs.
 
-import botocore
+import botocore.exceptions
 import nixops.util
 import nixops.resources
 from nixops_aws.resources.ec2_common import EC2CommonState
@@ -277,10 +277,7 @@ class VPCNetworkAclState(nixops.resources.DiffEngineResourceState, EC2CommonStat
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["networkAclId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["networkAclId"], tags)
 
     def destroy(self, wipe=False):
         self._destroy()
@@ -2,7 +2,7 @@
 
 # Automatic provisioning of AWS VPC network interfaces.
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
@@ -218,10 +218,7 @@ class VPCNetworkInterfaceState(
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["networkInterfaceId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["networkInterfaceId"], tags)
 
     def _destroy(self):
         if self.state != self.UP:
@@ -4,7 +4,7 @@
 
 import time
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
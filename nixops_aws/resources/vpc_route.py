@@ -2,7 +2,7 @@
 
 # Automatic provisioning of AWS VPC route.
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
@@ -2,7 +2,7 @@
 
 # Automatic provisioning of AWS VPC route tables.
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
@@ -156,10 +156,7 @@ class VPCRouteTableState(nixops.resources.DiffEngineResourceState, EC2CommonStat
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["routeTableId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["routeTableId"], tags)
 
     def _destroy(self):
         if self.state != self.UP:
@@ -2,7 +2,7 @@
 
 # Automatic provisioning of AWS VPC route table association.
 
-import botocore
+import botocore.exceptions
 
 import nixops.util
 import nixops.resources
@@ -2,8 +2,7 @@
 
 # Automatic provisioning of AWS VPC subnets.
 
-import botocore
-import time
+import botocore.exceptions
 import nixops.util
 import nixops.resources
 from nixops_aws.resources.ec2_common import EC2CommonState
@@ -98,7 +97,9 @@ class VPCSubnetState(nixops.resources.DiffEngineResourceState, EC2CommonState):
         self._state["region"] = config["region"]
 
         if self._state.get("subnetId", None):
-            if check:
+            if check and not self._get_inventory().get(
+                "subnets", self._state["subnetId"]
+            ):
                 try:
                     self.get_client().describe_subnets(
                         SubnetIds=[self._state["subnetId"]]
@@ -118,26 +119,25 @@ class VPCSubnetState(nixops.resources.DiffEngineResourceState, EC2CommonState):
                 self.wait_for_subnet_available(self._state["subnetId"])
 
     def wait_for_subnet_available(self, subnet_id):
-        while True:
-            response = self.get_client().describe_subnets(SubnetIds=[subnet_id])
-            if len(response["Subnets"]) == 1:
-                subnet = response["Subnets"][0]
-                if subnet["State"] == "available":
-                    break
-                elif subnet["State"] != "pending":
-                    raise Exception(
-                        "subnet {0} is in an unexpected state {1}".format(
-                            subnet_id, subnet["State"]
-                        )
-                    )
-                self.log_continue(".")
-                time.sleep(1)
-            else:
+        def subnet_available(subnet):
+            if subnet is None:
                 raise Exception(
                     "couldn't find subnet {}, please run deploy with --check".format(
                         subnet_id
                     )
                 )
+            if subnet["State"] == "available":
+                return True
+            if subnet["State"] != "pending":
+                raise Exception(
+                    "subnet {0} is in an unexpected state {1}".format(
+                        subnet_id, subnet["State"]
+                    )
+                )
+            self.log_continue(".")
+            return False
+
+        self._get_waiter("subnets").wait(subnet_id, subnet_available)
         self.log_end(" done")
 
         with self.depl._db:
@@ -184,10 +184,7 @@ class VPCSubnetState(nixops.resources.DiffEngineResourceState, EC2CommonState):
             self._state["region"] = config["region"]
 
         def tag_updater(tags):
-            self.get_client().create_tags(
-                Resources=[self.subnet_id],
-                Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-            )
+            self._create_tags([self.subnet_id], tags)
 
         self.update_tags_using(tag_updater, user_tags=config["tags"], check=True)
 
@@ -228,10 +225,7 @@ class VPCSubnetState(nixops.resources.DiffEngineResourceState, EC2CommonState):
         config = self.get_defn()
         tags = config["tags"]
         tags.update(self.get_common_tags())
-        self.get_client().create_tags(
-            Resources=[self._state["subnetId"]],
-            Tags=[{"Key": k, "Value": tags[k]} for k in tags],
-        )
+        self._reconcile_tags(self._state["subnetId"], tags)
 
     def _destroy(self):
         if self.state != (self.UP or self.STARTING):
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Placement of spot instances.
+
+A spot request is only fulfilled once EC2 has spare capacity for its instance
+type in its zone at a price below the maximum price, which differs a lot
+between zones.  :func:`rank` orders the (instance type, zone) candidates of a
+launch by how likely they are to be fulfilled quickly: zones with a higher
+spot placement score first, then the preferred instance types, then the
+cheaper ones.  Candidates whose current spot price exceeds the maximum price
+are dropped, as EC2 would keep their requests open without fulfilling them.
+
+Placement scores, spot prices and the zones of a region are fetched once per
+run and shared by all machines.  Placement scores need the
+ec2:GetSpotPlacementScores permission and a botocore that knows the call:
+when they can't be fetched, the candidates are ranked by price alone.
+"""
+
+import datetime
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import botocore.exceptions
+
+import nixops_aws.ec2_utils
+
+# Spot prices of the platform of NixOS images.
+PRODUCT_DESCRIPTION = "Linux/UNIX"
+
+_Key = Tuple[str, Optional[str]]
+
+_zones: Dict[_Key, Dict[str, str]] = {}
+_scores: Dict[Tuple[_Key, Tuple[str, ...]], Dict[str, int]] = {}
+_prices: Dict[Tuple[_Key, str], Dict[str, float]] = {}
+_lock = threading.Lock()
+_fetch_locks: Dict[_Key, threading.Lock] = {}
+
+
+def _client(region: str, access_key_id: Optional[str]):
+    return nixops_aws.ec2_utils.get_boto3_client("ec2", region, access_key_id)
+
+
+def _fetch_zones(region: str, access_key_id: Optional[str]) -> Dict[str, str]:
+    """Return the available zones of the region, by zone ID."""
+    client = _client(region, access_key_id)
+    response = nixops_aws.ec2_utils.retry(
+        lambda: client.describe_availability_zones(
+            Filters=[{"Name": "state", "Values": ["available"]}]
+        ),
+        region=region,
+    )
+    return {z["ZoneId"]: z["ZoneName"] for z in response["AvailabilityZones"]}
+
+
+def _fetch_scores(
+    region: str, access_key_id: Optional[str], instance_types: Sequence[str]
+) -> Dict[str, int]:
+    """Return the single-zone spot placement scores of the region, by zone ID."""
+    client = _client(region, access_key_id)
+    # GetSpotPlacementScores is newer than some of the botocore releases
+    # NixOps is used with.
+    if not hasattr(client, "get_spot_placement_scores"):
+        return {}
+    try:
+        response = nixops_aws.ec2_utils.retry(
+            lambda: client.get_spot_placement_scores(
+                InstanceTypes=list(instance_types),
+                TargetCapacity=1,
+                SingleAvailabilityZone=True,
+                RegionNames=[region],
+            ),
+            region=region,
+            fatal_codes=("UnauthorizedOperation", "InvalidAction"),
+        )
+    except botocore.exceptions.ClientError:
+        return {}
+    return {
+        s["AvailabilityZoneId"]: s["Score"]
+        for s in response["SpotPlacementScores"]
+        if "AvailabilityZoneId" in s
+    }
+
+
+def _fetch_prices(
+    region: str, access_key_id: Optional[str], instance_types: Sequence[str]
+) -> Dict[str, Dict[str, float]]:
+    """Return the current spot prices of the instance types, by zone name."""
+    client = _client(region, access_key_id)
+    prices: Dict[str, Dict[str, float]] = {t: {} for t in instance_types}
+    # Without an end time, only the current price of each type and zone.
+    start = datetime.datetime.utcnow()
+    paginator = client.get_paginator("describe_spot_price_history")
+    for page in nixops_aws.ec2_utils.retry(
+        lambda: list(
+            paginator.paginate(
+                InstanceTypes=list(instance_types),
+                ProductDescriptions=[PRODUCT_DESCRIPTION],
+                StartTime=start,
+            )
+        ),
+        region=region,
+    ):
+        for entry in page["SpotPriceHistory"]:
+            zone_prices = prices[entry["InstanceType"]]
+            # The history is newest first.
+            zone_prices.setdefault(entry["AvailabilityZone"], float(entry["SpotPrice"]))
+    return prices
+
+
+def _market(
+    region: str, access_key_id: Optional[str], instance_types: Sequence[str]
+) -> Tuple[Dict[str, str], Dict[str, int], Dict[str, Dict[str, float]]]:
+    """Return the zones, placement scores and spot prices, fetching what's missing."""
+    key = (region, access_key_id)
+    types = tuple(sorted(set(instance_types)))
+    with _lock:
+        fetch_lock = _fetch_locks.setdefault(key, threading.Lock())
+
+    with fetch_lock:
+        with _lock:
+            zones = _zones.get(key)
+            scores = _scores.get((key, types))
+            missing = [t for t in types if (key, t) not in _prices]
+        if zones is None:
+            zones = _fetch_zones(region, access_key_id)
+        if scores is None:
+            scores = _fetch_scores(region, access_key_id, types)
+        prices = _fetch_prices(region, access_key_id, missing) if missing else {}
+        with _lock:
+            _zones[key] = zones
+            _scores[(key, types)] = scores
+            for t, zone_prices in prices.items():
+                _prices[(key, t)] = zone_prices
+            prices = {t: _prices[(key, t)] for t in types}
+
+    return zones, scores, prices
+
+
+def rank(
+    region: str,
+    access_key_id: Optional[str],
+    candidates: Sequence[Tuple[str, Optional[str]]],
+    max_price: float,
+) -> List[Tuple[str, str]]:
+    """
+    Return the (instance type, zone) candidates in the order in which their
+    spot requests are most likely to be fulfilled, without those whose current
+    spot price exceeds ``max_price`` (in dollars per hour).  A candidate
+    without a zone stands for all zones of the region.  An empty list means
+    that no candidate is known to be within the price.
+    """
+    instance_types = list(dict.fromkeys(t for t, _ in candidates))
+    zones, scores, prices = _market(region, access_key_id, instance_types)
+    score_by_name = {zones[z]: score for z, score in scores.items() if z in zones}
+
+    expanded = list(
+        dict.fromkeys(
+            (instance_type, zone)
+            for instance_type, candidate_zone in candidates
+            for zone in ([candidate_zone] if candidate_zone else sorted(zones.values()))
+        )
+    )
+    affordable = [
+        (instance_type, zone)
+        for instance_type, zone in expanded
+        if prices[instance_type].get(zone, max_price + 1) <= max_price
+    ]
+    return sorted(
+        affordable,
+        key=lambda c: (
+            -score_by_name.get(c[1], 0),
+            instance_types.index(c[0]),
+            prices[c[0]][c[1]],
+        ),
+    )
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Coalesced EC2 tag writes.
+
+CreateTags accepts up to 1000 resource IDs as long as they all get the same
+tags.  A :class:`TagBatcher` collects the tag writes issued by concurrently
+deploying resources for a short window (see :mod:`nixops_aws.coalesce`),
+groups them by identical tag set and issues one CreateTags per group.
+Callers block until their write has been flushed, so tagging stays
+synchronous from a resource's point of view.  A writer with nobody else
+writing recently doesn't wait for company.
+
+One bad resource ID fails a whole CreateTags call; the resources of a failed
+call are then tagged one by one, so that each writer gets its own result
+and the other groups are still flushed.
+
+:func:`tags_hash` and :func:`diff_tags` support reconciling tags: resources
+remember a hash of the tag set they last applied to each AWS ID and only
+talk to AWS when the desired tag set hashes differently.
+"""
+
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import nixops_aws.coalesce
+import nixops_aws.ec2_utils
+import nixops_aws.waiter
+
+# How long the first writer waits for others to join its batch.
+COALESCE_WINDOW = 0.2
+
+# CreateTags accepts at most this many resource IDs per call.
+MAX_RESOURCES_PER_CALL = 1000
+
+# Errors about malformed resource IDs, which retrying the call doesn't help.
+# Resources that are not found are retried: they may not be visible yet.
+FATAL_CODES = ("InvalidID",) + tuple(
+    code for code in nixops_aws.waiter.ID_ERROR_CODES if code.endswith("Malformed")
+)
+
+
+def to_boto3_tags(tags: Dict[str, str]) -> List[Dict[str, str]]:
+    return [{"Key": k, "Value": v} for k, v in sorted(tags.items())]
+
+
+def tag_specifications(resource_type: str, tags: Dict[str, str]) -> List[dict]:
+    """Return a TagSpecifications list tagging a resource at creation time."""
+    return [{"ResourceType": resource_type, "Tags": to_boto3_tags(tags)}]
+
+
+def tags_hash(tags: Dict[str, str]) -> str:
+    """Return a stable hash of a tag set."""
+    return hashlib.sha256(json.dumps(tags, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def diff_tags(
+    current: Dict[str, str], desired: Dict[str, str], managed_keys: Iterable[str]
+) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Return the tags to set and the keys to delete to get from ``current`` to
+    ``desired``.  Only keys in ``managed_keys`` (the keys applied previously)
+    are deleted, so tags added outside NixOps are left alone.
+    """
+    to_set = {k: v for k, v in desired.items() if current.get(k) != v}
+    to_delete = sorted(k for k in managed_keys if k not in desired and k in current)
+    return to_set, to_delete
+
+
+class TagBatcher:
+    """Coalesces CreateTags calls for one region and access key."""
+
+    def __init__(self, region: str, access_key_id: Optional[str]):
+        self.region = region
+        self.access_key_id = access_key_id
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._coalescer = nixops_aws.coalesce.Coalescer(
+            COALESCE_WINDOW, self._flush, wait_alone=False
+        )
+
+    def create_tags(self, resource_ids: List[str], tags: Dict[str, str]) -> None:
+        """Tag the given resources, sharing a CreateTags call with other writers."""
+        if not resource_ids:
+            return
+        self._coalescer.submit(
+            json.dumps(tags, sort_keys=True), (list(resource_ids), dict(tags))
+        )
+
+    def _call(self, client, tags: Dict[str, str], resource_ids: List[str]) -> None:
+        nixops_aws.ec2_utils.retry(
+            lambda: client.create_tags(
+                Resources=resource_ids, Tags=to_boto3_tags(tags)
+            ),
+            region=self.region,
+            fatal_codes=FATAL_CODES,
+        )
+        with self._lock:
+            self.calls += 1
+
+    def _flush(self, members: List[nixops_aws.coalesce.Member]) -> None:
+        client = nixops_aws.ec2_utils.get_boto3_client(
+            "ec2", self.region, self.access_key_id
+        )
+        tags = members[0].request[1]
+        resource_ids: List[str] = []
+        for member in members:
+            resource_ids.extend(r for r in member.request[0] if r not in resource_ids)
+        errors = nixops_aws.coalesce.call_in_chunks(
+            resource_ids,
+            MAX_RESOURCES_PER_CALL,
+            lambda chunk: self._call(client, tags, chunk),
+        )
+        for member in members:
+            member.error = next(
+                (errors[r] for r in member.request[0] if r in errors), None
+            )
+
+
+_batchers: Dict[Tuple[str, Optional[str]], TagBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_tag_batcher(region: str, access_key_id: Optional[str]) -> TagBatcher:
+    """Return the shared tag batcher for a region and access key."""
+    key = (region, access_key_id)
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = TagBatcher(region, access_key_id)
+        return batcher
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Client-side rate limiting and retry policy shared by all AWS calls.
+
+Every (service, region) pair gets a single :class:`RateLimiter`.  All
+resources of a deployment that talk to the same endpoint draw from the same
+token bucket, so parallel deploys slow down together when AWS starts
+throttling instead of each resource retrying on its own.
+"""
+
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple, TypeVar, Union
+
+import nixops_aws.metrics
+
+T = TypeVar("T")
+
+# Error codes AWS uses to tell a client to slow down.
+THROTTLING_ERROR_CODES = frozenset(
+    [
+        "Throttling",
+        "ThrottlingException",
+        "ThrottledException",
+        "RequestThrottledException",
+        "RequestThrottled",
+        "RequestLimitExceeded",
+        "TooManyRequestsException",
+        "ProvisionedThroughputExceededException",
+        "BandwidthLimitExceeded",
+        "SlowDown",
+        "EC2ThrottledException",
+        "PriorRequestNotComplete",
+    ]
+)
+
+# Server-side errors that are expected to go away on their own.
+TRANSIENT_ERROR_CODES = frozenset(
+    [
+        "InternalError",
+        "InternalFailure",
+        "InternalServerError",
+        "ServiceUnavailable",
+        "ServiceUnavailableException",
+        "Unavailable",
+        "RequestTimeout",
+        "RequestTimeoutException",
+        "IDPCommunicationError",
+    ]
+)
+
+# Errors that no amount of retrying will fix.
+FATAL_ERROR_CODES = frozenset(
+    [
+        "AuthFailure",
+        "UnauthorizedOperation",
+        "InvalidClientTokenId",
+        "SignatureDoesNotMatch",
+        "OptInRequired",
+        "Blocked",
+        "DryRunOperation",
+        "MissingParameter",
+        "UnsupportedOperation",
+    ]
+)
+
+# Errors meaning that EC2 can't launch the requested instance type in the
+# requested availability zone right now, but might elsewhere.
+CAPACITY_ERROR_CODES = frozenset(
+    [
+        "InsufficientInstanceCapacity",
+        "InsufficientHostCapacity",
+        "InsufficientCapacity",
+        "Unsupported",
+    ]
+)
+
+# Throttling errors a single call retries before giving up.
+MAX_THROTTLE_RETRIES = 20
+
+# Minimum time to wait before retrying one of the error codes a caller asked
+# to be retried.  These are mostly eventual-consistency errors (a resource
+# that was just created isn't visible yet), which take seconds to clear.
+ERROR_CODE_MIN_DELAY = 5.0
+
+THROTTLE = "throttle"
+TRANSIENT = "transient"
+FATAL = "fatal"
+OTHER = "other"
+
+
+def error_code(e: Exception) -> Optional[str]:
+    """Return the AWS error code of a boto2 or boto3 exception, if any."""
+    code = getattr(e, "error_code", None)
+    if code is not None:
+        return code
+    response = getattr(e, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
+
+
+def error_message(e: Exception) -> Optional[str]:
+    """Return the AWS error message of a boto2 or boto3 exception, if any."""
+    message = getattr(e, "error_message", None)
+    if message is not None:
+        return message
+    response = getattr(e, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Message")
+    return None
+
+
+def classify_error(code: Optional[str]) -> str:
+    """Classify an AWS error code as throttle, transient, fatal or other."""
+    if code in THROTTLING_ERROR_CODES:
+        return THROTTLE
+    if code in TRANSIENT_ERROR_CODES:
+        return TRANSIENT
+    if code in FATAL_ERROR_CODES:
+        return FATAL
+    return OTHER
+
+
+def full_jitter_backoff(attempt: int, base: float = 1.0, cap: float = 20.0) -> float:
+    """Sleep time for the given (1-based) attempt: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RateLimiter:
+    """
+    Token bucket with additive-increase/multiplicative-decrease refill rate.
+
+    Each call takes one token.  A throttling error halves the refill rate;
+    every success nudges it back towards ``max_rate``.
+    """
+
+    def __init__(
+        self, max_rate: float = 20.0, burst: float = 40.0, min_rate: float = 0.5
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.rate = max_rate
+        self.tokens = burst
+        self.last_refill = time.monotonic()
+        self.calls = 0
+        self.throttles = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.burst, self.tokens + (now - self.last_refill) * self.rate
+        )
+        self.last_refill = now
+
+    def acquire(self) -> None:
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.calls += 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+
+    def on_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+
+class RetryBudget:
+    """
+    Process-wide quota of retries, modelled on botocore's "standard" retry
+    mode: each retry costs tokens, each successful call refunds one.  Once
+    the budget is exhausted errors are raised instead of retried, which keeps
+    a failing endpoint from being hammered by every resource at once.
+    """
+
+    def __init__(
+        self, capacity: int = 500, retry_cost: int = 5, throttle_cost: int = 1
+    ):
+        self.capacity = capacity
+        self.available = capacity
+        self.retry_cost = retry_cost
+        self.throttle_cost = throttle_cost
+        self._lock = threading.Lock()
+
+    def take(self, kind: str) -> bool:
+        cost = self.throttle_cost if kind == THROTTLE else self.retry_cost
+        with self._lock:
+            if self.available < cost:
+                return False
+            self.available -= cost
+            return True
+
+    def refund(self) -> None:
+        with self._lock:
+            self.available = min(self.capacity, self.available + 1)
+
+
+_limiters: Dict[Tuple[str, Optional[str]], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+retry_budget = RetryBudget()
+
+
+def get_rate_limiter(service: str, region: Optional[str]) -> RateLimiter:
+    """Return the shared rate limiter for the given service and region."""
+    key = (service, region)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter()
+        return limiter
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    """Return call, throttle and retry counters per ``service/region``."""
+    with _limiters_lock:
+        items = list(_limiters.items())
+    return {
+        "{0}/{1}".format(service, region or "global"): {
+            "calls": limiter.calls,
+            "throttles": limiter.throttles,
+            "retries": limiter.retries,
+        }
+        for (service, region), limiter in items
+    }
+
+
+def call_with_retry(
+    f: Callable[[], T],
+    retryable: Union[Tuple[type, ...], Callable[[], Tuple[type, ...]]],
+    service: str = "ec2",
+    region: Optional[str] = None,
+    error_codes: Iterable[str] = (),
+    num_retries: int = 7,
+    fatal_codes: Iterable[str] = (),
+    logger=None,
+    num_throttle_retries: int = MAX_THROTTLE_RETRIES,
+) -> T:
+    """
+    Call f through the rate limiter of (service, region), retrying AWS errors.
+
+    Throttling errors are retried up to ``num_throttle_retries`` times (they
+    don't count against ``num_retries``).  Fatal errors, and errors with a
+    code in ``fatal_codes``, are never retried.  Other errors are retried up
+    to ``num_retries`` times; if ``error_codes`` is non-empty, only those
+    codes are retried, for boto2 and boto3 errors alike, and each retry of
+    one of them waits at least ``ERROR_CODE_MIN_DELAY`` seconds.  All
+    retries draw from the global retry budget.
+
+    Only exceptions of the ``retryable`` types are retried.  ``retryable`` may
+    be a function returning them, called once ``f`` has failed: the error
+    classes of a library loaded by ``f`` can then be retried too.
+    """
+    limiter = get_rate_limiter(service, region)
+    error_codes = list(error_codes)
+    fatal_codes = frozenset(fatal_codes)
+    attempt = 0  # retries counted against num_retries
+    throttles = 0  # retries counted against num_throttle_retries
+    backoff = 0  # all retries, including throttles
+    while True:
+        limiter.acquire()
+        try:
+            result = f()
+        except Exception as e:
+            if not isinstance(e, retryable() if callable(retryable) else retryable):
+                raise
+            code = error_code(e)
+            kind = classify_error(code)
+            if kind == THROTTLE:
+                limiter.on_throttle()
+                if throttles >= num_throttle_retries:
+                    raise
+                throttles += 1
+            elif (
+                kind == FATAL
+                or code in fatal_codes
+                or attempt >= num_retries
+                or (error_codes and code not in error_codes)
+            ):
+                raise
+            else:
+                attempt += 1
+            if not retry_budget.take(kind):
+                raise
+            backoff += 1
+            limiter.on_retry()
+            nixops_aws.metrics.record_retry(kind)
+            if logger is not None:
+                logger.log(
+                    "got (possibly transient) {0} error code '{1}': {2}. retrying...".format(
+                        service.upper(), code, error_message(e)
+                    )
+                )
+            delay = full_jitter_backoff(min(backoff, 10))
+            if code in error_codes:
+                delay += ERROR_CODE_MIN_DELAY
+            time.sleep(delay)
+        else:
+            limiter.on_success()
+            retry_budget.refund()
+            return result
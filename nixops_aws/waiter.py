@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""
+Shared waiter for EC2 resources reaching a state.
+
+Resources register "wait until resource X satisfies a condition" with the
+:class:`Waiter` for its kind and region.  Whichever waiting thread happens to
+be free performs the next poll: one describe call, filtered on the IDs of
+*all* pending waits of that kind, whose results are handed out to every
+waiter.  Fifty machines waiting for their instances therefore cost one
+DescribeInstances per tick instead of fifty.
+
+The poll interval adapts: it starts at ``MIN_INTERVAL`` and grows while
+nothing changes, and drops back as soon as any watched resource changes
+state.
+"""
+
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import nixops_aws.ec2_utils
+import nixops_aws.throttle
+
+MIN_INTERVAL = 1.0
+MAX_INTERVAL = 15.0
+BACKOFF = 1.5
+
+# Errors about individual resources, which retrying a describe doesn't help.
+ID_ERROR_CODES = (
+    "InvalidParameterValue",
+    "InvalidInstanceID.Malformed",
+    "InvalidInstanceID.NotFound",
+    "InvalidVolumeID.Malformed",
+    "InvalidVolume.NotFound",
+    "InvalidSnapshotID.Malformed",
+    "InvalidSnapshot.NotFound",
+    "InvalidVpcID.Malformed",
+    "InvalidVpcID.NotFound",
+    "InvalidSubnetID.Malformed",
+    "InvalidSubnetID.NotFound",
+    "NatGatewayMalformed",
+    "NatGatewayNotFound",
+    "InvalidSpotInstanceRequestID.Malformed",
+    "InvalidSpotInstanceRequestID.NotFound",
+)
+
+# Polls in a row that may fail altogether before the waits are given up.
+MAX_FAILED_POLLS = 3
+
+# EC2 accepts at most this many values per describe filter.
+MAX_FILTER_VALUES = 200
+
+# Kind -> (describe operation, result key, ID filter name, ID key, state key).
+# Filters are used instead of ID lists so that one missing resource doesn't
+# fail the describe for all the others.
+KINDS: Dict[str, Tuple[str, str, str, str, str]] = {
+    "instances": (
+        "describe_instances",
+        "Reservations",
+        "instance-id",
+        "InstanceId",
+        "State",
+    ),
+    "volumes": ("describe_volumes", "Volumes", "volume-id", "VolumeId", "State"),
+    "snapshots": (
+        "describe_snapshots",
+        "Snapshots",
+        "snapshot-id",
+        "SnapshotId",
+        "State",
+    ),
+    "vpcs": ("describe_vpcs", "Vpcs", "vpc-id", "VpcId", "State"),
+    "subnets": ("describe_subnets", "Subnets", "subnet-id", "SubnetId", "State"),
+    "nat_gateways": (
+        "describe_nat_gateways",
+        "NatGateways",
+        "nat-gateway-id",
+        "NatGatewayId",
+        "State",
+    ),
+    # Fast snapshot restores are per snapshot and zone: their IDs are made
+    # by fast_snapshot_restore_id().
+    "fast_snapshot_restores": (
+        "describe_fast_snapshot_restores",
+        "FastSnapshotRestores",
+        "snapshot-id",
+        "SnapshotId",
+        "State",
+    ),
+    # The state of an instance status is its overall status (initializing,
+    # ok, impaired, ...); it is only reported for running instances.
+    "instance_statuses": (
+        "describe_instance_status",
+        "InstanceStatuses",
+        "instance-id",
+        "InstanceId",
+        "InstanceStatus",
+    ),
+    "spot_requests": (
+        "describe_spot_instance_requests",
+        "SpotInstanceRequests",
+        "spot-instance-request-id",
+        "SpotInstanceRequestId",
+        "State",
+    ),
+}
+
+
+def fast_snapshot_restore_id(snapshot_id: str, zone: str) -> str:
+    """Return the waiter ID of the fast snapshot restore of a snapshot in a zone."""
+    return snapshot_id + "/" + zone
+
+
+def _resource_id(kind: str, item: Dict[str, Any]) -> str:
+    if kind == "fast_snapshot_restores":
+        return fast_snapshot_restore_id(item["SnapshotId"], item["AvailabilityZone"])
+    return item[KINDS[kind][3]]
+
+
+def _missing_instance_ids(error: Exception, ids: List[str]) -> List[str]:
+    """
+    Return the IDs among ``ids`` that an InvalidInstanceID.NotFound error
+    reports as missing.
+    """
+    if nixops_aws.throttle.error_code(error) != "InvalidInstanceID.NotFound":
+        return []
+    if len(ids) == 1:
+        return ids
+    # "The instance IDs 'i-1, i-2' do not exist"
+    named = set(
+        re.findall(r"i-[0-9a-f]+", nixops_aws.throttle.error_message(error) or "")
+    )
+    return [i for i in ids if i in named]
+
+
+def resource_state(kind: str, item: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Return the state of a described resource, or None if it is missing."""
+    if item is None:
+        return None
+    state = item[KINDS[kind][4]]
+    if isinstance(state, dict):
+        return state["Name"] if "Name" in state else state["Status"]
+    return state
+
+
+class _Pending:
+    def __init__(self, resource_id, done, on_update):
+        self.resource_id = resource_id
+        self.done = done
+        self.on_update = on_update
+        self.last_state: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.finished = False
+
+
+class Waiter:
+    """Multiplexed waits for resources of one kind in one region."""
+
+    def __init__(self, kind: str, region: str, access_key_id: Optional[str]):
+        self.kind = kind
+        self.region = region
+        self.access_key_id = access_key_id
+        self.interval = MIN_INTERVAL
+        self.describe_calls = 0
+        self._pending: List[_Pending] = []
+        self._polling = False
+        self._last_poll = 0.0
+        self._failed_polls = 0
+        self._cond = threading.Condition()
+
+    def _describe(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        operation, result_key, filter_name, id_key, _ = KINDS[self.kind]
+        client = nixops_aws.ec2_utils.get_boto3_client(
+            "ec2", self.region, self.access_key_id
+        )
+        # DescribeNatGateways spells its filter parameter differently,
+        # DescribeInstanceStatus has no ID filter and fast snapshot restores
+        # are filtered on both their snapshot and zone.
+        filter_param = "Filter" if self.kind == "nat_gateways" else "Filters"
+        results: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(ids), MAX_FILTER_VALUES):
+            chunk = ids[i : i + MAX_FILTER_VALUES]
+
+            def fetch_pages():
+                kwargs: Dict[str, Any] = {
+                    filter_param: [{"Name": filter_name, "Values": chunk}]
+                }
+                if self.kind == "instance_statuses":
+                    kwargs = {"InstanceIds": chunk}
+                if self.kind == "fast_snapshot_restores":
+                    snapshots, zones = zip(*(r.split("/") for r in chunk))
+                    kwargs = {
+                        "Filters": [
+                            {"Name": "snapshot-id", "Values": sorted(set(snapshots))},
+                            {"Name": "availability-zone", "Values": sorted(set(zones))},
+                        ]
+                    }
+                if client.can_paginate(operation):
+                    return list(client.get_paginator(operation).paginate(**kwargs))
+                return [getattr(client, operation)(**kwargs)]
+
+            while True:
+                self.describe_calls += 1
+                try:
+                    pages = nixops_aws.ec2_utils.retry(
+                        fetch_pages, region=self.region, fatal_codes=ID_ERROR_CODES
+                    )
+                    break
+                except Exception as e:
+                    # DescribeInstanceStatus fails for instances that don't
+                    # exist (yet): describe the others, leaving them missing.
+                    missing = (
+                        _missing_instance_ids(e, chunk)
+                        if self.kind == "instance_statuses"
+                        else []
+                    )
+                    if not missing:
+                        raise
+                    chunk = [r for r in chunk if r not in missing]
+                    if not chunk:
+                        pages = []
+                        break
+            for page in pages:
+                items = page.get(result_key, [])
+                if self.kind == "instances":
+                    items = [i for r in items for i in r["Instances"]]
+                for item in items:
+                    results[_resource_id(self.kind, item)] = item
+        return results
+
+    def _describe_each(
+        self, ids: List[str], error: Exception
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Exception]]:
+        """
+        After describing ``ids`` together failed with ``error``, find out
+        which of them caused it by describing them one by one.  Return the
+        results and the errors by ID.
+        """
+        code = nixops_aws.throttle.error_code(error)
+        # Throttling, server and credential errors don't depend on the IDs.
+        if (
+            len(ids) == 1
+            or code is None
+            or nixops_aws.throttle.classify_error(code) != nixops_aws.throttle.OTHER
+        ):
+            return {}, {i: error for i in ids}
+        results: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, Exception] = {}
+        for i in ids:
+            try:
+                results.update(self._describe([i]))
+            except Exception as e:
+                errors[i] = e
+        return results, errors
+
+    def _poll(self) -> None:
+        """Perform one tick for all pending waits.  Called without the lock held."""
+        delay = self._last_poll + self.interval - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        with self._cond:
+            pending = [p for p in self._pending if not p.finished]
+        ids = sorted({p.resource_id for p in pending})
+        try:
+            results, errors = self._describe(ids), {}
+        except Exception as e:
+            results, errors = self._describe_each(ids, e)
+        finally:
+            self._last_poll = time.monotonic()
+
+        if errors and len(errors) == len(ids):
+            # Not the fault of any one resource: keep waiting for a while.
+            self._failed_polls += 1
+            if self._failed_polls < MAX_FAILED_POLLS:
+                self.interval = min(MAX_INTERVAL, self.interval * BACKOFF)
+                return
+        self._failed_polls = 0
+
+        changed = False
+        for p in pending:
+            if p.resource_id in errors:
+                p.error = errors[p.resource_id]
+                p.finished = True
+                continue
+            item = results.get(p.resource_id)
+            state = resource_state(self.kind, item)
+            if state != p.last_state:
+                changed = True
+                p.last_state = state
+            try:
+                if p.on_update is not None:
+                    p.on_update(item)
+                if p.done(item):
+                    p.result = item
+                    p.finished = True
+            except Exception as e:
+                p.error = e
+                p.finished = True
+
+        self.interval = (
+            MIN_INTERVAL if changed else min(MAX_INTERVAL, self.interval * BACKOFF)
+        )
+
+    def wait(
+        self,
+        resource_id: str,
+        done: Callable[[Optional[Dict[str, Any]]], bool],
+        on_update: Optional[Callable[[Optional[Dict[str, Any]]], None]] = None,
+        timeout: Optional[float] = None,
+        exception: bool = True,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Block until ``done(item)`` returns true for the described resource
+        (``item`` is None while the resource can't be found) and return the
+        last describe result.  ``done`` may raise to abort the wait.
+
+        On timeout, raise if ``exception`` is set, otherwise return None.
+        """
+        results = self.wait_all(
+            [resource_id], done, on_update, timeout=timeout, exception=exception
+        )
+        return None if results is None else results[resource_id]
+
+    def wait_all(
+        self,
+        resource_ids: List[str],
+        done: Callable[[Optional[Dict[str, Any]]], bool],
+        on_update: Optional[Callable[[Optional[Dict[str, Any]]], None]] = None,
+        timeout: Optional[float] = None,
+        exception: bool = True,
+    ) -> Optional[Dict[str, Optional[Dict[str, Any]]]]:
+        """
+        Like :meth:`wait`, for several resources at once: block until ``done``
+        holds for each of them and return their last describe results by ID.
+        The resources are polled together, so waiting for all of them costs
+        no more calls than waiting for one.
+        """
+        return self._wait(
+            [_Pending(resource_id, done, on_update) for resource_id in resource_ids],
+            timeout,
+            exception,
+        )
+
+    def _wait(
+        self, pending: List[_Pending], timeout: Optional[float], exception: bool
+    ) -> Optional[Dict[str, Optional[Dict[str, Any]]]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._pending.extend(pending)
+            self.interval = MIN_INTERVAL
+            try:
+                while not all(p.finished for p in pending) and not any(
+                    p.error is not None for p in pending
+                ):
+                    if deadline is not None and time.monotonic() >= deadline:
+                        if exception:
+                            raise Exception("operation timed out")
+                        return None
+                    if not self._polling:
+                        self._polling = True
+                        self._cond.release()
+                        try:
+                            self._poll()
+                        finally:
+                            self._cond.acquire()
+                            self._polling = False
+                            self._cond.notify_all()
+                    else:
+                        self._cond.wait(MAX_INTERVAL)
+            finally:
+                for p in pending:
+                    self._pending.remove(p)
+        for p in pending:
+            if p.error is not None:
+                raise p.error
+        return {p.resource_id: p.result for p in pending}
+
+    def wait_for_state(
+        self,
+        resource_id: str,
+        states: List[str],
+        pending_states: Optional[List[str]] = None,
+        logger=None,
+        timeout: Optional[float] = None,
+        allow_missing: bool = True,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Wait until the resource reaches one of ``states``.  If
+        ``pending_states`` is given, any other state aborts the wait.  A
+        missing resource is waited for if ``allow_missing`` (for eventual
+        consistency), otherwise it aborts the wait.
+        """
+        return self.wait_all_for_state(
+            [resource_id], states, pending_states, logger, timeout, allow_missing
+        )[resource_id]
+
+    def wait_all_for_state(
+        self,
+        resource_ids: List[str],
+        states: List[str],
+        pending_states: Optional[List[str]] = None,
+        logger=None,
+        timeout: Optional[float] = None,
+        allow_missing: bool = True,
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Like :meth:`wait_for_state`, for several resources at once."""
+
+        def on_update(item):
+            if logger is not None:
+                logger.log_continue(
+                    "[{0}] ".format(resource_state(self.kind, item) or "missing")
+                )
+
+        def check(resource_id):
+            def done(item):
+                state = resource_state(self.kind, item)
+                if state in states:
+                    return True
+                if state is None:
+                    if allow_missing:
+                        return False
+                    raise Exception(
+                        "{0} ‘{1}’ disappeared".format(self.kind[:-1], resource_id)
+                    )
+                if pending_states is not None and state not in pending_states:
+                    raise Exception(
+                        "{0} ‘{1}’ is in an unexpected state ‘{2}’".format(
+                            self.kind[:-1], resource_id, state
+                        )
+                    )
+                return False
+
+            return done
+
+        results = self._wait(
+            [_Pending(i, check(i), on_update) for i in resource_ids], timeout, True
+        )
+        assert results is not None
+        return results
+
+
+_waiters: Dict[Tuple[str, str, Optional[str]], Waiter] = {}
+_waiters_lock = threading.Lock()
+
+
+def get_waiter(kind: str, region: str, access_key_id: Optional[str]) -> Waiter:
+    """Return the shared waiter for a resource kind in a region."""
+    key = (kind, region, access_key_id)
+    with _waiters_lock:
+        waiter = _waiters.get(key)
+        if waiter is None:
+            waiter = _waiters[key] = Waiter(kind, region, access_key_id)
+        return waiter
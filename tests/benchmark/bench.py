@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Offline benchmark of deploy/check/destroy against the AWS stand-in.
+
+A synthetic deployment of N EC2 machines, M standalone EBS volumes per
+machine and K VPCs (with one subnet each) is driven through the plugin's
+resource state machines, every resource in its own thread as nixops does.
+Definitions are synthesised in Python instead of being evaluated from Nix,
+and the SSH/activation half of a machine deploy is out of scope: a machine
+"deploy" is the instance launch, tagging and wait for its IP address.
+
+For every phase the wall time, the number of AWS API calls (as counted by
+nixops_aws.metrics), retries, throttles and the peak RSS are reported.  API
+call counts are deterministic, so ``--baseline`` can fail a CI run when a
+change makes a phase issue more calls than recorded before:
+
+    python -m tests.benchmark.bench --machines 20 --volumes 2 --vpcs 5
+    python -m tests.benchmark.bench --json out.json
+    python -m tests.benchmark.bench --baseline out.json
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import importlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import types
+from unittest import mock
+
+import nixops.backends
+import nixops.known_hosts
+import nixops.statefile
+
+import nixops_aws.metrics
+import nixops_aws.plugin
+from tests.benchmark.standin import AWSStandIn
+
+REGION = "us-east-1"
+ZONE = "us-east-1a"
+AMI = "ami-12c6146b"
+
+
+def machine_defn(name, launch_group=""):
+    defn = types.SimpleNamespace(
+        name=name,
+        instance_profile="",
+        subnet_id="",
+        security_groups=["default"],
+        security_group_ids=[],
+        spot_instance_price=0,
+        spot_instance_request_type="one-time",
+        tenancy="default",
+        instance_type="m5.large",
+        fallback_instance_types=[],
+        fallback_zones=[],
+        ami=AMI,
+        key_pair="",
+        placement_group="",
+        launch_group=launch_group,
+        tags={"Role": "benchmark"},
+        owners=[],
+    )
+    defn.instance_types = lambda: [defn.instance_type] + defn.fallback_instance_types
+    return defn
+
+
+def volume_defn(name):
+    return types.SimpleNamespace(
+        name=name,
+        config={
+            "accessKeyId": "",
+            "region": REGION,
+            "zone": ZONE,
+            "size": 10,
+            "volumeType": "gp2",
+            "iops": None,
+            "snapshot": "",
+            "volumeId": "",
+            "tags": {"Role": "benchmark"},
+        },
+    )
+
+
+def vpc_config(i):
+    return {
+        "accessKeyId": "",
+        "region": REGION,
+        "cidrBlock": "10.{0}.0.0/16".format(i),
+        "instanceTenancy": "default",
+        "tags": {"Role": "benchmark"},
+    }
+
+
+def subnet_config(i, vpc_name):
+    return {
+        "accessKeyId": "",
+        "region": REGION,
+        "zone": ZONE,
+        "cidrBlock": "10.{0}.0.0/24".format(i),
+        "vpcId": "res-{0}".format(vpc_name),
+        "tags": {"Role": "benchmark"},
+    }
+
+
+class Benchmark:
+    """One synthetic deployment and the per-phase actions on its resources."""
+
+    def __init__(self, machines, volumes, vpcs, state_dir, launch_group=""):
+        self.state_file = nixops.statefile.StateFile(
+            os.path.join(state_dir, "bench.nixops")
+        )
+        self.depl = self.state_file.create_deployment()
+        self.depl.name = "benchmark"
+        self.depl.logger.set_autoresponse("y")
+
+        self.machines = []
+        self.volumes = []
+        self.vpcs = []
+        self.subnets = []
+        with self.depl._db:
+            for i in range(machines):
+                m = self.depl._create_resource("machine-{0}".format(i), "ec2")
+                self.machines.append((m, machine_defn(m.name, launch_group)))
+                for j in range(volumes):
+                    v = self.depl._create_resource(
+                        "volume-{0}-{1}".format(i, j), "ebs-volume"
+                    )
+                    self.volumes.append((v, volume_defn(v.name)))
+            for i in range(vpcs):
+                vpc = self.depl._create_resource("vpc-{0}".format(i), "vpc")
+                self._define(vpc, vpc_config(i))
+                self.vpcs.append(vpc)
+                subnet = self.depl._create_resource(
+                    "subnet-{0}".format(i), "vpc-subnet"
+                )
+                self._define(subnet, subnet_config(i, vpc.name))
+                self.subnets.append(subnet)
+
+    @staticmethod
+    def _define(res, config):
+        # Stands in for the evaluated Nix definition of a diff-engine resource.
+        res.get_defn = lambda: config
+
+    def close(self):
+        self.state_file.close()
+
+    def _parallel(self, tasks):
+        """Run the tasks in one thread each and re-raise the first failure."""
+        if not tasks:
+            return
+        with concurrent.futures.ThreadPoolExecutor(len(tasks)) as pool:
+            for future in [pool.submit(task) for task in tasks]:
+                future.result()
+
+    def _deploy_machine(self, m, defn):
+        if m.vm_id:
+            m.update_tags(m.vm_id, user_tags=m._get_user_tags(defn))
+            return
+        with self.depl._db:
+            m.access_key_id = os.environ["AWS_ACCESS_KEY_ID"]
+            m.region = REGION
+            m.associate_public_ip_address = True
+        instance = m.create_instance(defn, ZONE, "", False, {})
+        with self.depl._db:
+            m.vm_id = instance["InstanceId"]
+            m.ami = defn.ami
+            m.instance_type = defn.instance_type
+            m.zone = instance["Placement"]["AvailabilityZone"]
+            m.client_token = None
+            m.tags = m.get_tags(m._get_user_tags(defn))
+            m._record_tags(m.vm_id, m.tags)
+        m._wait_for_ip()
+        m.state = m.UP
+
+    def deploy(self):
+        self._parallel(
+            [lambda m=m, d=d: self._deploy_machine(m, d) for m, d in self.machines]
+            + [
+                lambda v=v, d=d: v.create(d, False, False, False)
+                for v, d in self.volumes
+            ]
+            + [lambda vpc=vpc: self._deploy_vpc(vpc) for vpc in self.vpcs]
+        )
+        # Subnets depend on their VPC, as in a real deployment.
+        self._parallel([lambda s=s: self._deploy_subnet(s) for s in self.subnets])
+
+    # The diff engine only runs the handlers whose keys changed, which for
+    # an unchanged definition is none of them.
+
+    def _deploy_vpc(self, vpc):
+        if not vpc.vpc_id:
+            vpc.realize_create_vpc(False)
+            vpc.realize_update_tag(False)
+
+    def _deploy_subnet(self, subnet):
+        if not subnet.subnet_id:
+            subnet.realize_create_subnet(False)
+            subnet.realize_update_tag(False)
+
+    def check(self):
+        def check_machine(m):
+            res = nixops.backends.CheckResult()
+            m._check(res)
+            assert res.exists and res.is_up, "{0} is not up".format(m.name)
+
+        self._parallel(
+            [lambda m=m: check_machine(m) for m, _ in self.machines]
+            + [v.check for v, _ in self.volumes]
+            + [vpc._check for vpc in self.vpcs]
+        )
+
+    def destroy(self):
+        self._parallel(
+            [m.destroy for m, _ in self.machines]
+            + [v.destroy for v, _ in self.volumes]
+            + [s.destroy for s in self.subnets]
+        )
+        self._parallel([vpc.destroy for vpc in self.vpcs])
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def measure(phase, action):
+    nixops_aws.metrics.recorder = nixops_aws.metrics.Recorder()
+    start = time.monotonic()
+    action()
+    wall_time = time.monotonic() - start
+    totals = nixops_aws.metrics.recorder.report()["totals"]
+    return {
+        "phase": phase,
+        "wall_time": wall_time,
+        "calls": totals["calls"],
+        "retries": totals["retries"],
+        "throttles": totals["throttles"],
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def run(machines, volumes, vpcs, latency=0.0, launch_group=""):
+    """Run all phases against a fresh stand-in and return their measurements."""
+    # As nixops does: resource types are found among the loaded classes.
+    for module in nixops_aws.plugin.NixopsAWSPlugin.load():
+        importlib.import_module(module)
+    nixops_aws.metrics.enabled = True
+    with contextlib.ExitStack() as stack:
+        state_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        stack.enter_context(AWSStandIn(latency))
+        # Keep the stand-in's addresses out of ~/.ssh/known_hosts, and skip
+        # the SSH half of the machine checks.
+        for f in ["add", "remove", "update"]:
+            stack.enter_context(mock.patch.object(nixops.known_hosts, f))
+        stack.enter_context(
+            mock.patch.object(nixops.backends.MachineState, "_check", autospec=True)
+        )
+
+        bench = Benchmark(machines, volumes, vpcs, state_dir, launch_group)
+        try:
+            return [
+                measure("deploy", bench.deploy),
+                # A second deploy without changes: ideally free.
+                measure("redeploy", bench.deploy),
+                measure("check", bench.check),
+                measure("destroy", bench.destroy),
+            ]
+        finally:
+            bench.close()
+
+
+def compare(results, baseline):
+    """Return the phases that made more API calls than in the baseline."""
+    previous = {r["phase"]: r for r in baseline["results"]}
+    return [
+        "{0}: {1} calls, baseline {2}".format(
+            r["phase"], r["calls"], previous[r["phase"]]["calls"]
+        )
+        for r in results
+        if r["phase"] in previous and r["calls"] > previous[r["phase"]]["calls"]
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark deploy/check/destroy against a local AWS stand-in."
+    )
+    parser.add_argument("--machines", type=int, default=10)
+    parser.add_argument("--volumes", type=int, default=1, help="per machine")
+    parser.add_argument("--vpcs", type=int, default=2)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every request"
+    )
+    parser.add_argument(
+        "--launch-group", default="", help="launch group of all machines"
+    )
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument(
+        "--baseline", help="fail if any phase makes more calls than in this file"
+    )
+    args = parser.parse_args()
+
+    parameters = {
+        "machines": args.machines,
+        "volumes": args.volumes,
+        "vpcs": args.vpcs,
+        "latency": args.latency,
+        "launch_group": args.launch_group,
+    }
+    results = run(
+        args.machines, args.volumes, args.vpcs, args.latency, args.launch_group
+    )
+
+    print(
+        "{machines} machines, {volumes} volume(s) each, {vpcs} VPCs, "
+        "{latency}s latency".format(**parameters)
+    )
+    for r in results:
+        print(
+            "{phase:>9}: {wall_time:7.2f}s {calls:6d} calls {retries:4d} retries "
+            "{throttles:4d} throttles {peak_rss_kb:8d} KiB peak RSS".format(**r)
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parameters": parameters, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print("API call regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Local AWS stand-in for the benchmarks.
+
+The stand-in is moto's server application, run in a child process so that
+its CPU time and memory don't pollute the measurements, with an optional
+fixed delay per request to model the round trip to a real AWS endpoint.
+
+boto3 clients are pointed at it with ``endpoint_url``.  boto2 derives the
+service from the host name, so boto2 connections keep their real AWS host
+name and reach the stand-in through it as an HTTP proxy.
+"""
+
+import argparse
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import boto.ec2
+import boto.vpc
+import boto3
+
+import nixops_aws.ec2_utils
+import nixops_aws.images
+import nixops_aws.inventory
+import nixops_aws.launcher
+import nixops_aws.tagging
+import nixops_aws.throttle
+import nixops_aws.waiter
+
+ACCESS_KEY_ID = "AKIABENCHMARK"
+SECRET_ACCESS_KEY = "benchmark"
+
+
+def _free_port():
+    with contextlib.closing(socket.socket()) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def reset_shared_state():
+    """Forget all pooled clients, snapshots, waiters, batchers, launchers and limiters."""
+    nixops_aws.ec2_utils.reset_boto3_clients()
+    nixops_aws.images._entries = None
+    for registry in (
+        nixops_aws.inventory._inventories,
+        nixops_aws.waiter._waiters,
+        nixops_aws.tagging._batchers,
+        nixops_aws.launcher._launchers,
+        nixops_aws.throttle._limiters,
+    ):
+        registry.clear()
+
+
+class AWSStandIn:
+    """A moto server in a child process, plus the patches that route AWS calls to it."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.host = "127.0.0.1"
+        self.port = None
+        self._process = None
+        self._patches = contextlib.ExitStack()
+
+    @property
+    def endpoint_url(self):
+        return "http://{0}:{1}".format(self.host, self.port)
+
+    def start(self):
+        self.port = _free_port()
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "tests.benchmark.standin",
+                "--port",
+                str(self.port),
+                "--latency",
+                str(self.latency),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                socket.create_connection((self.host, self.port), 1).close()
+                break
+            except OSError:
+                if self._process.poll() is not None or time.monotonic() > deadline:
+                    raise Exception("AWS stand-in failed to start")
+                time.sleep(0.1)
+        # moto sets up a service backend on its first request; get that out
+        # of the way before anything is measured.
+        boto3.session.Session().client(
+            "ec2",
+            region_name="us-east-1",
+            endpoint_url=self.endpoint_url,
+            aws_access_key_id=ACCESS_KEY_ID,
+            aws_secret_access_key=SECRET_ACCESS_KEY,
+        ).describe_availability_zones()
+        self._install()
+
+    def stop(self):
+        self._patches.close()
+        if self._process is not None:
+            self._process.terminate()
+            self._process.wait()
+            self._process = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _install(self):
+        endpoint_url = self.endpoint_url
+        session_client = boto3.session.Session.client
+
+        def client(session, *args, **kwargs):
+            kwargs["endpoint_url"] = endpoint_url
+            return session_client(session, *args, **kwargs)
+
+        def proxied(connect_to_region):
+            def connect(region_name, **kwargs):
+                kwargs.update(is_secure=False, proxy=self.host, proxy_port=self.port)
+                return connect_to_region(region_name, **kwargs)
+
+            return connect
+
+        self._patches.enter_context(
+            mock.patch.dict(
+                os.environ,
+                {
+                    "AWS_ACCESS_KEY_ID": ACCESS_KEY_ID,
+                    "AWS_SECRET_ACCESS_KEY": SECRET_ACCESS_KEY,
+                },
+            )
+        )
+        self._patches.enter_context(
+            mock.patch.object(boto3.session.Session, "client", client)
+        )
+        # The stand-in's images must not end up in the user's AMI cache.
+        cache_dir = self._patches.enter_context(tempfile.TemporaryDirectory())
+        self._patches.enter_context(
+            mock.patch.object(
+                nixops_aws.images, "path", os.path.join(cache_dir, "images.json")
+            )
+        )
+        self._patches.enter_context(
+            mock.patch.object(
+                boto.ec2, "connect_to_region", proxied(boto.ec2.connect_to_region)
+            )
+        )
+        self._patches.enter_context(
+            mock.patch.object(
+                boto.vpc, "connect_to_region", proxied(boto.vpc.connect_to_region)
+            )
+        )
+        reset_shared_state()
+        self._patches.callback(reset_shared_state)
+
+
+class _Latency:
+    """WSGI middleware delaying every request by a fixed amount."""
+
+    def __init__(self, app, latency):
+        self.app = app
+        self.latency = latency
+
+    def __call__(self, environ, start_response):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.app(environ, start_response)
+
+
+def main():
+    from moto.server import DomainDispatcherApplication, create_backend_app
+    from werkzeug.serving import make_server
+
+    parser = argparse.ArgumentParser(description="Run the benchmark AWS stand-in.")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    app = _Latency(DomainDispatcherApplication(create_backend_app), args.latency)
+    make_server("127.0.0.1", args.port, app, threaded=True).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the plugin's import cost.
+
+Every run starts a fresh interpreter that imports the modules nixops loads
+for this plugin (``NixopsAWSPlugin.load()``) and reports how long that took,
+how many modules it pulled in and whether any AWS SDK was among them.  The
+SDKs are only meant to be imported once a resource talks to AWS, so loading
+one at startup fails the run, as does ``--baseline`` when the median import
+time grew by more than the given tolerance:
+
+    python -m tests.benchmark.startup --runs 10
+    python -m tests.benchmark.startup --json out.json
+    python -m tests.benchmark.startup --baseline out.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Packages that must not be imported by merely loading the plugin.
+SDK_PACKAGES = ("boto", "boto3", "s3transfer")
+
+PROBE = """
+import importlib, json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import nixops_aws.plugin
+for name in nixops_aws.plugin.NixopsAWSPlugin.load():
+    importlib.import_module(name)
+elapsed = time.perf_counter() - start
+loaded = set(sys.modules) - before
+print(json.dumps({
+    "import_time": elapsed,
+    "modules": len(loaded),
+    "sdk_packages": sorted({m.split(".")[0] for m in loaded} & set(%r)),
+}))
+""" % (
+    SDK_PACKAGES,
+)
+
+
+def measure_once():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], check=True, stdout=subprocess.PIPE
+    ).stdout
+    return json.loads(output)
+
+
+def run(runs):
+    """Import the plugin in `runs` fresh interpreters and summarise."""
+    samples = [measure_once() for _ in range(runs)]
+    times = [s["import_time"] for s in samples]
+    return {
+        "median_import_time": statistics.median(times),
+        "min_import_time": min(times),
+        "modules": samples[-1]["modules"],
+        "sdk_packages": samples[-1]["sdk_packages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the plugin's import cost.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write the result to this file")
+    parser.add_argument(
+        "--baseline", help="fail if the median import time regressed against this file"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed relative slowdown against the baseline",
+    )
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    print(
+        "import: {median_import_time:.3f}s median, {min_import_time:.3f}s min, "
+        "{modules} modules".format(**result)
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"parameters": {"runs": args.runs}, "result": result}, f, indent=2
+            )
+
+    failures = []
+    if result["sdk_packages"]:
+        failures.append(
+            "AWS SDK imported at startup: " + ", ".join(result["sdk_packages"])
+        )
+    if args.baseline:
+        with open(args.baseline) as f:
+            previous = json.load(f)["result"]["median_import_time"]
+        if result["median_import_time"] > previous * (1 + args.tolerance):
+            failures.append(
+                "median import time {0:.3f}s, baseline {1:.3f}s".format(
+                    result["median_import_time"], previous
+                )
+            )
+    if failures:
+        print("startup regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
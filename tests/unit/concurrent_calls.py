@@ -0,0 +1,23 @@
+import threading
+
+
+def run_concurrently(f, calls):
+    """
+    Call ``f(*args)`` for each ``args`` of ``calls``, each in a thread of its
+    own, and return the results and exceptions by position in ``calls``.
+    """
+    results = {}
+    errors = {}
+
+    def run(i, args):
+        try:
+            results[i] = f(*args)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=run, args=c) for c in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nixops_aws import ec2_utils
+
+
+class TestFetchAwsSecretKey(unittest.TestCase):
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(
+            os.environ,
+            {
+                "HOME": self.home.name,
+                "AWS_SHARED_CREDENTIALS_FILE": os.path.join(
+                    self.home.name, "credentials"
+                ),
+            },
+        )
+        self.env.start()
+        for var in ["EC2_SECRET_KEY", "AWS_SECRET_ACCESS_KEY"]:
+            os.environ.pop(var, None)
+        ec2_utils._ec2_keys_cache.clear()
+        ec2_utils._aws_credentials_cache.clear()
+
+    def tearDown(self):
+        self.env.stop()
+        self.home.cleanup()
+
+    def write(self, name, contents, mtime):
+        path = os.path.join(self.home.name, name)
+        with open(path, "w") as f:
+            f.write(contents)
+        os.utime(path, (mtime, mtime))
+
+    def test_ec2_keys_by_id_and_alias(self):
+        self.write(".ec2-keys", "AKID1 secret1 alias1 # comment\nAKID2 secret2\n", 1)
+        self.assertEqual(ec2_utils.fetch_aws_secret_key("AKID2"), ("AKID2", "secret2"))
+        self.assertEqual(ec2_utils.fetch_aws_secret_key("alias1"), ("AKID1", "secret1"))
+
+    def test_aws_credentials_default_and_profile(self):
+        self.write(
+            "credentials",
+            "[default]\naws_access_key_id = AKID1\naws_secret_access_key = s1\n"
+            "[prod]\naws_access_key_id = AKID2\naws_secret_access_key = s2\n",
+            1,
+        )
+        self.assertEqual(ec2_utils.fetch_aws_secret_key("AKID1"), ("AKID1", "s1"))
+        self.assertEqual(ec2_utils.fetch_aws_secret_key("prod"), ("AKID2", "s2"))
+
+    def test_file_parsed_once_until_mtime_changes(self):
+        self.write(".ec2-keys", "AKID1 secret1\n", 1)
+        with mock.patch.object(
+            ec2_utils._ec2_keys_cache, "_parse", wraps=ec2_utils._ec2_keys_cache._parse,
+        ) as parse:
+            ec2_utils.fetch_aws_secret_key("AKID1")
+            ec2_utils.fetch_aws_secret_key("AKID1")
+            self.assertEqual(parse.call_count, 1)
+
+            self.write(".ec2-keys", "AKID1 secret2\n", 2)
+            self.assertEqual(
+                ec2_utils.fetch_aws_secret_key("AKID1"), ("AKID1", "secret2")
+            )
+            self.assertEqual(parse.call_count, 2)
+
+    def test_environment_fallback(self):
+        os.environ["AWS_SECRET_ACCESS_KEY"] = "envsecret"
+        self.assertEqual(
+            ec2_utils.fetch_aws_secret_key("AKID1"), ("AKID1", "envsecret")
+        )
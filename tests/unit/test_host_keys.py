@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+from nixops_aws import host_keys
+
+KEY = "ssh-ed25519 AAAAC3NzaC1lZDI1NTE5AAAAILEnPORQfsenoGa5zaXXC7oa2u89IlBU8Rhjbr8i0gDB"
+
+CONSOLE = """\
+[   12.3] systemd[1]: Started SSH Daemon.
+-----BEGIN SSH HOST KEY FINGERPRINTS-----
+256 SHA256:/fnL28vO7gFckpNzSI6w+xU4D+SkHH6BAmIe1L12aWI root@machine (ED25519)
+-----END SSH HOST KEY FINGERPRINTS-----
+"""
+
+
+class TestHostKeys(unittest.TestCase):
+    def test_console_fingerprints(self):
+        self.assertIsNone(host_keys.console_fingerprints("[    0.0] Linux version"))
+        self.assertIsNone(host_keys.console_fingerprints(CONSOLE.split("256")[0]))
+        self.assertEqual(
+            host_keys.console_fingerprints(CONSOLE),
+            ["SHA256:/fnL28vO7gFckpNzSI6w+xU4D+SkHH6BAmIe1L12aWI"],
+        )
+
+    def test_fingerprints(self):
+        self.assertEqual(
+            host_keys.fingerprints(KEY),
+            {
+                "SHA256:/fnL28vO7gFckpNzSI6w+xU4D+SkHH6BAmIe1L12aWI",
+                "MD5:d2:59:59:49:16:c0:70:45:4e:be:71:8e:98:54:b7:9f",
+                "d2:59:59:49:16:c0:70:45:4e:be:71:8e:98:54:b7:9f",
+            },
+        )
+
+    def test_scanned_key_must_match_the_console(self):
+        fingerprints = host_keys.console_fingerprints(CONSOLE)
+        with mock.patch.object(host_keys, "scan", return_value=[KEY]):
+            self.assertEqual(
+                host_keys.verified_key("192.0.2.1", 22, "ed25519", fingerprints), KEY
+            )
+            with self.assertRaises(Exception):
+                host_keys.verified_key("192.0.2.1", 22, "ed25519", ["SHA256:other"])
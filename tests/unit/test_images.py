@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.stub import Stubber
+
+from nixops_aws import images
+
+
+def image(ami):
+    return {
+        "ImageId": ami,
+        "State": "available",
+        "RootDeviceType": "ebs",
+        "RootDeviceName": "/dev/xvda",
+        "BlockDeviceMappings": [
+            {"DeviceName": "/dev/xvda", "Ebs": {"VolumeType": "gp2"}}
+        ],
+        "VirtualizationType": "hvm",
+        "EnaSupport": True,
+    }
+
+
+class TestImages(unittest.TestCase):
+    def setUp(self):
+        self.client = boto3.session.Session().client(
+            "ec2",
+            region_name="us-east-1",
+            aws_access_key_id="AKID",
+            aws_secret_access_key="secret",
+        )
+        self.stubber = Stubber(self.client)
+        self.dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch(
+                "nixops_aws.ec2_utils.get_boto3_client", return_value=self.client
+            ),
+            mock.patch.object(images, "path", os.path.join(self.dir, "images.json")),
+            mock.patch.object(images, "_entries", None),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.dir)
+
+    def test_related_amis_are_described_together_and_persisted(self):
+        self.stubber.add_response(
+            "describe_images",
+            {"Images": [image("ami-1"), image("ami-2")]},
+            {"Filters": [{"Name": "image-id", "Values": ["ami-1", "ami-2"]}]},
+        )
+        with self.stubber:
+            ami = images.lookup("us-east-1", "AKID", "ami-1", lambda: ["ami-2"])
+            self.assertEqual(ami["RootDeviceName"], "/dev/xvda")
+            self.assertTrue(images.lookup("us-east-1", "AKID", "ami-2")["EnaSupport"])
+        self.stubber.assert_no_pending_responses()
+
+        # A new run reads the cache file instead of describing the AMIs again.
+        images._entries = None
+        with self.stubber:
+            ami = images.lookup("us-east-1", "AKID", "ami-2")
+        self.assertEqual(ami["VirtualizationType"], "hvm")
+
+    def test_missing_ami(self):
+        self.stubber.add_response("describe_images", {"Images": []})
+        with self.stubber:
+            self.assertIsNone(images.lookup("us-east-1", "AKID", "ami-1"))
@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.stub import Stubber
+
+from nixops_aws import inventory
+
+
+def reservations(*instance_ids):
+    return {
+        "Reservations": [
+            {"Instances": [{"InstanceId": i, "State": {"Name": "running"}}]}
+            for i in instance_ids
+        ]
+    }
+
+
+class TestInventory(unittest.TestCase):
+    def setUp(self):
+        self.client = boto3.session.Session().client(
+            "ec2",
+            region_name="us-east-1",
+            aws_access_key_id="AKID",
+            aws_secret_access_key="secret",
+        )
+        self.stubber = Stubber(self.client)
+        self.patch = mock.patch(
+            "nixops_aws.ec2_utils.get_boto3_client", return_value=self.client
+        )
+        self.patch.start()
+        self.inventory = inventory.Inventory("uuid", "us-east-1", "AKID")
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_describe_looks_up_missing_fleet_together(self):
+        self.stubber.add_response("describe_instances", reservations("i-1"))
+        self.stubber.add_response(
+            "describe_instances",
+            reservations("i-2", "i-3"),
+            {"Filters": [{"Name": "instance-id", "Values": ["i-2", "i-3", "i-4"]}]},
+        )
+        self.stubber.add_response(
+            "describe_instance_status",
+            {"InstanceStatuses": [{"InstanceId": "i-3", "Events": []}]},
+            {"InstanceIds": ["i-1", "i-2", "i-3"], "IncludeAllInstances": True},
+        )
+        self.stubber.activate()
+
+        def fleet():
+            return ["i-1", "i-2", "i-3", "i-4"]
+
+        self.assertEqual(
+            self.inventory.describe("instances", "i-1", fleet)["InstanceId"], "i-1"
+        )
+        self.assertEqual(
+            self.inventory.describe("instances", "i-2", fleet)["InstanceId"], "i-2"
+        )
+        self.assertEqual(
+            self.inventory.describe("instances", "i-3", fleet)["InstanceId"], "i-3"
+        )
+        self.assertIsNone(self.inventory.describe("instances", "i-4", fleet))
+        self.assertEqual(self.inventory.instance_status("i-3")["InstanceId"], "i-3")
+        self.assertIsNone(self.inventory.instance_status("i-2"))
+        self.stubber.assert_no_pending_responses()
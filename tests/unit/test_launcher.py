@@ -0,0 +1,94 @@
+import unittest
+from unittest import mock
+
+from concurrent_calls import run_concurrently
+
+from nixops_aws import launcher
+
+
+def tag_specifications(**tags):
+    return [
+        {
+            "ResourceType": "instance",
+            "Tags": [{"Key": k, "Value": v} for k, v in sorted(tags.items())],
+        }
+    ]
+
+
+class TestLauncher(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.run_instances.side_effect = lambda **args: {
+            "Instances": [
+                {"InstanceId": "i-{0}".format(n), "AmiLaunchIndex": n}
+                for n in range(args["MaxCount"])
+            ]
+        }
+        self.patches = [
+            mock.patch(
+                "nixops_aws.ec2_utils.get_boto3_client", return_value=self.client
+            ),
+            mock.patch.object(launcher, "COALESCE_WINDOW", 0.1),
+        ]
+        for p in self.patches:
+            p.start()
+        self.launcher = launcher.Launcher("us-east-1", "AKID")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def launch_concurrently(self, launches):
+        prepared = {}
+
+        def launch(name, group, args):
+            def prepare(client_token, launch_index):
+                prepared[name] = (client_token, launch_index)
+
+            return self.launcher.run_instance(group, args, prepare)
+
+        results, _ = run_concurrently(launch, launches)
+        return {launches[i][0]: r for i, r in results.items()}, prepared
+
+    def test_identical_launches_share_one_call(self):
+        results, prepared = self.launch_concurrently(
+            [
+                (
+                    name,
+                    "web",
+                    {
+                        "ImageId": "ami-1",
+                        "TagSpecifications": tag_specifications(Name=name, Role="web"),
+                    },
+                )
+                for name in ["a", "b"]
+            ]
+        )
+        self.assertEqual(self.launcher.calls, 1)
+        args = self.client.run_instances.call_args[1]
+        self.assertEqual(args["MaxCount"], 2)
+        self.assertEqual(args["TagSpecifications"], tag_specifications(Role="web"))
+
+        # Every machine gets the instance at its launch index.
+        self.assertEqual(prepared["a"][0], prepared["b"][0])
+        for name in ["a", "b"]:
+            instance, tags = results[name]
+            self.assertEqual(instance["AmiLaunchIndex"], prepared[name][1])
+            self.assertEqual(tags, tag_specifications(Role="web"))
+        self.assertNotEqual(
+            results["a"][0]["InstanceId"], results["b"][0]["InstanceId"]
+        )
+
+    def test_different_parameters_are_launched_separately(self):
+        self.launch_concurrently(
+            [("a", "web", {"ImageId": "ami-1"}), ("b", "web", {"ImageId": "ami-2"})]
+        )
+        self.assertEqual(self.launcher.calls, 2)
+
+    def test_host_key_is_shared_by_group(self):
+        with mock.patch(
+            "nixops.util.create_key_pair", side_effect=[("p1", "k1"), ("p2", "k2")]
+        ):
+            self.assertEqual(self.launcher.host_key("web", "ed25519"), ("p1", "k1"))
+            self.assertEqual(self.launcher.host_key("web", "ed25519"), ("p1", "k1"))
+            self.assertEqual(self.launcher.host_key("db", "ed25519"), ("p2", "k2"))
@@ -0,0 +1,87 @@
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.stub import Stubber
+
+from nixops_aws import metrics, throttle
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.recorder = metrics.Recorder()
+        self.patches = [
+            mock.patch.object(metrics, "enabled", True),
+            mock.patch.object(metrics, "recorder", self.recorder),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def make_client(self):
+        client = boto3.session.Session().client(
+            "ec2",
+            region_name="eu-west-1",
+            aws_access_key_id="AKID",
+            aws_secret_access_key="secret",
+        )
+        metrics.instrument_boto3_client(client)
+        return client
+
+    def test_boto3_calls_are_attributed_to_resources(self):
+        client = self.make_client()
+        with Stubber(client) as stubber:
+            stubber.add_response("describe_volumes", {"Volumes": []})
+            stubber.add_response("describe_volumes", {"Volumes": []})
+            stubber.add_client_error("create_tags", "RequestLimitExceeded")
+
+            metrics.set_current_resource("machine-1")
+            client.describe_volumes()
+            metrics.set_current_resource("machine-2")
+            client.describe_volumes()
+            with self.assertRaises(Exception):
+                client.create_tags(Resources=["vol-1"], Tags=[])
+            metrics.record_retry(throttle.THROTTLE)
+
+        report = self.recorder.report()
+        self.assertEqual(report["totals"]["calls"], 3)
+        self.assertEqual(report["totals"]["throttles"], 1)
+        ops = {o["operation"]: o for o in report["operations"]}
+        self.assertEqual(ops["DescribeVolumes"]["count"], 2)
+        self.assertEqual(ops["DescribeVolumes"]["region"], "eu-west-1")
+        self.assertEqual(ops["CreateTags"]["throttles"], 1)
+        resources = {r["name"]: r for r in report["resources"]}
+        self.assertEqual(resources["machine-1"]["calls"], 1)
+        self.assertEqual(resources["machine-2"]["calls"], 2)
+        self.assertEqual(report["critical_path"], "machine-2")
+        self.assertIn("CreateTags", metrics.format_summary(report))
+
+    def test_connections_are_the_peak_calls_in_flight(self):
+        client = self.make_client()
+        with Stubber(client) as stubber:
+            stubber.add_response("describe_volumes", {"Volumes": []})
+            stubber.add_response("describe_volumes", {"Volumes": []})
+            client.describe_volumes()
+            client.describe_volumes()
+        self.assertEqual(self.recorder.connections(), 1)
+
+        other = -1  # a client number instrument_boto3_client doesn't hand out
+        self.recorder.call_started(other)
+        self.recorder.call_started(other)
+        self.recorder.call_finished(other)
+        self.recorder.call_started(other)
+        totals = self.recorder.report()["totals"]
+        self.assertEqual(totals["clients"], 2)
+        self.assertEqual(totals["connections"], 3)
+
+    def test_disabled_registers_nothing(self):
+        with mock.patch.object(metrics, "enabled", False):
+            client = self.make_client()
+            with Stubber(client) as stubber:
+                stubber.add_response("describe_volumes", {"Volumes": []})
+                metrics.set_current_resource("machine-1")
+                client.describe_volumes()
+        self.assertEqual(self.recorder.report()["totals"]["calls"], 0)
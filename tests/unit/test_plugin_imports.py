@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import unittest
+
+PROBE = """
+import importlib, sys
+import nixops_aws.plugin
+for name in nixops_aws.plugin.NixopsAWSPlugin.load():
+    importlib.import_module(name)
+print(" ".join(sorted({"boto", "boto3"} & set(sys.modules))))
+"""
+
+
+class TestPluginImports(unittest.TestCase):
+    def test_load_does_not_import_sdks(self):
+        # A fresh interpreter, as this one has most likely loaded them already.
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            check=True,
+            env=env,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        ).stdout
+        self.assertEqual(output.strip(), "")
@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+
+import botocore.exceptions
+
+from concurrent_calls import run_concurrently
+
+from nixops_aws import power
+
+
+def incorrect_state(**kwargs):
+    if "i-2" in kwargs["InstanceIds"]:
+        raise botocore.exceptions.ClientError(
+            {"Error": {"Code": "IncorrectInstanceState", "Message": "stopping"}},
+            "StartInstances",
+        )
+
+
+class TestPowerBatcher(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.patches = [
+            mock.patch(
+                "nixops_aws.ec2_utils.get_boto3_client", return_value=self.client
+            ),
+            mock.patch.object(power, "COALESCE_WINDOW", 0.1),
+        ]
+        for p in self.patches:
+            p.start()
+        self.batcher = power.PowerBatcher("us-east-1", "AKID")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def call_concurrently(self, calls):
+        _, errors = run_concurrently(
+            lambda operation, instance_id, params: self.batcher.call(
+                operation, instance_id, **params
+            ),
+            calls,
+        )
+        return [calls[i][1] for i in errors]
+
+    def test_machines_stop_in_one_call(self):
+        self.call_concurrently(
+            [("stop_instances", "i-1", {}), ("stop_instances", "i-2", {})]
+        )
+        self.assertEqual(self.batcher.calls, 1)
+        instance_ids = self.client.stop_instances.call_args[1]["InstanceIds"]
+        self.assertEqual(sorted(instance_ids), ["i-1", "i-2"])
+
+    def test_forced_stops_are_grouped_separately(self):
+        self.call_concurrently(
+            [
+                ("stop_instances", "i-1", {}),
+                ("stop_instances", "i-2", {"Force": True}),
+                ("stop_instances", "i-3", {"Force": True}),
+            ]
+        )
+        self.assertEqual(self.batcher.calls, 2)
+        self.client.stop_instances.assert_any_call(InstanceIds=mock.ANY, Force=True)
+
+    def test_failing_instance_does_not_fail_the_others(self):
+        self.client.start_instances.side_effect = incorrect_state
+        errors = self.call_concurrently(
+            [("start_instances", "i-1", {}), ("start_instances", "i-2", {})]
+        )
+        self.assertEqual(errors, ["i-2"])
+        self.client.start_instances.assert_any_call(InstanceIds=["i-1"])
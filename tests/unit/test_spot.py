@@ -0,0 +1,140 @@
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.stub import ANY, Stubber
+
+from nixops_aws import spot
+
+
+def price(instance_type, zone, spot_price):
+    return {
+        "InstanceType": instance_type,
+        "AvailabilityZone": zone,
+        "SpotPrice": spot_price,
+        "ProductDescription": "Linux/UNIX",
+    }
+
+
+class ClientWithoutPlacementScores:
+    """An EC2 client of a botocore predating GetSpotPlacementScores."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        if name == "get_spot_placement_scores":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+class TestSpot(unittest.TestCase):
+    def setUp(self):
+        self.client = boto3.session.Session().client(
+            "ec2",
+            region_name="us-east-1",
+            aws_access_key_id="AKID",
+            aws_secret_access_key="secret",
+        )
+        self.stubber = Stubber(self.client)
+        self.patches = [
+            mock.patch(
+                "nixops_aws.ec2_utils.get_boto3_client", return_value=self.client
+            ),
+            mock.patch.object(spot, "_zones", {}),
+            mock.patch.object(spot, "_scores", {}),
+            mock.patch.object(spot, "_prices", {}),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        self.stubber.add_response(
+            "describe_availability_zones",
+            {
+                "AvailabilityZones": [
+                    {"ZoneName": "us-east-1a", "ZoneId": "use1-az1"},
+                    {"ZoneName": "us-east-1b", "ZoneId": "use1-az2"},
+                ]
+            },
+        )
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def add_prices(self):
+        self.stubber.add_response(
+            "describe_spot_price_history",
+            {
+                "SpotPriceHistory": [
+                    price("m5.large", "us-east-1a", "0.030"),
+                    price("m5.large", "us-east-1b", "0.200"),
+                    price("m5a.large", "us-east-1a", "0.020"),
+                    price("m5a.large", "us-east-1b", "0.040"),
+                ]
+            },
+            {
+                "InstanceTypes": ["m5.large", "m5a.large"],
+                "ProductDescriptions": ["Linux/UNIX"],
+                "StartTime": ANY,
+            },
+        )
+
+    def test_zones_are_ranked_by_placement_score_within_the_price(self):
+        self.stubber.add_response(
+            "get_spot_placement_scores",
+            {
+                "SpotPlacementScores": [
+                    {
+                        "Region": "us-east-1",
+                        "AvailabilityZoneId": "use1-az1",
+                        "Score": 3,
+                    },
+                    {
+                        "Region": "us-east-1",
+                        "AvailabilityZoneId": "use1-az2",
+                        "Score": 9,
+                    },
+                ]
+            },
+        )
+        self.add_prices()
+        candidates = [("m5.large", None), ("m5a.large", None)]
+        with self.stubber:
+            ranked = spot.rank("us-east-1", "AKID", candidates, 0.1)
+            # Other machines reuse what was fetched.
+            self.assertEqual(spot.rank("us-east-1", "AKID", candidates, 0.1), ranked)
+        self.stubber.assert_no_pending_responses()
+        self.assertEqual(
+            ranked,
+            [
+                ("m5a.large", "us-east-1b"),
+                ("m5.large", "us-east-1a"),
+                ("m5a.large", "us-east-1a"),
+            ],
+        )
+
+    def test_without_placement_scores(self):
+        self.stubber.add_client_error(
+            "get_spot_placement_scores", "UnauthorizedOperation"
+        )
+        self.add_prices()
+        candidates = [("m5.large", "us-east-1b"), ("m5a.large", "us-east-1b")]
+        with self.stubber:
+            self.assertEqual(
+                spot.rank("us-east-1", "AKID", candidates, 0.1),
+                [("m5a.large", "us-east-1b")],
+            )
+
+    def test_without_the_placement_scores_api(self):
+        self.add_prices()
+        candidates = [("m5.large", "us-east-1a"), ("m5a.large", "us-east-1a")]
+        with mock.patch(
+            "nixops_aws.ec2_utils.get_boto3_client",
+            return_value=ClientWithoutPlacementScores(self.client),
+        ), self.stubber:
+            self.assertEqual(
+                spot.rank("us-east-1", "AKID", candidates, 0.1),
+                [("m5.large", "us-east-1a"), ("m5a.large", "us-east-1a")],
+            )
+        self.stubber.assert_no_pending_responses()
@@ -0,0 +1,111 @@
+import time
+import unittest
+from unittest import mock
+
+import botocore.exceptions
+
+from concurrent_calls import run_concurrently
+
+from nixops_aws import tagging
+
+
+def malformed_id(**kwargs):
+    if "vol-bad" in kwargs["Resources"]:
+        raise botocore.exceptions.ClientError(
+            {"Error": {"Code": "InvalidVolumeID.Malformed", "Message": "vol-bad"}},
+            "CreateTags",
+        )
+
+
+class TestTagBatcher(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.patches = [
+            mock.patch(
+                "nixops_aws.ec2_utils.get_boto3_client", return_value=self.client
+            ),
+            mock.patch.object(tagging, "COALESCE_WINDOW", 0.1),
+        ]
+        for p in self.patches:
+            p.start()
+        self.batcher = tagging.TagBatcher("us-east-1", "AKID")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def tag_concurrently(self, writes):
+        # Writers only wait for each other while others are writing.
+        self.batcher._coalescer._last_request = time.monotonic()
+        _, errors = run_concurrently(self.batcher.create_tags, writes)
+        return [writes[i][0] for i in errors]
+
+    def test_identical_tags_share_one_call(self):
+        tags = {"CharonNetworkUUID": "uuid"}
+        self.tag_concurrently([(["vol-1"], tags), (["vol-2"], tags)])
+        self.assertEqual(self.batcher.calls, 1)
+        resources = self.client.create_tags.call_args[1]["Resources"]
+        self.assertEqual(sorted(resources), ["vol-1", "vol-2"])
+
+    def test_different_tags_are_grouped_separately(self):
+        self.tag_concurrently([(["vol-1"], {"Name": "a"}), (["vol-2"], {"Name": "b"})])
+        self.assertEqual(self.batcher.calls, 2)
+
+    def test_lone_writer_does_not_wait(self):
+        with mock.patch("time.sleep") as sleep:
+            self.batcher.create_tags(["vol-1"], {"Name": "a"})
+        sleep.assert_not_called()
+        self.assertEqual(self.batcher.calls, 1)
+
+    def test_failing_resource_does_not_fail_the_others(self):
+        self.client.create_tags.side_effect = malformed_id
+        errors = self.tag_concurrently(
+            [
+                (["vol-1"], {"Name": "a"}),
+                (["vol-bad"], {"Name": "a"}),
+                (["vol-2"], {"Name": "b"}),
+            ]
+        )
+        self.assertEqual(errors, [["vol-bad"]])
+        self.client.create_tags.assert_any_call(
+            Resources=["vol-1"], Tags=[{"Key": "Name", "Value": "a"}]
+        )
+        self.client.create_tags.assert_any_call(
+            Resources=["vol-2"], Tags=[{"Key": "Name", "Value": "b"}]
+        )
+
+    def test_tag_specifications(self):
+        self.assertEqual(
+            tagging.tag_specifications("volume", {"b": "2", "a": "1"}),
+            [
+                {
+                    "ResourceType": "volume",
+                    "Tags": [{"Key": "a", "Value": "1"}, {"Key": "b", "Value": "2"}],
+                }
+            ],
+        )
+
+
+class TestDiffTags(unittest.TestCase):
+    def test_only_changes_are_written(self):
+        to_set, to_delete = tagging.diff_tags(
+            {"a": "1", "b": "2", "c": "3"}, {"a": "1", "b": "x"}, ["a", "b", "c"]
+        )
+        self.assertEqual(to_set, {"b": "x"})
+        self.assertEqual(to_delete, ["c"])
+
+    def test_unmanaged_tags_are_kept(self):
+        to_set, to_delete = tagging.diff_tags(
+            {"a": "1", "foreign": "y"}, {"a": "1"}, ["a"]
+        )
+        self.assertEqual(to_set, {})
+        self.assertEqual(to_delete, [])
+
+    def test_hash_ignores_order(self):
+        self.assertEqual(
+            tagging.tags_hash({"a": "1", "b": "2"}),
+            tagging.tags_hash({"b": "2", "a": "1"}),
+        )
+        self.assertNotEqual(
+            tagging.tags_hash({"a": "1"}), tagging.tags_hash({"a": "2"})
+        )
@@ -0,0 +1,104 @@
+import time
+import unittest
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+from nixops_aws import throttle
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "DescribeThings")
+
+
+class TestCallWithRetry(unittest.TestCase):
+    def setUp(self):
+        self.patches = [
+            mock.patch("time.sleep"),
+            mock.patch.object(throttle.RateLimiter, "acquire"),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def call(self, errors, **kwargs):
+        errors = list(errors)
+        calls = []
+
+        def f():
+            calls.append(None)
+            if errors:
+                raise client_error(errors.pop(0))
+            return "ok"
+
+        try:
+            return throttle.call_with_retry(f, (ClientError,), **kwargs), len(calls)
+        except ClientError:
+            return None, len(calls)
+
+    def test_classify_error(self):
+        self.assertEqual(throttle.classify_error("RequestLimitExceeded"), "throttle")
+        self.assertEqual(throttle.classify_error("InternalError"), "transient")
+        self.assertEqual(throttle.classify_error("AuthFailure"), "fatal")
+        self.assertEqual(throttle.classify_error("InvalidVolume.NotFound"), "other")
+
+    def test_throttles_do_not_count_against_retries(self):
+        result, calls = self.call(
+            ["Throttling"] * 10, region="test-throttles", num_retries=1
+        )
+        self.assertEqual((result, calls), ("ok", 11))
+        stats = throttle.stats()["ec2/test-throttles"]
+        self.assertEqual(stats["throttles"], 10)
+        self.assertEqual(stats["retries"], 10)
+
+    def test_throttles_are_bounded(self):
+        self.assertEqual(
+            self.call(["Throttling"] * 10, num_throttle_retries=3), (None, 4)
+        )
+
+    def test_error_codes_wait_a_minimum_delay(self):
+        with mock.patch.object(throttle, "full_jitter_backoff", return_value=0.0):
+            self.call(["Wanted", "Throttling"], error_codes=["Wanted"])
+        self.assertEqual(
+            [c.args[0] for c in time.sleep.call_args_list],
+            [throttle.ERROR_CODE_MIN_DELAY, 0.0],
+        )
+
+    def test_fatal_errors_are_not_retried(self):
+        self.assertEqual(self.call(["AuthFailure"]), (None, 1))
+
+    def test_fatal_codes_are_not_retried(self):
+        capacity = ["InsufficientInstanceCapacity"]
+        self.assertEqual(self.call(capacity, fatal_codes=capacity), (None, 1))
+        self.assertEqual(self.call(capacity), ("ok", 2))
+
+    def test_error_codes_restrict_retries(self):
+        self.assertEqual(self.call(["Other"], error_codes=["Wanted"]), (None, 1))
+        self.assertEqual(self.call(["Wanted"], error_codes=["Wanted"]), ("ok", 2))
+
+    def test_retries_are_bounded(self):
+        self.assertEqual(self.call(["Other"] * 10, num_retries=3), (None, 4))
+
+    def test_retryable_errors_are_looked_up_after_the_failure(self):
+        class LoadedError(Exception):
+            pass
+
+        retryable = []
+        errors = [LoadedError(), None]
+
+        def f():
+            # As when f loads the library defining the error.
+            retryable.append(LoadedError)
+            error = errors.pop(0)
+            if error is not None:
+                raise error
+            return "ok"
+
+        self.assertEqual(
+            throttle.call_with_retry(f, lambda: tuple(retryable), num_retries=1), "ok",
+        )
+        with self.assertRaises(ValueError):
+            throttle.call_with_retry(mock.Mock(side_effect=ValueError), (ClientError,))
@@ -0,0 +1,199 @@
+import threading
+import unittest
+from unittest import mock
+
+import boto3
+from botocore.stub import Stubber
+
+from nixops_aws import waiter
+
+
+def volumes(**states):
+    return {"Volumes": [{"VolumeId": k, "State": v} for k, v in states.items()]}
+
+
+class TestWaiter(unittest.TestCase):
+    def setUp(self):
+        self.client = boto3.session.Session().client(
+            "ec2",
+            region_name="us-east-1",
+            aws_access_key_id="AKID",
+            aws_secret_access_key="secret",
+        )
+        self.stubber = Stubber(self.client)
+        self.patches = [
+            mock.patch(
+                "nixops_aws.ec2_utils.get_boto3_client", return_value=self.client
+            ),
+            mock.patch.object(waiter, "MIN_INTERVAL", 0.01),
+        ]
+        for p in self.patches:
+            p.start()
+        self.waiter = waiter.Waiter("volumes", "us-east-1", "AKID")
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_concurrent_waits_share_describe_calls(self):
+        self.stubber.add_response(
+            "describe_volumes", volumes(v1="creating", v2="creating")
+        )
+        self.stubber.add_response(
+            "describe_volumes", volumes(v1="available", v2="creating")
+        )
+        self.stubber.add_response("describe_volumes", volumes(v2="available"))
+        self.stubber.activate()
+
+        results = {}
+
+        def wait(volume_id):
+            results[volume_id] = self.waiter.wait_for_state(volume_id, ["available"])
+
+        threads = [threading.Thread(target=wait, args=(v,)) for v in ["v1", "v2"]]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(results["v1"]["State"], "available")
+        self.assertEqual(results["v2"]["State"], "available")
+        self.assertLessEqual(self.waiter.describe_calls, 3)
+        self.stubber.assert_no_pending_responses()
+
+    def test_wait_all_polls_resources_together(self):
+        self.stubber.add_response(
+            "describe_volumes",
+            volumes(v1="available", v2="creating"),
+            {"Filters": [{"Name": "volume-id", "Values": ["v1", "v2"]}]},
+        )
+        # Resources that are done are no longer polled.
+        self.stubber.add_response(
+            "describe_volumes",
+            volumes(v2="available"),
+            {"Filters": [{"Name": "volume-id", "Values": ["v2"]}]},
+        )
+        self.stubber.activate()
+
+        results = self.waiter.wait_all(
+            ["v1", "v2"], lambda v: v is not None and v["State"] == "available"
+        )
+        self.assertEqual(set(results), {"v1", "v2"})
+        self.assertEqual(self.waiter.describe_calls, 2)
+        self.stubber.assert_no_pending_responses()
+
+    def test_unexpected_state_aborts(self):
+        self.stubber.add_response("describe_volumes", volumes(v1="error"))
+        self.stubber.activate()
+        with self.assertRaises(Exception):
+            self.waiter.wait_for_state("v1", ["available"], pending_states=["creating"])
+
+    def test_timeout(self):
+        for _ in range(20):
+            self.stubber.add_response("describe_volumes", volumes(v1="creating"))
+        self.stubber.activate()
+        self.assertIsNone(
+            self.waiter.wait("v1", lambda v: False, timeout=0.05, exception=False)
+        )
+
+    def test_failing_resource_does_not_abort_other_waits(self):
+        def filters(*ids):
+            return {"Filters": [{"Name": "volume-id", "Values": list(ids)}]}
+
+        self.stubber.add_client_error(
+            "describe_volumes",
+            "InvalidVolumeID.Malformed",
+            expected_params=filters("v1", "v2"),
+        )
+        self.stubber.add_response(
+            "describe_volumes", volumes(v1="available"), filters("v1")
+        )
+        self.stubber.add_client_error(
+            "describe_volumes",
+            "InvalidVolumeID.Malformed",
+            expected_params=filters("v2"),
+        )
+        self.stubber.activate()
+
+        def done(v):
+            return v is not None and v["State"] == "available"
+
+        pending = [waiter._Pending(v, done, None) for v in ["v1", "v2"]]
+        self.waiter._pending.extend(pending)
+        self.waiter._poll()
+
+        self.assertTrue(pending[0].finished)
+        self.assertIsNone(pending[0].error)
+        self.assertIsNotNone(pending[1].error)
+        self.stubber.assert_no_pending_responses()
+
+    def test_failed_poll_is_retried(self):
+        self.stubber.add_client_error("describe_volumes", "AuthFailure")
+        self.stubber.add_response("describe_volumes", volumes(v1="available"))
+        self.stubber.activate()
+        self.assertEqual(
+            self.waiter.wait_for_state("v1", ["available"])["State"], "available"
+        )
+
+    def test_fast_snapshot_restores_are_per_zone(self):
+        restores = waiter.Waiter("fast_snapshot_restores", "us-east-1", "AKID")
+        self.stubber.add_response(
+            "describe_fast_snapshot_restores",
+            {
+                "FastSnapshotRestores": [
+                    {
+                        "SnapshotId": "snap-1",
+                        "AvailabilityZone": "us-east-1a",
+                        "State": "enabled",
+                    },
+                    {
+                        "SnapshotId": "snap-1",
+                        "AvailabilityZone": "us-east-1b",
+                        "State": "enabling",
+                    },
+                ]
+            },
+            {
+                "Filters": [
+                    {"Name": "snapshot-id", "Values": ["snap-1"]},
+                    {"Name": "availability-zone", "Values": ["us-east-1a"]},
+                ]
+            },
+        )
+        self.stubber.activate()
+        restore_id = waiter.fast_snapshot_restore_id("snap-1", "us-east-1a")
+        self.assertEqual(
+            restores.wait_for_state(restore_id, ["enabled"])["AvailabilityZone"],
+            "us-east-1a",
+        )
+
+    def test_missing_instances_have_no_status(self):
+        statuses = waiter.Waiter("instance_statuses", "us-east-1", "AKID")
+        self.stubber.add_client_error(
+            "describe_instance_status",
+            "InvalidInstanceID.NotFound",
+            "The instance ID 'i-2' does not exist",
+            expected_params={"InstanceIds": ["i-1", "i-2"]},
+        )
+        self.stubber.add_response(
+            "describe_instance_status",
+            {
+                "InstanceStatuses": [
+                    {"InstanceId": "i-1", "InstanceStatus": {"Status": "ok"}}
+                ]
+            },
+            {"InstanceIds": ["i-1"]},
+        )
+        self.stubber.activate()
+
+        def done(status):
+            return status is not None
+
+        pending = [waiter._Pending(i, done, None) for i in ["i-1", "i-2"]]
+        statuses._pending.extend(pending)
+        statuses._poll()
+
+        self.assertTrue(pending[0].finished)
+        self.assertFalse(pending[1].finished)
+        self.assertIsNone(pending[1].error)
+        self.stubber.assert_no_pending_responses()